@@ -0,0 +1,65 @@
+from wdev.hosts import LocalHost
+from wdev.tasks import ShellTask
+from wdev.workflow import SimpleWorkflow
+from wdev.workflow.batch import ChainScript, find_chain
+
+
+def chain_of(*commands: str):
+    tasks = [ShellTask(f"step{i}", command) for i, command in enumerate(commands)]
+    for task, next_task in zip(tasks, tasks[1:]):
+        task.set_next_success(next_task)
+    return tasks
+
+
+def test_find_chain_stops_at_unbatchable_tasks():
+    tasks = chain_of("echo 1", "echo 2", "echo 3", "echo 4")
+    tasks[2].with_timeout(5)
+    assert find_chain(tasks[0]) == tasks[:2]
+    assert find_chain(tasks[3]) == tasks[3:]
+
+
+def test_parse_splits_output_per_step():
+    tasks = chain_of("echo a", "echo b; echo err >&2", "echo c")
+    script = ChainScript(tasks)
+    exit_code, output, error = LocalHost().execute_command(script.script)
+    assert exit_code == 0
+    assert script.parse(exit_code, output, error) == [(0, "a\n", ""), (0, "b\n", "err\n"), (0, "c\n", "")]
+
+
+def test_parse_stops_at_failed_step():
+    script = ChainScript(chain_of("echo a", "echo no; exit 3", "echo never"))
+    assert script.parse(*LocalHost().execute_command(script.script)) == [(0, "a\n", ""), (3, "no\n", "")]
+
+
+def test_parse_output_without_trailing_newline_and_fake_markers():
+    script = ChainScript(chain_of("printf partial", "echo __WDEV_fake_0 1"))
+    results = script.parse(*LocalHost().execute_command(script.script))
+    assert results == [(0, "partial", ""), (0, "__WDEV_fake_0 1\n", "")]
+
+
+def test_parse_interrupted_script():
+    script = ChainScript(chain_of("echo a", "echo b"))
+    output = f"a\n\n{script.marker}_0 0\nb\n"
+    error = f"\n{script.marker}_0\n"
+    # 第二步的标记缺失：保留剩余输出，退出码为 0 时记为 -1
+    assert script.parse(0, output, error) == [(0, "a\n", ""), (-1, "b\n", "")]
+    assert script.parse(137, output, error)[-1] == (137, "b\n", "")
+
+
+def test_workflow_batches_chain_into_one_command():
+    commands = []
+
+    class RecordingHost(LocalHost):
+        def execute_command(self, command: str):
+            commands.append(command)
+            return super().execute_command(command)
+
+    tasks = chain_of("echo a", "false", "echo never")
+    tasks[1].set_next_failure(ShellTask("recover", "echo recover"))
+    workflow = SimpleWorkflow("wf", batch_chains=True).add_host(RecordingHost()).add_task(tasks[0])
+    assert not workflow.execute()
+    assert len(commands) == 2
+    statuses = {record.task: record.status for record in workflow.task_records()}
+    assert statuses == {"step0": "成功", "step1": "失败", "recover": "成功"}
+    outputs = {record.task: record.result.output for record in workflow.task_records()}
+    assert outputs["step0"] == "a\n" and outputs["recover"] == "recover\n"
@@ -0,0 +1,111 @@
+import socket
+import time
+
+import pytest
+
+from wdev.bench import FakeHost, LocalSSHServer
+from wdev.hosts import CircuitBreaker, HostUnreachableError, SSHConnectionPool, SSHHost
+
+
+class FlakyHost(FakeHost):
+    """探测结果可控的模拟主机"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.healthy = False
+        self.probes = 0
+
+    def probe(self):
+        self.probes += 1
+        if not self.healthy:
+            raise ConnectionRefusedError("refused")
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, probe_interval=60)
+    host = FlakyHost("flaky").with_breaker(breaker)
+    breaker.record_failure(host, OSError("refused"))
+    assert host.reachable
+    breaker.record_failure(host, OSError("refused"))
+    assert not host.reachable
+    with pytest.raises(HostUnreachableError):
+        host.execute_command("echo hi")
+    assert host.commands == 0
+    assert breaker.stats()["flaky"]["open"]
+    breaker.reset(host)
+    assert host.execute_command("echo hi")[0] == 0
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, probe_interval=60)
+    host = FlakyHost("flaky").with_breaker(breaker)
+    breaker.record_failure(host, OSError("refused"))
+    breaker.record_success(host)
+    breaker.record_failure(host, OSError("refused"))
+    assert host.reachable
+
+
+def test_probe_closes_circuit_when_host_recovers():
+    breaker = CircuitBreaker(failure_threshold=1, probe_interval=0.05)
+    host = FlakyHost("flaky").with_breaker(breaker)
+    breaker.record_failure(host, OSError("refused"))
+    assert wait_until(lambda: host.probes >= 2)
+    assert not host.reachable
+    host.healthy = True
+    assert wait_until(lambda: host.reachable)
+    assert breaker.stats() == {}
+
+
+def test_disabled_breaker_never_opens():
+    breaker = CircuitBreaker(failure_threshold=None)
+    host = FlakyHost("flaky").with_breaker(breaker)
+    for _ in range(10):
+        breaker.record_failure(host, OSError("refused"))
+    assert host.reachable
+
+
+def test_ssh_connection_failures_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, probe_interval=60)
+    pool = SSHConnectionPool()
+    host = SSHHost("127.0.0.1", "bench", password="bench", port=closed_port(), pool=pool)
+    host.with_breaker(breaker).with_retry(0).with_timeouts(connect=1.0)
+    try:
+        for _ in range(2):
+            with pytest.raises(HostUnreachableError):
+                host.execute_command("echo hi")
+        assert not host.reachable
+        started = time.monotonic()
+        with pytest.raises(HostUnreachableError, match="连续 2 次连接失败"):
+            host.execute_command("echo hi")
+        assert time.monotonic() - started < 0.5
+    finally:
+        pool.close_all()
+
+
+def test_command_failures_do_not_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, probe_interval=60)
+    pool = SSHConnectionPool()
+    with LocalSSHServer() as server:
+        host = server.host(pool=pool).with_breaker(breaker)
+        try:
+            for _ in range(3):
+                assert host.execute_command("exit 3")[0] == 3
+            assert host.reachable
+            assert host.execute_command("echo ok") == (0, "ok\n", "")
+        finally:
+            pool.close_all()
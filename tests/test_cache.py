@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from wdev.bench import FakeHost
+from wdev.tasks import ResultCache, ShellTask, TaskResult
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, TaskResult(True, key), ttl=60)
+    assert cache.get("a").output == "a"
+    cache.put("c", TaskResult(True, "c"), ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1, 1)
+    assert stats["hit_rate"] == 0.75
+    with pytest.raises(ValueError):
+        ResultCache(max_entries=0)
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache()
+    cache.put("key", TaskResult(False, "", "failed"), ttl=0.05)
+    assert cache.get("key").error == "failed"
+    time.sleep(0.1)
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_cache_survives_new_instance(tmp_path):
+    cache = ResultCache(path=str(tmp_path))
+    cache.put("key", TaskResult(True, "out", data={"n": 1}), ttl=60)
+    cache.put("short", TaskResult(True, "short"), ttl=0.01)
+    reopened = ResultCache(path=str(tmp_path))
+    assert reopened.get("key").data == {"n": 1}
+    time.sleep(0.05)
+    assert reopened.get("short") is None
+    reopened.clear()
+    assert ResultCache(path=str(tmp_path)).get("key") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_task_uses_cache_per_host_and_command():
+    cache = ResultCache()
+    first, second = FakeHost("a"), FakeHost("b")
+    task = ShellTask("check", "uname -r").with_cache(60, cache)
+    assert task.execute(first).success
+    task.execute(first)
+    task.execute(second)
+    ShellTask("check", "uname -a").with_cache(60, cache).execute(first)
+    assert (first.commands, second.commands) == (2, 1)
+    assert cache.stats()["hits"] == 1
+    with pytest.raises(ValueError):
+        task.with_cache(0)
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from wdev.bench import LocalSSHServer
+from wdev.hosts import CancelToken, LocalHost, SSHConnectionPool, TaskCancelledError, cancel_scope
+from wdev.hosts.cancel import CANCEL_EXIT_CODE, CANCELLED, TIMEOUT, TIMEOUT_EXIT_CODE
+from wdev.tasks import PythonTask, ShellTask, TaskResult
+from wdev.workflow import DagWorkflow, SimpleWorkflow
+
+
+def test_token_deadline_and_parent():
+    parent = CancelToken()
+    child = CancelToken(timeout=0.05, parent=parent)
+    assert not child.cancelled and 0 < child.remaining() <= 0.05
+    assert child.wait(1.0)
+    assert child.reason == TIMEOUT and not parent.cancelled
+    with pytest.raises(TaskCancelledError):
+        child.raise_if_cancelled()
+
+    other = CancelToken(parent=parent)
+    called = []
+    other.on_cancel(lambda: called.append(True))
+    parent.cancel()
+    assert other.reason == CANCELLED and called == [True]
+    # 已取消的令牌注册回调时立即调用
+    other.on_cancel(lambda: called.append(False))
+    assert called == [True, False]
+
+
+def test_cancellable():
+    assert CancelToken().cancellable
+    assert not CancelToken(internal=True).cancellable
+    assert CancelToken(timeout=1, internal=True).cancellable
+    assert CancelToken(parent=CancelToken(), internal=True).cancellable
+    assert not CancelToken(parent=CancelToken(internal=True), internal=True).cancellable
+
+
+def test_local_command_killed_on_cancel():
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    started = time.monotonic()
+    with cancel_scope(token):
+        exit_code, output, error = LocalHost().execute_command("echo start; sleep 30 & sleep 30; wait")
+    assert time.monotonic() - started < 5
+    assert exit_code == CANCEL_EXIT_CODE
+    assert output == "start\n"
+    assert CANCELLED in error
+
+
+def test_cancelled_token_skips_command():
+    token = CancelToken()
+    token.cancel()
+    with cancel_scope(token):
+        assert LocalHost().execute_command("echo never")[0] == CANCEL_EXIT_CODE
+
+
+def test_shell_task_timeout():
+    started = time.monotonic()
+    task = ShellTask("slow", "echo start; sleep 30").with_timeout(0.3)
+    result = task.execute(LocalHost())
+    assert time.monotonic() - started < 5
+    assert not result.success and result.exit_code == TIMEOUT_EXIT_CODE
+    assert result.output.endswith("start\n")
+    assert task.cancel_reason == TIMEOUT
+
+
+def test_streaming_shell_task_timeout():
+    started = time.monotonic()
+    task = ShellTask("stream", "for i in 1 2 3; do echo $i; sleep 1; done; sleep 30")
+    result = task.with_output_limit(10, 10).with_timeout(0.5).execute(LocalHost())
+    assert time.monotonic() - started < 5
+    assert result.exit_code == TIMEOUT_EXIT_CODE and result.output.endswith("1\n")
+
+
+def test_python_task_cooperative_cancel():
+    def wait_for_cancel(task, host):
+        while not task.cancel_token.wait(0.05):
+            pass
+        return TaskResult(True, "stopped")
+
+    task = PythonTask("py", wait_for_cancel).with_timeout(0.2)
+    started = time.monotonic()
+    result = task.execute(LocalHost())
+    assert time.monotonic() - started < 5
+    assert result.output == "stopped" and task.cancel_reason == TIMEOUT
+
+
+def test_ssh_command_cancelled():
+    pool = SSHConnectionPool()
+    with LocalSSHServer() as server:
+        host = server.host(pool=pool)
+        try:
+            task = ShellTask("slow", "echo start; sleep 30").with_timeout(0.5)
+            started = time.monotonic()
+            result = task.execute(host)
+            assert time.monotonic() - started < 5
+            assert result.exit_code == TIMEOUT_EXIT_CODE
+            assert host.execute_command("echo ok") == (0, "ok\n", "")
+        finally:
+            pool.close_all()
+
+
+def test_workflow_timeout_stops_run():
+    workflow = SimpleWorkflow("wf").add_host(LocalHost())
+    workflow.add_task(ShellTask("long", "sleep 30")).add_task(ShellTask("after", "echo after"))
+    workflow.with_timeout(0.3)
+    started = time.monotonic()
+    workflow.execute()
+    assert time.monotonic() - started < 5
+    statuses = {record.task: record.status for record in workflow.task_records()}
+    assert statuses["long"] == TIMEOUT
+    assert statuses.get("after") != "成功"
+
+
+def test_external_cancel_stops_dag():
+    dag = DagWorkflow("dag").add_host(LocalHost())
+    first = ShellTask("first", "sleep 30")
+    dag.add_task(first).add_task(ShellTask("second", "echo second"), depends_on=[first])
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    started = time.monotonic()
+    with cancel_scope(token):
+        dag.execute()
+    assert time.monotonic() - started < 5
+    statuses = {record.task: record.status for record in dag.task_records()}
+    assert statuses["first"] == CANCELLED
+    assert statuses.get("second") != "成功"
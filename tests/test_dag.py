@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from wdev.bench import FakeHost
+from wdev.tasks import PythonTask, TaskResult
+from wdev.workflow import DagWorkflow
+
+
+class Recorder:
+    """按执行顺序记录任务名"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.order = []
+
+    def task(self, name: str, success: bool = True) -> PythonTask:
+        def run(task, host):
+            with self._lock:
+                self.order.append(name)
+            return TaskResult(success, name)
+        return PythonTask(name, run)
+
+
+def statuses(dag: DagWorkflow, host_name: str = "a"):
+    return {node.task.name: node.status for node in dag.task_track[host_name]}
+
+
+def test_tasks_run_after_all_upstreams():
+    recorder = Recorder()
+    build = recorder.task("build")
+    lint = recorder.task("lint")
+    test = recorder.task("test")
+    deploy = recorder.task("deploy")
+    dag = DagWorkflow("dag", max_workers=4).add_host(FakeHost("a"))
+    dag.add_task(build).add_task(lint)
+    dag.add_task(test, depends_on=[build]).add_task(deploy, depends_on=[test, lint])
+    assert dag.execute()
+    order = recorder.order
+    assert sorted(order) == ["build", "deploy", "lint", "test"]
+    assert order.index("build") < order.index("test") < order.index("deploy")
+    assert order.index("lint") < order.index("deploy")
+    assert [node.task.name for node in dag.critical_paths["a"]][-1] == "deploy"
+
+
+def test_skip_propagates_through_descendants():
+    recorder = Recorder()
+    build = recorder.task("build", success=False)
+    test = recorder.task("test")
+    deploy = recorder.task("deploy")
+    rollback = recorder.task("rollback")
+    cleanup = recorder.task("cleanup")
+    dag = DagWorkflow("dag").add_host(FakeHost("a")).add_host(FakeHost("b"))
+    dag.add_task(build).add_task(test, depends_on=[build]).add_task(deploy, depends_on=[test])
+    dag.add_task(rollback, depends_on=[build], condition="failure")
+    dag.add_task(cleanup, depends_on=[deploy], condition="always")
+    assert not dag.execute()
+    for host_name in ("a", "b"):
+        assert statuses(dag, host_name) == {"build": "失败", "test": "跳过", "deploy": "跳过",
+                                            "rollback": "成功", "cleanup": "成功"}
+    assert sorted(recorder.order) == ["build", "build", "cleanup", "cleanup", "rollback", "rollback"]
+    # 被跳过的任务也出现在执行记录中
+    assert {(record.task, record.status) for record in dag.task_records() if record.host == "a"} >= \
+        {("test", "跳过"), ("deploy", "跳过")}
+
+
+def test_callable_condition_sees_upstream_results():
+    recorder = Recorder()
+    check = recorder.task("check")
+    chosen = []
+    dag = DagWorkflow("dag").add_host(FakeHost("a")).add_task(check)
+    dag.add_task(recorder.task("on_output"), depends_on=[check],
+                 condition=lambda results: chosen.append(results["check"].output) or True)
+    assert dag.execute()
+    assert chosen == ["check"]
+
+
+def test_host_concurrency_limits_parallel_tasks():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def run(task, host):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threading.Event().wait(0.05)
+        with lock:
+            running[0] -= 1
+        return TaskResult(True, "")
+
+    dag = DagWorkflow("dag", max_workers=8, host_concurrency=2).add_host(FakeHost("a"))
+    for i in range(6):
+        dag.add_task(PythonTask(f"t{i}", run))
+    assert dag.execute()
+    assert peak[0] == 2
+
+
+def test_add_task_validation():
+    recorder = Recorder()
+    first = recorder.task("first")
+    dag = DagWorkflow("dag").add_task(first)
+    with pytest.raises(ValueError):
+        dag.add_task(first)
+    with pytest.raises(ValueError):
+        dag.add_task(recorder.task("orphan"), depends_on=[recorder.task("missing")])
+    with pytest.raises(ValueError):
+        dag.add_task(recorder.task("bad"), depends_on=[first], condition="sometimes")
+    with pytest.raises(ValueError):
+        DagWorkflow("dag", max_workers=0)
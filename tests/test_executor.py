@@ -0,0 +1,110 @@
+import threading
+import time
+
+from wdev.hosts import LocalHost
+from wdev.tasks import PythonTask, TaskResult
+from wdev.workflow import SimpleWorkflow
+from wdev.workflow.executor import JobExecutor
+from wdev.workflow.scheduler import WorkflowJob
+
+
+class Gate:
+    """工作流运行到 release() 为止，记录每次运行的开始顺序和是否被取消"""
+
+    def __init__(self):
+        self.opened = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.runs = []
+
+    def job(self, name: str, executor: JobExecutor, overlap: str = "skip", priority: int = 0) -> WorkflowJob:
+        def run(task, host):
+            self.runs.append(name)
+            self.started.release()
+            while not self.opened.is_set():
+                if task.cancel_token is not None and task.cancel_token.wait(0.01):
+                    return TaskResult(False, "", "cancelled")
+            return TaskResult(True, "")
+
+        workflow = SimpleWorkflow(name).add_host(LocalHost()).add_task(PythonTask("wait", run))
+        job = WorkflowJob(workflow, async_mode=True, overlap=overlap, priority=priority)
+        job._executor = executor
+        return job
+
+    def wait_started(self, count: int = 1):
+        for _ in range(count):
+            assert self.started.acquire(timeout=5)
+
+    def release(self):
+        self.opened.set()
+
+
+def test_skip_ignores_trigger_while_running():
+    executor, gate = JobExecutor(max_workers=2), Gate()
+    job = gate.job("a", executor)
+    assert executor.submit(job)
+    gate.wait_started()
+    assert not executor.submit(job)
+    gate.release()
+    assert executor.wait_idle(5)
+    assert gate.runs == ["a"] and job.skipped == 1 and executor.stats()["skipped"] == 1
+    executor.shutdown(wait=True)
+
+
+def test_queue_one_keeps_a_single_pending_run():
+    executor, gate = JobExecutor(max_workers=2), Gate()
+    job = gate.job("a", executor, overlap="queue_one")
+    assert executor.submit(job)
+    gate.wait_started()
+    assert executor.submit(job)
+    assert not executor.submit(job)
+    # 同一个任务不会并发运行，即使还有空闲线程
+    assert executor.queue_depth == 1 and executor.running == 1
+    gate.release()
+    gate.wait_started()
+    executor.shutdown(cancel_queued=False, wait=True)
+    assert gate.runs == ["a", "a"] and job.skipped == 1 and job.queued == 0
+
+
+def test_cancel_previous_stops_running_instance():
+    executor, gate = JobExecutor(max_workers=1), Gate()
+    job = gate.job("a", executor, overlap="cancel_previous")
+    assert executor.submit(job)
+    gate.wait_started()
+    started = time.monotonic()
+    assert executor.submit(job)
+    gate.wait_started()
+    assert time.monotonic() - started < 5
+    gate.release()
+    assert executor.wait_idle(5)
+    executor.shutdown(wait=True)
+    assert gate.runs == ["a", "a"] and job.last_success
+
+
+def test_queued_jobs_run_by_priority():
+    executor, gate = JobExecutor(max_workers=1), Gate()
+    blocker = gate.job("blocker", executor)
+    low, high = gate.job("low", executor, priority=1), gate.job("high", executor, priority=5)
+    executor.submit(blocker)
+    gate.wait_started()
+    executor.submit(low)
+    executor.submit(high)
+    gate.release()
+    gate.wait_started(2)
+    executor.shutdown(cancel_queued=False, wait=True)
+    assert gate.runs == ["blocker", "high", "low"]
+    stats = executor.stats()
+    assert stats["dispatched"] == 3 and stats["max_wait"] > 0
+
+
+def test_restart_after_shutdown():
+    executor, gate = JobExecutor(max_workers=1), Gate()
+    job = gate.job("a", executor)
+    gate.release()
+    executor.shutdown(wait=True)
+    assert not executor.submit(job)
+    executor.start()
+    assert executor.submit(job)
+    gate.wait_started()
+    assert executor.wait_idle(5)
+    executor.shutdown(wait=True)
+    assert gate.runs == ["a"]
@@ -0,0 +1,93 @@
+import socket
+
+from wdev.bench import LocalSSHServer
+from wdev.hosts import CircuitBreaker, LocalHost, SSHConnectionPool, SSHHost
+from wdev.tasks import DownloadTask, SyncTask, UploadTask, upload_to_hosts
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_upload_to_hosts_keeps_results_of_reachable_hosts(tmp_path):
+    source = tmp_path / "app.tar.gz"
+    source.write_bytes(b"artifact")
+    pool = SSHConnectionPool()
+    down = SSHHost("127.0.0.1", "bench", password="bench", port=closed_port(), pool=pool)
+    down.with_breaker(CircuitBreaker(failure_threshold=1)).with_retry(0).with_timeouts(connect=1.0)
+    down.name = "down"
+    up = LocalHost()
+    try:
+        results = upload_to_hosts([down, up], str(source), f"{tmp_path}/dst/", max_workers=2)
+    finally:
+        pool.close_all()
+    assert list(results) == ["down", up.name]
+    assert not results["down"].success and "不可达" in results["down"].error
+    assert results[up.name].success
+    assert (tmp_path / "dst" / "app.tar.gz").read_bytes() == b"artifact"
+
+
+def make_tree(root):
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_text("alpha")
+    (root / "sub" / "b.txt").write_text("bravo")
+    (root / "sub" / "c.txt").write_text("charlie")
+
+
+def upload_twice(host, tmp_path):
+    source = tmp_path / "src"
+    make_tree(source)
+    destination = f"{tmp_path}/dst"
+    first = UploadTask("upload", str(source), destination).with_parallel(2).execute(host)
+    assert first.success, first.error
+    assert sorted(first.data["transferred"]) == [f"{destination}/a.txt", f"{destination}/sub/b.txt",
+                                                 f"{destination}/sub/c.txt"]
+    assert first.data["bytes"] == 17
+    # 大小相同但内容不同的文件仍然需要传输
+    (source / "sub" / "b.txt").write_text("BRAVO")
+    second = UploadTask("upload", str(source), destination).execute(host)
+    assert second.data["transferred"] == [f"{destination}/sub/b.txt"]
+    assert sorted(second.data["skipped"]) == [f"{destination}/a.txt", f"{destination}/sub/c.txt"]
+    assert second.data["bytes"] == 5
+    assert (tmp_path / "dst" / "sub" / "b.txt").read_text() == "BRAVO"
+    third = UploadTask("upload", str(source), destination).execute(host)
+    assert third.data["transferred"] == [] and len(third.data["skipped"]) == 3
+
+
+def test_upload_skips_unchanged_files_locally(tmp_path):
+    upload_twice(LocalHost(), tmp_path)
+
+
+def test_upload_skips_unchanged_files_over_ssh(tmp_path):
+    pool = SSHConnectionPool()
+    with LocalSSHServer() as server:
+        try:
+            upload_twice(server.host(pool=pool), tmp_path)
+        finally:
+            pool.close_all()
+
+
+def test_sync_deletes_extraneous_files(tmp_path):
+    source = tmp_path / "src"
+    make_tree(source)
+    stale = tmp_path / "dst" / "old.txt"
+    stale.parent.mkdir()
+    stale.write_text("old")
+    result = SyncTask("sync", str(source), f"{tmp_path}/dst").execute(LocalHost())
+    assert result.success and result.data["deleted"] == [str(stale)]
+    assert not stale.exists()
+
+
+def test_download_skips_unchanged_files(tmp_path):
+    source = tmp_path / "remote"
+    make_tree(source)
+    task = DownloadTask("download", str(source), f"{tmp_path}/{{host}}")
+    host = LocalHost()
+    assert len(task.execute(host).data["transferred"]) == 3
+    assert (tmp_path / host.name / "sub" / "c.txt").read_text() == "charlie"
+    (source / "a.txt").write_text("ALPHA")
+    again = task.execute(host)
+    assert again.data["transferred"] == [str(tmp_path / host.name / "a.txt")]
+    assert len(again.data["skipped"]) == 2
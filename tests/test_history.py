@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+
+from wdev.hosts import CancelToken, LocalHost, cancel_scope
+from wdev.hosts.cancel import CANCELLED, TIMEOUT
+from wdev.tasks import PythonTask, ShellTask, TaskResult
+from wdev.workflow import DagWorkflow, RunHistory, SimpleWorkflow
+from wdev.workflow.history import _parse_duration, main
+
+
+def run_workflow(fail: bool) -> SimpleWorkflow:
+    deploy = PythonTask("deploy", lambda task, host: TaskResult(not fail, "deployed", "oops" if fail else ""))
+    deploy.set_next_success(PythonTask("check", lambda task, host: TaskResult(True, "x" * 100)))
+    workflow = SimpleWorkflow("wf").add_host(LocalHost()).add_task(deploy)
+    workflow.execute()
+    return workflow
+
+
+def test_record_and_query(tmp_path):
+    history = RunHistory(str(tmp_path / "history.db"), max_output=10, flush_interval=0.05)
+    now = time.time()
+    history.record(run_workflow(False), now - 2, now - 1, True, run_id="r1")
+    history.record(run_workflow(True), now - 1, now, False, run_id="r2")
+    assert history.flush(5)
+    assert history.generation == 2
+
+    runs = history.runs("wf")
+    assert [run["run_id"] for run in runs] == ["r2", "r1"]
+    assert (runs[0]["success"], runs[0]["hosts"], runs[0]["failed_tasks"]) == (0, 1, 1)
+    assert runs[1]["duration"] == 1
+
+    tasks = history.task_runs(workflow="wf", task="check")
+    assert len(tasks) == 1 and tasks[0]["status"] == "成功"
+    assert tasks[0]["output"] == "x" * 10
+    failed = history.task_runs(status="失败")
+    assert [(row["task"], row["error"]) for row in failed] == [("deploy", "oops")]
+
+    assert [(row["host"], row["failures"]) for row in history.failed_hosts("deploy")] == [("localhost", 1)]
+    assert history.failed_hosts("check") == []
+    stats = history.workflow_stats("wf", now - 3600)
+    assert (stats["runs"], stats["failures"], stats["failed_tasks"]) == (2, 1, 1)
+    trend = history.duration_trend("wf", bucket=86400)
+    assert sum(row["runs"] for row in trend) == 2
+    history.close(5)
+
+
+def test_writer_started_lazily(tmp_path):
+    history = RunHistory(str(tmp_path / "history.db"))
+    assert history.runs() == []
+    assert history._thread is None
+    history.record(run_workflow(False), time.time() - 1, time.time(), True)
+    assert history._thread is not None
+    history.close(5)
+    assert len(history.runs()) == 1
+
+
+def test_prune_removes_old_runs(tmp_path):
+    path = str(tmp_path / "history.db")
+    history = RunHistory(path, retention_days=1, flush_interval=0.05)
+    now = time.time()
+    history.record(run_workflow(False), now - 3 * 86400, now - 3 * 86400 + 1, True, run_id="old")
+    history.record(run_workflow(False), now - 60, now - 59, True, run_id="new")
+    history.close(5)
+    # 后台线程写入后已经清理过一次
+    assert [run["run_id"] for run in history.runs()] == ["new"]
+    assert history.prune() == 0
+    with sqlite3.connect(path) as conn:
+        orphans = conn.execute("SELECT COUNT(*) FROM task_runs WHERE run NOT IN (SELECT id FROM runs)").fetchone()
+    assert orphans == (0,)
+    kept = RunHistory(path, retention_days=None, flush_interval=0.05)
+    kept.record(run_workflow(False), now - 3 * 86400, now - 3 * 86400 + 1, True, run_id="old")
+    kept.close(5)
+    assert kept.prune() == 0
+    assert RunHistory(path, retention_days=1).prune() == 1
+    assert [run["run_id"] for run in history.runs()] == ["new"]
+
+
+def test_cli(tmp_path, capsys):
+    path = str(tmp_path / "history.db")
+    history = RunHistory(path, flush_interval=0.05)
+    history.record(run_workflow(True), time.time() - 1, time.time(), False, run_id="r1")
+    history.close(5)
+    main([path, "failed-hosts", "deploy"])
+    assert "localhost" in capsys.readouterr().out
+    main([path, "runs", "--since", "1h"])
+    assert "r1" in capsys.readouterr().out
+    assert _parse_duration("30m") == 1800 and _parse_duration("2d") == 172800
+
+
+def test_task_rows_keep_their_own_finish_time(tmp_path):
+    history = RunHistory(str(tmp_path / "history.db"), flush_interval=0.05)
+    slow = PythonTask("slow", lambda task, host: time.sleep(0.3) or TaskResult(True, ""))
+    fast = PythonTask("fast", lambda task, host: TaskResult(True, ""))
+    workflow = SimpleWorkflow("wf").add_host(LocalHost()).add_task(fast).add_task(slow)
+    dag = DagWorkflow("dag").add_host(LocalHost()).add_task(fast)
+    dag.add_task(slow, depends_on=[fast]).add_task(ShellTask("skipped", "echo"), depends_on=[slow],
+                                                   condition="failure")
+    for flow in (workflow, dag):
+        started = time.time()
+        flow.execute()
+        history.record(flow, started, time.time() + 10, True)
+    history.close(5)
+    for name in ("wf", "dag"):
+        rows = {row["task"]: row["finished"] for row in history.task_runs(workflow=name)}
+        run = history.runs(name)[0]
+        assert run["started"] < rows["fast"] < rows["slow"] - 0.25 < run["finished"]
+    # 跳过的任务记为运行结束时间
+    assert history.task_runs(workflow="dag", task="skipped")[0]["finished"] == history.runs("dag")[0]["finished"]
+
+
+def test_timeouts_and_cancellations_count_as_failures(tmp_path):
+    history = RunHistory(str(tmp_path / "history.db"), flush_interval=0.05)
+    timed_out = SimpleWorkflow("timeout").add_host(LocalHost()).with_timeout(0.2)
+    timed_out.add_task(ShellTask("long", "sleep 5"))
+    cancelled = SimpleWorkflow("cancel").add_host(LocalHost()).add_task(ShellTask("long", "sleep 5"))
+    started = time.time()
+    assert not timed_out.execute()
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    with cancel_scope(token):
+        assert not cancelled.execute()
+    for workflow in (timed_out, cancelled):
+        history.record(workflow, started, time.time(), False)
+    history.close(5)
+    assert {row["status"] for row in history.task_runs(task="long")} == {TIMEOUT, CANCELLED}
+    assert [run["failed_tasks"] for run in history.runs()] == [1, 1]
+    assert history.failed_hosts("long") and history.failed_hosts("long")[0]["failures"] == 2
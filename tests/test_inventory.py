@@ -0,0 +1,99 @@
+import pytest
+
+from wdev.hosts import Inventory, LocalHost, SSHHost
+from wdev.hosts.inventory import expand_hosts, parse_shard
+
+
+def make_inventory() -> Inventory:
+    return Inventory.from_dict({
+        "defaults": {"username": "root", "port": 22, "tier": "default"},
+        "groups": {
+            "web": {"vars": {"port": 2222, "tier": "web"}, "hosts": ["web-[01:04]", {"name": "web-canary", "canary": True}]},
+            "db": {"vars": {"tier": "db"}, "hosts": ["db-[a:b]"]},
+            "prod": {"vars": {"tier": "prod", "env": "prod"}, "children": ["web"]},
+        },
+        "hosts": [{"localhost": {"connection": "local"}}],
+    })
+
+
+def test_expand_hosts():
+    assert expand_hosts("web-[01:03]") == ["web-01", "web-02", "web-03"]
+    assert expand_hosts("db-[a:c]") == ["db-a", "db-b", "db-c"]
+    assert expand_hosts("r[1:2]-[a:b]") == ["r1-a", "r1-b", "r2-a", "r2-b"]
+    assert expand_hosts("plain") == ["plain"]
+    with pytest.raises(ValueError):
+        expand_hosts("bad-[1:c]")
+
+
+def test_parse_shard():
+    assert parse_shard("3/8") == (3, 8)
+    assert parse_shard((1, 2)) == (1, 2)
+    with pytest.raises(ValueError):
+        parse_shard("9/8")
+
+
+def test_load_hosts_and_groups():
+    inventory = make_inventory()
+    assert len(inventory) == 8
+    assert "web-04" in inventory and "web-05" not in inventory
+    assert set(inventory.groups) == {"web", "db", "prod"}
+
+
+def test_vars_precedence_with_children():
+    inventory = make_inventory()
+    # defaults < 父组 prod < 子组 web < 主机变量
+    assert inventory.vars("web-01") == {"username": "root", "port": 2222, "tier": "web", "env": "prod"}
+    assert inventory.vars("web-canary")["canary"] is True
+    assert inventory.vars("db-a") == {"username": "root", "port": 22, "tier": "db"}
+    assert inventory.vars("localhost")["tier"] == "default"
+
+
+def test_vars_follow_later_group_changes():
+    inventory = make_inventory()
+    assert inventory.vars("db-a")["tier"] == "db"
+    inventory.add_group("db", {"tier": "database", "engine": "pg"})
+    assert inventory.vars("db-a")["tier"] == "database"
+    # 同一层级按组定义顺序合并，后定义的 prod 覆盖 db
+    inventory.add_host("db-a", ["prod"], role="primary")
+    assert inventory.vars("db-a") == {"username": "root", "port": 22, "tier": "prod", "env": "prod",
+                                      "engine": "pg", "role": "primary"}
+
+
+def test_select_patterns():
+    inventory = make_inventory()
+    assert inventory.select("web").names == ["web-01", "web-02", "web-03", "web-04", "web-canary"]
+    assert inventory.select("prod").names == inventory.select("web").names
+    assert inventory.select("web,db:!web-canary").names == ["web-01", "web-02", "web-03", "web-04", "db-a", "db-b"]
+    assert inventory.select("all:&db").names == ["db-a", "db-b"]
+    assert inventory.select("web-0*").names == ["web-01", "web-02", "web-03", "web-04"]
+    assert inventory.select(r"~^db-\w$").names == ["db-a", "db-b"]
+    with pytest.raises(ValueError):
+        inventory.select("missing")
+
+
+def test_select_ranges():
+    inventory = make_inventory()
+    assert inventory.select("web-[01:02]").names == ["web-01", "web-02"]
+    assert inventory.select("web-[02:09]:!web-[03:03],db-[a:z]").names == ["web-02", "web-04", "db-a", "db-b"]
+    assert inventory.select("web:&web-[0:1]*").names == ["web-01", "web-02", "web-03", "web-04"]
+    assert inventory.select("web-[05:06]").names == []
+
+
+def test_shards_partition_selection():
+    inventory = make_inventory()
+    shards = [inventory.select("all", shard=(i, 3)).names for i in range(1, 4)]
+    assert sorted(name for names in shards for name in names) == sorted(inventory.select("all").names)
+    assert inventory.select("all", shard="2/3").names == shards[1]
+    assert len(inventory.select("all").limit(2)) == 2
+
+
+def test_hosts_created_lazily_and_reused():
+    inventory = make_inventory()
+    web = inventory.host("web-01")
+    assert isinstance(web, SSHHost)
+    assert (web.hostname, web.port, web.username) == ("web-01", 2222, "root")
+    assert web.vars == {"tier": "web", "env": "prod"}
+    assert set(web.groups) == {"web", "prod"}
+    assert inventory.host("web-01") is web
+    assert isinstance(inventory.host("localhost"), LocalHost)
+    assert [host.name for host in inventory.select("db")] == ["db-a", "db-b"]
@@ -0,0 +1,95 @@
+import pytest
+
+from wdev.hosts import LocalHost
+from wdev.tasks import PythonTask, ShellTask, TaskResult
+from wdev.workflow import RunJournal, SimpleWorkflow
+
+
+class Flaky:
+    """记录调用次数，fail 为 True 时返回失败"""
+
+    def __init__(self, output: str = "ok", data=None):
+        self.calls = 0
+        self.fail = False
+        self.output = output
+        self.data = data
+
+    def __call__(self, task, host):
+        self.calls += 1
+        return TaskResult(not self.fail, self.output, data=self.data)
+
+
+def build(journal: RunJournal, *steps: Flaky) -> SimpleWorkflow:
+    workflow = SimpleWorkflow("wf", journal=journal).add_host(LocalHost())
+    root = previous = None
+    for i, step in enumerate(steps):
+        task = PythonTask(f"step{i}", step)
+        if previous is None:
+            root = task
+        else:
+            previous.set_next_success(task)
+        previous = task
+    return workflow.add_task(root)
+
+
+def test_resume_skips_successful_steps(tmp_path):
+    journal = RunJournal(str(tmp_path), fsync_interval=0)
+    first, second = Flaky("first", data={"version": 3}), Flaky("second")
+    second.fail = True
+    workflow = build(journal, first, second)
+    assert not workflow.execute()
+    run_id = workflow.last_run_id
+    assert journal.runs() == [run_id]
+
+    second.fail = False
+    assert workflow.resume(run_id)
+    assert (first.calls, second.calls) == (1, 2)
+    restored = workflow.host_runs["localhost"][0].results[0]
+    assert restored.output == "first" and restored.data == {"version": 3}
+    header, results = journal.load(run_id)
+    assert header["workflow"] == "wf" and results[0][1].success
+
+
+def test_truncated_last_line_ignored(tmp_path):
+    journal = RunJournal(str(tmp_path), fsync_interval=0)
+    first, second = Flaky(), Flaky()
+    workflow = build(journal, first, second)
+    workflow.execute()
+    path = journal.path_of(workflow.last_run_id)
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    # 模拟进程在写第二个步骤时中断
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:len(lines[-1]) // 2])
+    assert workflow.resume(workflow.last_run_id)
+    assert (first.calls, second.calls) == (1, 2)
+
+
+def test_incomplete_records_rerun_on_resume(tmp_path):
+    journal = RunJournal(str(tmp_path), fsync_interval=0, max_output=4)
+    long_output, lossy_data, exact = Flaky("x" * 10), Flaky(data=(1, 2)), Flaky(data=[1, 2])
+    last = Flaky()
+    last.fail = True
+    workflow = build(journal, long_output, lossy_data, exact, last)
+    workflow.execute()
+    _, results = journal.load(workflow.last_run_id)
+    # 输出被截断、元组 data 无法原样保存的步骤不作为恢复点
+    assert sorted(results[0]) == [2, 3]
+    last.fail = False
+    assert workflow.resume(workflow.last_run_id)
+    assert (long_output.calls, lossy_data.calls, exact.calls, last.calls) == (2, 2, 1, 2)
+
+
+def test_resume_rejects_changed_workflow(tmp_path):
+    journal = RunJournal(str(tmp_path), fsync_interval=0)
+    workflow = build(journal, Flaky())
+    workflow.execute()
+    run_id = workflow.last_run_id
+    workflow.add_task(ShellTask("extra", "echo extra"))
+    with pytest.raises(ValueError):
+        workflow.resume(run_id)
+    with pytest.raises(ValueError):
+        workflow.resume("missing")
+    with pytest.raises(ValueError):
+        SimpleWorkflow("wf").add_host(LocalHost()).add_task(ShellTask("a", "echo")).resume(run_id)
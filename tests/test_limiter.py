@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from wdev.bench import FakeHost, LocalSSHServer
+from wdev.hosts import AIMD, ConcurrencyLimiter, LocalHost, SSHConnectionPool, SSHMultiplexer
+
+
+class CountingHost(FakeHost):
+    """记录同时执行的命令数的模拟主机"""
+
+    def __init__(self, name: str, latency: float, *counters: "Counter", groups=()):
+        super().__init__(name, latency)
+        self.counters = counters
+        self.groups = tuple(groups)
+
+    def execute_command(self, command: str):
+        for counter in self.counters:
+            counter.enter()
+        try:
+            return super().execute_command(command)
+        finally:
+            for counter in self.counters:
+                counter.exit()
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def exit(self):
+        with self._lock:
+            self.current -= 1
+
+
+def run_parallel(hosts, commands: int, workers: int = 16):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(host.execute_command, "echo hi") for host in hosts for _ in range(commands)]
+        return [future.result() for future in futures]
+
+
+def test_per_host_limit():
+    limiter = ConcurrencyLimiter(per_host=2)
+    counter = Counter()
+    host = CountingHost("a", 0.02, counter).with_limiter(limiter)
+    results = run_parallel([host], 12)
+    assert all(result[0] == 0 for result in results)
+    assert counter.peak == 2
+    assert limiter.stats()["host:CountingHost:a"]["waited"] > 0
+
+
+def test_global_and_group_limits():
+    limiter = ConcurrencyLimiter(global_limit=3, per_group={"web": 1})
+    web_counter, all_counter = Counter(), Counter()
+    web = [CountingHost(f"web-{i}", 0.02, web_counter, all_counter, groups=["web"]).with_limiter(limiter)
+           for i in range(3)]
+    db = [CountingHost(f"db-{i}", 0.02, all_counter).with_limiter(limiter) for i in range(4)]
+    run_parallel(web + db, 3)
+    assert web_counter.peak == 1
+    assert all_counter.peak == 3
+
+
+def test_inactive_limiter_does_not_wait():
+    limiter = ConcurrencyLimiter()
+    assert not limiter.active
+    counter = Counter()
+    host = CountingHost("a", 0.05, counter).with_limiter(limiter)
+    run_parallel([host], 4, workers=4)
+    assert counter.peak == 4
+
+
+def test_nested_commands_do_not_deadlock():
+    limiter = ConcurrencyLimiter(per_host=1)
+
+    class NestedHost(FakeHost):
+        def execute_command(self, command: str):
+            if command == "outer":
+                return self.execute_command("inner")
+            return super().execute_command(command)
+
+    host = NestedHost("nested").with_limiter(limiter)
+    assert host.execute_command("outer")[0] == 0
+
+
+def test_aimd_decreases_on_slow_commands_and_recovers():
+    limiter = ConcurrencyLimiter(aimd=AIMD(target_latency=0.01, initial=8, min_limit=1, max_limit=8, cooldown=0))
+    host = FakeHost("slow", latency=0.02).with_limiter(limiter)
+    for _ in range(3):
+        host.execute_command("echo hi")
+    assert limiter.stats()["host:FakeHost:slow"]["limit"] == 1
+    host.latency = 0.0
+    for _ in range(20):
+        host.execute_command("echo hi")
+    assert limiter.stats()["host:FakeHost:slow"]["limit"] > 1
+
+
+def test_invalid_limits_rejected():
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(per_host=0)
+    with pytest.raises(ValueError):
+        AIMD(initial=0)
+
+
+def test_stream_releases_slot_when_closed_early():
+    limiter = ConcurrencyLimiter(per_host=1)
+    host = LocalHost().with_limiter(limiter)
+    stats = lambda: limiter.stats()[f"host:{host.identity}"]
+    with host.stream_command("for i in 1 2 3 4 5; do echo $i; sleep 0.2; done") as stream:
+        lines = iter(stream)
+        assert next(lines) == ("stdout", "1\n")
+        assert stats()["in_use"] == 1
+    assert stats()["in_use"] == 0
+    started = time.monotonic()
+    assert host.execute_command("echo after") == (0, "after\n", "")
+    assert time.monotonic() - started < 0.5
+
+
+def test_unstarted_stream_holds_no_slot():
+    limiter = ConcurrencyLimiter(per_host=1)
+    host = LocalHost().with_limiter(limiter)
+    stream = host.stream_command("echo never")
+    assert host.execute_command("echo now") == (0, "now\n", "")
+    stream.close()
+    with pytest.raises(RuntimeError):
+        list(stream)
+
+
+def test_multiplexer_respects_limits():
+    limiter = ConcurrencyLimiter(global_limit=2, per_host=1)
+    pool = SSHConnectionPool()
+    with LocalSSHServer() as server:
+        hosts = [server.host(f"user{i}", pool=pool).with_limiter(limiter) for i in range(3)]
+        commands = [(host, "sleep 0.2; echo done") for host in hosts for _ in range(2)]
+        try:
+            started = time.monotonic()
+            results = SSHMultiplexer().run(commands)
+            elapsed = time.monotonic() - started
+        finally:
+            pool.close_all()
+    assert results == [(0, "done\n", "")] * 6
+    # 全局最多 2 条，6 条命令至少需要 3 轮
+    assert elapsed >= 0.6
+    stats = limiter.stats()
+    assert stats["global"]["in_use"] == 0
+    assert all(stats[f"host:{host.identity}"]["acquired"] == 2 for host in hosts)
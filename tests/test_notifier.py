@@ -0,0 +1,79 @@
+import threading
+import time
+
+from wdev.hosts import LocalHost
+from wdev.notifiers import AsyncNotifier, Notifier
+from wdev.tasks import ShellTask
+from wdev.workflow import SimpleWorkflow
+
+
+class SlowNotifier(Notifier):
+    """发送一批消息耗时 latency 秒，前 failures 次发送失败"""
+
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        super().__init__("slow")
+        self.latency = latency
+        self.failures = failures
+        self.batches = []
+        self.threads = set()
+
+    def notify(self, subject: str, message: str, **kwargs) -> bool:
+        return self.notify_batch([(subject, message)])
+
+    def notify_batch(self, messages) -> bool:
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.latency)
+        if self.failures:
+            self.failures -= 1
+            return False
+        self.batches.append([subject for subject, _ in messages])
+        return True
+
+
+def workflow(name: str) -> SimpleWorkflow:
+    return SimpleWorkflow(name).add_host(LocalHost()).add_task(ShellTask("echo", "echo hi"))
+
+
+def test_workflow_does_not_wait_for_delivery():
+    target = SlowNotifier(latency=0.5)
+    flow = workflow("wf").add_notifier(target)
+    assert flow.notifiers == [AsyncNotifier.wrap(target)]
+    started = time.monotonic()
+    assert flow.execute()
+    assert time.monotonic() - started < 0.4
+    assert flow.flush_notifiers(5)
+    assert target.batches == [["工作流执行完成"]]
+    assert threading.current_thread().name not in target.threads
+
+
+def test_sync_delivery_opt_out():
+    target = SlowNotifier()
+    flow = workflow("wf").add_notifier(target, async_delivery=False)
+    flow.execute()
+    assert flow.notifiers == [target] and target.batches == [["工作流执行完成"]]
+    assert target.threads == {threading.current_thread().name}
+
+
+def test_shared_wrapper_batches_across_workflows():
+    target = SlowNotifier()
+    notifier = AsyncNotifier(target, batch_interval=0.5)
+    first, second = workflow("a").add_notifier(notifier), workflow("b").add_notifier(notifier)
+    assert AsyncNotifier.wrap(notifier) is notifier
+    first.execute()
+    second.execute()
+    assert notifier.flush(5)
+    assert target.batches == [["工作流执行完成", "工作流执行完成"]]
+    assert workflow("c").add_notifier(target).notifiers[0] is workflow("d").add_notifier(target).notifiers[0]
+
+
+def test_retries_with_backoff():
+    target = SlowNotifier(failures=2)
+    notifier = AsyncNotifier(target, max_retries=2, backoff=0.01)
+    notifier.notify("subject", "message")
+    assert notifier.flush(5)
+    assert (notifier.sent, notifier.failed, target.batches) == (1, 0, [["subject"]])
+    target.failures = 5
+    notifier.notify("lost", "message")
+    assert notifier.flush(5)
+    assert notifier.failed == 1
+    notifier.close(5)
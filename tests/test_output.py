@@ -0,0 +1,26 @@
+from wdev.tasks import TaskResult
+from wdev.tasks.output import OutputData
+
+
+def test_non_utf8_bytes_are_kept_and_decoded_with_replacement():
+    raw = b"ok \xff\xfe bad"
+    result = TaskResult(True, output=raw)
+    assert result.output == "ok �� bad"
+    assert result.output_bytes == raw
+    assert result.output_size == len(raw)
+
+
+def test_text_round_trips():
+    text = "中文输出\n" * 3
+    assert str(OutputData(text, None)) == text
+    # 孤立的代理字符也能保存
+    assert OutputData("bad \udc80", None).tobytes() == b"bad \xed\xb2\x80"
+
+
+def test_large_output_spills_to_file():
+    raw = b"\xff" + b"x" * 100
+    data = OutputData(raw, 10)
+    assert data.spilled
+    assert data.tobytes() == raw
+    assert str(data) == "�" + "x" * 100
+    assert len(data) == len(raw)
@@ -0,0 +1,80 @@
+import pytest
+
+from wdev.bench import FakeHost
+from wdev.tasks import ShellTask, TaskResult
+from wdev.workflow import SimpleWorkflow
+from wdev.workflow.plan import END, ExecutionPlan, HostRun
+
+
+def test_compile_flattens_tree_into_steps():
+    deploy = ShellTask("deploy", "echo deploy")
+    check = ShellTask("check", "echo check")
+    rollback = ShellTask("rollback", "echo rollback")
+    notify = ShellTask("notify", "echo notify")
+    deploy.set_next_success(check).set_next_failure(rollback)
+    rollback.set_next_success(notify)
+    plan = ExecutionPlan.compile([deploy, ShellTask("second", "echo second")])
+    assert [task.name for task in plan.tasks] == ["deploy", "check", "rollback", "notify", "second"]
+    assert plan.on_success == (1, END, 3, END, END)
+    assert plan.on_failure == (2, END, END, END, END)
+    assert plan.roots == (0, 4)
+    assert plan.chains == (None,) * 5
+
+
+def test_shared_task_gets_one_step_per_position():
+    cleanup = ShellTask("cleanup", "echo cleanup")
+    deploy = ShellTask("deploy", "echo deploy").set_next_success(cleanup).set_next_failure(cleanup)
+    plan = ExecutionPlan.compile([deploy, cleanup])
+    assert [task.name for task in plan.tasks] == ["deploy", "cleanup", "cleanup", "cleanup"]
+    assert plan.on_success[0] == 1 and plan.on_failure[0] == 2 and plan.roots == (0, 3)
+
+
+def test_cycle_detected():
+    first = ShellTask("first", "echo 1")
+    second = ShellTask("second", "echo 2")
+    first.set_next_success(second)
+    second.set_next_failure(first)
+    with pytest.raises(ValueError, match="first"):
+        ExecutionPlan.compile([first])
+    loop = ShellTask("loop", "echo loop")
+    loop.set_next_success(loop)
+    with pytest.raises(ValueError, match="loop"):
+        ExecutionPlan.compile([ShellTask("ok", "echo ok"), loop])
+
+
+def test_signature_follows_structure():
+    def build(branch: str):
+        root = ShellTask("root", "echo root")
+        return [getattr(root, f"set_next_{branch}")(ShellTask("next", "echo next"))]
+
+    assert ExecutionPlan.compile(build("success")).signature == ExecutionPlan.compile(build("success")).signature
+    assert ExecutionPlan.compile(build("success")).signature != ExecutionPlan.compile(build("failure")).signature
+
+
+def test_batch_chains_shared_per_task():
+    first = ShellTask("first", "echo 1")
+    first.set_next_success(ShellTask("second", "echo 2").set_next_success(ShellTask("third", "echo 3")))
+    plan = ExecutionPlan.compile([first], batch_chains=True)
+    assert [task.name for task in plan.chains[0].chain] == ["first", "second", "third"]
+    assert [task.name for task in plan.chains[1].chain] == ["second", "third"]
+    assert plan.chains[2] is None
+
+
+def test_host_run_follows_branches():
+    check = ShellTask("check", "echo check")
+    rollback = ShellTask("rollback", "echo rollback")
+    plan = ExecutionPlan.compile([ShellTask("deploy", "echo").set_next_success(check).set_next_failure(rollback)])
+    run = HostRun(plan, FakeHost("a"))
+    run.set_result(0, TaskResult(False, "", "boom"))
+    assert run.next_step(0) == 2 and run.status(0) == "失败" and run.status(1) == "未执行"
+    run.set_unreachable(2, "down")
+    assert run.status(2) == "不可达" and run.next_step(2) == END
+    assert run.executed() == [0, 2] and not run.success
+
+
+def test_workflow_reuses_plan_until_tasks_change():
+    workflow = SimpleWorkflow("wf").add_task(ShellTask("a", "echo a"))
+    plan = workflow.plan
+    assert workflow.plan is plan
+    workflow.add_task(ShellTask("b", "echo b"))
+    assert workflow.plan is not plan and len(workflow.plan) == 2
@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from wdev.hosts import LocalHost
+from wdev.tasks import PythonTask, TaskResult
+from wdev.tasks.python_task import HostUnavailableError
+
+
+class CountingCallable:
+    """记录在当前进程中被 pickle 的次数"""
+    pickled = 0
+
+    def __reduce__(self):
+        CountingCallable.pickled += 1
+        return CountingCallable, ()
+
+    def __call__(self, task, host, factor=1):
+        upstream = task.pre_task.task_results.output if task.pre_task else ""
+        return TaskResult(True, f"{upstream}{host.name}:{os.getpid()}", data=factor * 2)
+
+
+def touch_host(task, host):
+    return TaskResult(hasattr(host, "hostname"), host.execute_command("echo hi")[1])
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        yield executor
+
+
+def test_runs_in_process_pool_and_pickles_once(pool):
+    upstream = PythonTask("upstream", lambda task, host: TaskResult(True, "up/"))
+    upstream.execute(LocalHost())
+    task = PythonTask("cpu", CountingCallable(), factor=21).with_process_pool(pool)
+    task.set_pre_task(upstream)
+    CountingCallable.pickled = 0
+    result = task.execute(LocalHost())
+    assert result.success and result.data == 42
+    output, pid = result.output.rsplit(":", 1)
+    assert output == "up/localhost" and int(pid) != os.getpid()
+    assert CountingCallable.pickled == 1
+
+
+def test_unpicklable_callable_falls_back_inline(pool):
+    # lambda 无法 pickle
+    task = PythonTask("inline", lambda task, host: TaskResult(True, str(os.getpid())))
+    result = task.with_process_pool(pool).execute(LocalHost())
+    assert result.success and result.output == str(os.getpid())
+
+    strict = PythonTask("strict", lambda task, host: TaskResult(True, "")).with_process_pool(pool, inline_fallback=False)
+    result = strict.execute(LocalHost())
+    assert not result.success and "无法在进程池中执行" in result.error
+
+
+def test_detached_host_cannot_run_commands(pool):
+    result = PythonTask("host", touch_host).with_process_pool(pool).execute(LocalHost())
+    assert not result.success and "无法访问主机" in result.error
+    assert issubclass(HostUnavailableError, AttributeError)
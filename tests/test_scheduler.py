@@ -0,0 +1,82 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from wdev.hosts import LocalHost
+from wdev.tasks import PythonTask, TaskResult
+from wdev.workflow import SimpleWorkflow, WorkflowScheduler
+from wdev.workflow.cron import CronExpression
+from wdev.workflow.scheduler import WorkflowJob
+
+
+def counting_workflow(name: str, calls: list) -> SimpleWorkflow:
+    def run(task, host):
+        calls.append(time.time())
+        return TaskResult(True, "")
+    return SimpleWorkflow(name).add_host(LocalHost()).add_task(PythonTask("count", run))
+
+
+def test_cron_next_after():
+    assert CronExpression("*/15 * * * *").next_after(datetime(2024, 1, 1, 10, 7, 30)) == datetime(2024, 1, 1, 10, 15)
+    assert CronExpression("0 9 * * 1-5").next_after(datetime(2024, 1, 5, 9, 0)) == datetime(2024, 1, 8, 9, 0)
+    assert CronExpression("@monthly").next_after(datetime(2024, 12, 31, 23, 59)) == datetime(2025, 1, 1)
+    # 日和周同时受限时任一匹配即可：1 号或周日
+    assert CronExpression("0 0 1 * 0").next_after(datetime(2024, 1, 2)) == datetime(2024, 1, 7)
+    assert CronExpression("0 0 * * 7").weekdays == {0}
+    assert CronExpression("0 0 29 2 *").next_after(datetime(2024, 3, 1)) == datetime(2028, 2, 29)
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *"])
+def test_cron_rejects_invalid(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_interval_misfire_policies():
+    skip = WorkflowJob(counting_workflow("skip", []), interval=10, misfire="skip")
+    catch_up = WorkflowJob(counting_workflow("catch", []), interval=10, misfire="catch_up")
+    assert skip.next_due(100.0) == 110.0
+    for job in (skip, catch_up):
+        job._due = 110.0
+    # 调度线程被阻塞到 145 秒：skip 跳到下一个未来时间点，catch_up 逐次补跑
+    assert skip.next_due(145.0) == 150.0
+    assert catch_up.next_due(145.0) == 120.0
+    # 按计划时间累加，不受执行耗时影响
+    assert skip.next_due(112.5) == 120.0
+    with pytest.raises(ValueError):
+        WorkflowJob(counting_workflow("bad", []), interval=10, misfire="later")
+
+
+def test_pop_due_reschedules_and_drops_removed_jobs():
+    scheduler = WorkflowScheduler(status_interval=None)
+    scheduler.add_workflow(counting_workflow("catch", []), interval=10, misfire="catch_up")
+    scheduler.add_workflow(counting_workflow("skip", []), interval=10)
+    scheduler.add_workflow(counting_workflow("removed", []), interval=10)
+    catch, skip = scheduler.jobs["catch"], scheduler.jobs["skip"]
+    first_due = catch._due
+    scheduler.remove_workflow("removed")
+    now = first_due + 35
+    due = scheduler._pop_due(now)
+    # catch_up 补跑错过的 4 次，skip 只补跑一次
+    assert sorted(job.workflow.name for job, _ in due) == ["catch"] * 4 + ["skip"]
+    assert [fire_at for job, fire_at in due if job is catch] == pytest.approx([first_due + 10 * i for i in range(4)])
+    assert catch._due == pytest.approx(first_due + 40) and skip._due > now
+    assert scheduler._pop_due(now) == []
+    assert scheduler.jobs.keys() == {"catch", "skip"}
+
+
+def test_scheduler_runs_interval_job():
+    calls = []
+    scheduler = WorkflowScheduler(status_interval=None)
+    scheduler.add_workflow(counting_workflow("fast", calls), interval=0.05)
+    scheduler.start(block=False)
+    deadline = time.monotonic() + 5
+    while len(calls) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    scheduler.stop(timeout=5)
+    assert len(calls) >= 3
+    job = scheduler.jobs["fast"]
+    assert job.last_success and job.last_delay is not None
+    assert not any(thread.name.startswith("wdev-fast") for thread in threading.enumerate())
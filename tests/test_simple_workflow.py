@@ -0,0 +1,51 @@
+import time
+
+from wdev.bench import FakeHost
+from wdev.hosts import LocalHost
+from wdev.tasks import PythonTask, ShellTask, TaskResult
+from wdev.workflow import SimpleWorkflow
+
+
+def python_task(name: str, success: bool) -> PythonTask:
+    return PythonTask(name, lambda task, host: TaskResult(success, name))
+
+
+def test_execute_returns_false_when_any_task_fails():
+    workflow = SimpleWorkflow("wf").add_host(LocalHost()).add_task(python_task("ok", True))
+    assert workflow.execute()
+    workflow.add_task(python_task("bad", False).set_next_failure(python_task("recover", True)))
+    assert not workflow.execute()
+
+
+def test_task_track_view():
+    main = python_task("main", False)
+    main.set_next_success(python_task("never", True).set_next_success(python_task("deeper", True)))
+    main.set_next_failure(python_task("recover", True).set_next_success(python_task("report", True)))
+    workflow = SimpleWorkflow("wf").add_host(LocalHost()).add_task(main).add_task(python_task("second", True))
+    workflow.execute()
+    roots = workflow.task_track["localhost"]
+    assert [(node.task.name, node.status) for node in roots] == [("main", "失败"), ("second", "成功")]
+    root = roots[0]
+    assert root.result.output == "main" and "任务: main" in root.message
+    # 未执行的分支只保留一层
+    assert (root.next_success.task.name, root.next_success.status) == ("never", "未执行")
+    assert root.next_success.next_success is None
+    assert root.next_failure.status == "成功" and root.next_failure.next_success.status == "成功"
+    assert workflow.task_track is workflow.task_track
+
+
+
+def test_fan_out_keeps_host_order():
+    # 后面的主机先完成，结果仍按主机添加顺序排列
+    hosts = [FakeHost(f"h{i}", latency=(8 - i) * 0.03) for i in range(8)]
+    hosts[3].failure_rate = 1.0
+    workflow = SimpleWorkflow("wf", max_workers=8).add_hosts(hosts)
+    workflow.add_task(ShellTask("echo", "echo hi"))
+    started = time.monotonic()
+    assert not workflow.execute()
+    # 顺序执行需要 1.08 秒
+    assert time.monotonic() - started < 0.8
+    assert list(workflow.host_runs) == [host.name for host in hosts]
+    records = workflow.task_records()
+    assert [record.host for record in records] == [host.name for host in hosts]
+    assert [record.status for record in records] == ["成功"] * 3 + ["失败"] + ["成功"] * 4
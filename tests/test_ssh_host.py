@@ -0,0 +1,61 @@
+import time
+
+import paramiko
+import pytest
+
+from wdev.bench import LocalSSHServer
+from wdev.hosts import SSHConnectionPool
+
+
+@pytest.fixture
+def server():
+    with LocalSSHServer() as server:
+        yield server
+
+
+@pytest.fixture
+def pool():
+    pool = SSHConnectionPool(max_channels=1)
+    yield pool
+    pool.close_all()
+
+
+def test_execute_command(server, pool):
+    host = server.host(pool=pool)
+    assert host.execute_command("echo out; echo err >&2; exit 3") == (3, "out\n", "err\n")
+    assert pool.stats()["channels_in_use"] == 0
+
+
+def test_reconnect_retry_reacquires_channel_slot(server, pool, monkeypatch):
+    host = server.host(pool=pool)
+    stale = pool.get_client(host)
+    transport = stale.get_transport()
+
+    def broken(*args, **kwargs):
+        raise paramiko.SSHException("connection lost")
+    monkeypatch.setattr(transport, "open_session", broken)
+    acquired = []
+    original = pool.acquire
+    monkeypatch.setattr(pool, "acquire", lambda *args, **kwargs: acquired.append(1) or original(*args, **kwargs))
+
+    assert host.execute_command("echo again") == (0, "again\n", "")
+    assert len(acquired) == 2
+    assert pool.get_client(host) is not stale
+    assert pool.stats()["channels_in_use"] == 0
+
+
+def test_large_output_without_command_timeout(server, pool):
+    # 输出远大于通道窗口（2 MB），需要边等待边读取
+    host = server.host(pool=pool)
+    exit_code, output, error = host.execute_command("head -c 8000000 /dev/zero | tr '\\0' x; echo; echo done >&2")
+    assert exit_code == 0
+    assert len(output) == 8000001 and error == "done\n"
+
+
+def test_command_timeout(server, pool):
+    host = server.host(pool=pool).with_timeouts(command=0.3)
+    started = time.monotonic()
+    exit_code, _, error = host.execute_command("sleep 30")
+    assert time.monotonic() - started < 5
+    assert exit_code == 124 and "0.3" in error
+    assert host.execute_command("echo next") == (0, "next\n", "")
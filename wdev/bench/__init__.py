@@ -0,0 +1,4 @@
+from .fake_host import FakeHost
+from .ssh_server import LocalSSHServer, shell_handler, synthetic_handler
+from .runner import (workflow_scenario, scheduler_tick_scenario, notifier_scenario, run_benchmarks,
+                     write_results, compare, DEFAULT_SCENARIOS)
@@ -0,0 +1,38 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from .runner import compare, run_benchmarks, write_results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m wdev.bench", description="wdev 基准测试")
+    parser.add_argument("--out", default="bench-results.json", help="结果 JSON 文件")
+    parser.add_argument("--only", action="append", help="只运行名称以此开头的场景，可重复指定")
+    parser.add_argument("--baseline", help="与之比较的基线结果文件，出现回退时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的回退比例")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="在当前进程中执行所有场景（更快，但峰值内存为整个进程的峰值）")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(only=args.only, isolate=not args.no_isolate)
+    write_results(results, args.out)
+    for item in results["scenarios"]:
+        throughput = f"{item['throughput']:.1f}/s" if item["throughput"] is not None else "-"
+        p50 = f"{item['p50'] * 1000:.2f}ms" if item["p50"] is not None else "-"
+        p99 = f"{item['p99'] * 1000:.2f}ms" if item["p99"] is not None else "-"
+        print(f"{item['name']:<28} {throughput:>14} p50={p50:>10} p99={p99:>10} rss={item['peak_rss_kb']}KB")
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
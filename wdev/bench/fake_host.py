@@ -0,0 +1,44 @@
+import random
+import threading
+import time
+from typing import Optional, Tuple, Union
+
+from wdev.hosts import Host
+
+
+class FakeHost(Host):
+    """模拟主机：不执行命令，按配置的延迟、输出大小和失败率返回结果，用于测量 wdev 自身的开销"""
+
+    def __init__(self, name: str = "fake", latency: Union[float, Tuple[float, float]] = 0.0,
+                 output_size: int = 0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        :param latency: 每条命令的延迟（秒），可以是 (最小, 最大) 区间，在区间内均匀随机
+        :param output_size: 每条命令的标准输出字节数
+        :param failure_rate: 命令返回非 0 退出码的概率
+        :param seed: 随机数种子，便于复现
+        """
+        super().__init__(name)
+        self.latency = latency
+        self.output_size = output_size
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._output = ("x" * 79 + "\n") * (output_size // 80) + "x" * (output_size % 80)
+        self.commands = 0
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._lock:
+            self.commands += 1
+            if isinstance(self.latency, tuple):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = self.latency
+            return delay, self._random.random() < self.failure_rate
+
+    def execute_command(self, command: str) -> Tuple[int, str, str]:
+        delay, failed = self._draw()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 1, "", f"simulated failure: {command}\n"
+        return 0, self._output, ""
@@ -0,0 +1,284 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from wdev.hosts import Host, SSHConnectionPool, SSHMultiplexer
+from wdev.notifiers import AsyncNotifier, Notifier
+from wdev.tasks import ShellTask
+from wdev.workflow import DagWorkflow, SimpleWorkflow, Workflow, WorkflowScheduler
+
+from .fake_host import FakeHost
+from .ssh_server import LocalSSHServer, synthetic_handler
+
+WORKFLOW_MODES = ("sequential", "threads", "multiplexed", "dag")
+TRANSPORTS = ("fake", "ssh")
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """最近秩百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_kb() -> Optional[int]:
+    """进程启动以来的峰值常驻内存（KB），不支持的平台返回 None
+        run_benchmarks 默认在独立子进程中执行每个场景，因此结果中的值只包含该场景
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上单位是字节
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _summary(name: str, params: dict, operations: int, wall: float, latencies: List[float], **extra) -> dict:
+    result = {
+        "name": name,
+        "params": params,
+        "operations": operations,
+        "wall_seconds": wall,
+        "throughput": operations / wall if wall > 0 else None,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    result.update(extra)
+    return result
+
+
+@contextlib.contextmanager
+def _quiet(enabled: bool = True):
+    """屏蔽执行过程中的打印输出"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _build_workflow(name: str, hosts: List[Host], tasks: int, depth: int, mode: str) -> Workflow:
+    if mode == "dag":
+        workflow = DagWorkflow(name, max_workers=max(1, len(hosts)))
+    elif mode == "multiplexed":
+        workflow = SimpleWorkflow(name, multiplexer=SSHMultiplexer())
+    else:
+        workflow = SimpleWorkflow(name, max_workers=len(hosts) if mode == "threads" else 1)
+    for host in hosts:
+        workflow.add_host(host)
+    for i in range(tasks):
+        previous = None
+        for level in range(depth):
+            task = ShellTask(f"t{i}-{level}", f"echo {i}-{level}")
+            if mode == "dag":
+                workflow.add_task(task, depends_on=[previous] if previous is not None else None)
+            elif previous is None:
+                workflow.add_task(task)
+            else:
+                previous.set_next_success(task)
+            previous = task
+    return workflow
+
+
+def workflow_scenario(hosts: int = 10, tasks: int = 5, depth: int = 3, mode: str = "threads",
+                      transport: str = "fake", latency: Union[float, Tuple[float, float]] = 0.0,
+                      output_size: int = 0, failure_rate: float = 0.0, repeat: int = 3,
+                      seed: Optional[int] = 0) -> dict:
+    """N 台主机 × M 个任务 × 成功分支深度 D 的工作流
+
+    :param mode: sequential 逐台主机、threads 每台主机一个线程、multiplexed 按批次推进、dag 依赖图
+    :param transport: fake 使用 FakeHost，ssh 连接进程内的 LocalSSHServer（failure_rate 不生效）
+    :param repeat: 重复执行次数，吞吐量按总任务数 / 总耗时计算，延迟取每个任务的耗时
+    """
+    if mode not in WORKFLOW_MODES:
+        raise ValueError(f"mode 必须是 {WORKFLOW_MODES} 之一")
+    if transport not in TRANSPORTS:
+        raise ValueError(f"transport 必须是 {TRANSPORTS} 之一")
+    params = {"hosts": hosts, "tasks": tasks, "depth": depth, "mode": mode, "transport": transport,
+              "latency": latency, "output_size": output_size, "failure_rate": failure_rate, "repeat": repeat}
+    server = pool = None
+    if transport == "ssh":
+        server = LocalSSHServer(synthetic_handler(latency if isinstance(latency, (int, float)) else latency[1],
+                                                  output_size))
+        server.start()
+        pool = SSHConnectionPool()
+        host_list = [server.host(f"bench{i}", pool=pool, name=f"ssh-{i}") for i in range(hosts)]
+    else:
+        host_list = [FakeHost(f"fake-{i}", latency, output_size, failure_rate,
+                              None if seed is None else seed + i) for i in range(hosts)]
+    try:
+        workflow = _build_workflow(f"bench-{mode}", host_list, tasks, depth, mode)
+        latencies: List[float] = []
+        operations = failures = 0
+        wall = 0.0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            workflow.execute()
+            wall += time.perf_counter() - started
+            for record in workflow.task_records():
+                if record.result is None:
+                    continue
+                operations += 1
+                failures += not record.result.success
+                if record.duration is not None:
+                    latencies.append(record.duration)
+    finally:
+        if server is not None:
+            server.close()
+        if pool is not None:
+            pool.close_all()
+    return _summary(f"workflow/{transport}/{mode}", params, operations, wall, latencies, failures=failures)
+
+
+class _TickWorkflow(Workflow):
+    """记录调度器实际触发延迟的空工作流"""
+
+    def __init__(self, name: str, scheduler: WorkflowScheduler, delays: List[float]):
+        super().__init__(name)
+        self.scheduler = scheduler
+        self.delays = delays
+
+    def print_task_routes(self) -> str:
+        return ""
+
+    def execute(self) -> bool:
+        delay = self.scheduler.jobs[self.name].last_delay
+        if delay is not None:
+            self.delays.append(delay)
+        return True
+
+
+def scheduler_tick_scenario(workflows: int = 50, interval: float = 0.05, duration: float = 3.0,
+                            async_mode: bool = False) -> dict:
+    """大量短间隔工作流同时调度时，实际触发时间相对计划时间的延迟"""
+    params = {"workflows": workflows, "interval": interval, "duration": duration, "async_mode": async_mode}
+    delays: List[float] = []
+    scheduler = WorkflowScheduler(status_interval=None, max_workers=max(1, workflows))
+    with _quiet():
+        for i in range(workflows):
+            scheduler.add_workflow(_TickWorkflow(f"tick-{i}", scheduler, delays), interval=interval,
+                                   async_mode=async_mode)
+        started = time.perf_counter()
+        scheduler.start(block=False)
+        time.sleep(duration)
+        scheduler.stop()
+        wall = time.perf_counter() - started
+    return _summary("scheduler/tick", params, len(delays), wall, delays)
+
+
+class _CountingNotifier(Notifier):
+    """只计数的通知器，可模拟每次发送的耗时"""
+
+    def __init__(self, send_latency: float = 0.0):
+        super().__init__("counting")
+        self.send_latency = send_latency
+        self.messages = 0
+        self.sends = 0
+
+    def notify(self, subject: str, message: str, **kwargs) -> bool:
+        return self.notify_batch([(subject, message)])
+
+    def notify_batch(self, messages: List[Tuple[str, str]]) -> bool:
+        if self.send_latency:
+            time.sleep(self.send_latency)
+        self.messages += len(messages)
+        self.sends += 1
+        return True
+
+
+def notifier_scenario(messages: int = 10000, message_size: int = 256, send_latency: float = 0.001,
+                      batch_interval: float = 0.0, max_batch: int = 100) -> dict:
+    """AsyncNotifier 的吞吐量：延迟为 notify 调用本身的耗时，吞吐量包含发送完所有消息的时间"""
+    params = {"messages": messages, "message_size": message_size, "send_latency": send_latency,
+              "batch_interval": batch_interval, "max_batch": max_batch}
+    target = _CountingNotifier(send_latency)
+    notifier = AsyncNotifier(target, batch_interval=batch_interval, max_batch=max_batch)
+    body = "x" * message_size
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for i in range(messages):
+        call_started = time.perf_counter()
+        notifier.notify(f"message {i}", body)
+        latencies.append(time.perf_counter() - call_started)
+    notifier.flush()
+    wall = time.perf_counter() - started
+    notifier.close()
+    return _summary("notifier/async", params, target.messages, wall, latencies, sends=target.sends)
+
+
+# 默认场景：(名称, 函数, 参数)
+DEFAULT_SCENARIOS = [
+    ("workflow/fake/sequential", workflow_scenario, {"hosts": 10, "tasks": 5, "depth": 4, "mode": "sequential"}),
+    ("workflow/fake/threads", workflow_scenario,
+     {"hosts": 50, "tasks": 5, "depth": 4, "mode": "threads", "latency": (0.001, 0.005)}),
+    ("workflow/fake/dag", workflow_scenario,
+     {"hosts": 20, "tasks": 5, "depth": 4, "mode": "dag", "latency": (0.001, 0.005), "failure_rate": 0.05}),
+    ("workflow/ssh/multiplexed", workflow_scenario,
+     {"hosts": 10, "tasks": 3, "depth": 3, "mode": "multiplexed", "transport": "ssh", "output_size": 4096}),
+    ("scheduler/tick", scheduler_tick_scenario, {"workflows": 50, "interval": 0.05, "duration": 2.0}),
+    ("notifier/async", notifier_scenario, {"messages": 10000, "send_latency": 0.001}),
+]
+
+
+def _run_isolated(func, kwargs: dict) -> dict:
+    """在新启动的子进程中执行场景，使峰值内存不受之前场景的影响"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(func, **kwargs).result()
+
+
+def run_benchmarks(scenarios=None, only: Optional[List[str]] = None, isolate: bool = True) -> dict:
+    """依次执行场景，返回可写入 JSON 的结果
+
+    :param isolate: 每个场景在独立子进程中执行（函数需可 pickle，即模块级函数）；
+                    为 False 时在当前进程执行，peak_rss_kb 为进程启动以来的峰值，各场景之间不可比较
+    """
+    results = []
+    for name, func, kwargs in scenarios or DEFAULT_SCENARIOS:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        print(f"Running {name} ...")
+        result = _run_isolated(func, kwargs) if isolate else func(**kwargs)
+        result["name"] = name
+        results.append(result)
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scenarios": results,
+    }
+
+
+def write_results(results: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2) -> List[str]:
+    """与基线比较，返回吞吐量下降或 p99 延迟上升超过 tolerance 的场景说明"""
+    previous: Dict[str, dict] = {item["name"]: item for item in baseline.get("scenarios", [])}
+    regressions = []
+    for item in current.get("scenarios", []):
+        base = previous.get(item["name"])
+        if base is None:
+            continue
+        if base.get("throughput") and item.get("throughput") is not None \
+                and item["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{item['name']}: throughput {base['throughput']:.1f} -> {item['throughput']:.1f}")
+        if base.get("p99") and item.get("p99") is not None and item["p99"] > base["p99"] * (1 + tolerance):
+            regressions.append(f"{item['name']}: p99 {base['p99'] * 1000:.2f}ms -> {item['p99'] * 1000:.2f}ms")
+    return regressions
@@ -0,0 +1,306 @@
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import paramiko
+
+from wdev.hosts import SSHHost
+from wdev.hosts.ssh_pool import SSHConnectionPool
+
+# (退出码, 标准输出, 标准错误)
+CommandHandler = Callable[[str], Tuple[int, bytes, bytes]]
+
+_host_key: Optional[paramiko.RSAKey] = None
+_host_key_lock = threading.Lock()
+
+
+def _default_host_key() -> paramiko.RSAKey:
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+def shell_handler(command: str) -> Tuple[int, bytes, bytes]:
+    """通过本地 /bin/sh 执行命令"""
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    return process.returncode, out, err
+
+
+def synthetic_handler(latency: float = 0.0, output_size: int = 0) -> CommandHandler:
+    """不执行命令，固定延迟后返回指定大小的输出"""
+    output = (b"x" * 79 + b"\n") * (output_size // 80) + b"x" * (output_size % 80)
+
+    def handler(command: str) -> Tuple[int, bytes, bytes]:
+        if latency:
+            time.sleep(latency)
+        return 0, output, b""
+    return handler
+
+
+def _close_after_peer(channel: paramiko.Channel, timeout: float = 10.0):
+    """等客户端先关闭通道（最多 timeout 秒）再关闭
+
+    exec 请求的应答在 check_channel_exec_request 返回后才发出，命令很快结束时立即关闭通道，
+    关闭消息可能先于应答到达客户端，导致客户端报 Channel closed。
+    """
+    channel.settimeout(timeout)
+    try:
+        while channel.recv(65536):
+            pass
+    except (socket.timeout, OSError):
+        pass
+    channel.close()
+
+
+class _LocalSFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _LocalSFTPServer(paramiko.SFTPServerInterface):
+    """把 SFTP 请求映射到本地文件系统"""
+
+    def list_folder(self, path):
+        try:
+            result = []
+            for name in os.listdir(path):
+                attr = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(path, name)))
+                attr.filename = name
+                result.append(attr)
+            return result
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        try:
+            mode = getattr(attr, "st_mode", None) or 0o644
+            fd = os.open(path, flags, mode)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            fmode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            fmode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            fmode = "rb"
+        handle = _LocalSFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, fmode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        try:
+            os.rename(oldpath, newpath)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def posix_rename(self, oldpath, newpath):
+        try:
+            os.replace(oldpath, newpath)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(path, getattr(attr, "st_mode", None) or 0o755)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rmdir(self, path):
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def chattr(self, path, attr):
+        try:
+            if attr.st_mode is not None:
+                os.chmod(path, attr.st_mode)
+            if attr.st_atime is not None and attr.st_mtime is not None:
+                os.utime(path, (attr.st_atime, attr.st_mtime))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, handler: CommandHandler):
+        self.handler = handler
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        if command == b"/bin/sh":
+            # SSHShellSession 通过 exec /bin/sh 打开长驻会话
+            return self.check_channel_shell_request(channel)
+
+        def run():
+            try:
+                exit_code, out, err = self.handler(command.decode(errors="replace"))
+                channel.sendall(out)
+                channel.sendall_stderr(err)
+                channel.send_exit_status(exit_code)
+            except Exception as e:
+                channel.sendall_stderr(str(e).encode())
+                channel.send_exit_status(255)
+            finally:
+                channel.shutdown_write()
+                _close_after_peer(channel)
+        threading.Thread(target=run, name="wdev-bench-exec", daemon=True).start()
+        return True
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        # 长驻会话：把通道接到本地 /bin/sh 上
+        def pump(source, send):
+            while True:
+                data = source.read1(65536)
+                if not data:
+                    break
+                send(data)
+
+        def run():
+            process = subprocess.Popen("/bin/sh", stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+            pumps = [threading.Thread(target=pump, args=(process.stdout, channel.sendall), daemon=True),
+                     threading.Thread(target=pump, args=(process.stderr, channel.sendall_stderr), daemon=True)]
+            for thread in pumps:
+                thread.start()
+            try:
+                while True:
+                    data = channel.recv(65536)
+                    if not data:
+                        break
+                    process.stdin.write(data)
+                    process.stdin.flush()
+            except OSError:
+                pass
+            finally:
+                process.stdin.close()
+                process.wait()
+                for thread in pumps:
+                    thread.join(1)
+                channel.send_exit_status(process.returncode)
+                channel.close()
+        threading.Thread(target=run, name="wdev-bench-shell", daemon=True).start()
+        return True
+
+
+class LocalSSHServer:
+    """绑定在 127.0.0.1 上的进程内 SSH 服务（基于 paramiko），用于基准测试和本地调试
+
+    任意用户名和密码都可以登录；exec 请求交给 handler 处理（默认通过本地 /bin/sh 执行），
+    shell 请求接到本地 /bin/sh，并提供映射到本地文件系统的 SFTP 子系统。
+    """
+
+    def __init__(self, handler: Optional[CommandHandler] = None, host_key: Optional[paramiko.PKey] = None):
+        self.handler = handler or shell_handler
+        self.host_key = host_key or _default_host_key()
+        self._socket: Optional[socket.socket] = None
+        self._transports: List[paramiko.Transport] = []
+        self._lock = threading.Lock()
+        self.port: Optional[int] = None
+
+    def start(self) -> int:
+        """开始监听，返回端口号"""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(128)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept_loop, args=(self._socket,), name="wdev-bench-sshd", daemon=True).start()
+        return self.port
+
+    def _accept_loop(self, listener: socket.socket):
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            # 本地回环上的小包往返，关闭 Nagle 避免与延迟确认叠加出几十毫秒的等待
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _LocalSFTPServer)
+            try:
+                transport.start_server(server=_ServerInterface(self.handler))
+            except (paramiko.SSHException, EOFError, OSError):
+                continue
+            with self._lock:
+                self._transports.append(transport)
+
+    def host(self, username: str = "bench", pool: Optional[SSHConnectionPool] = None, name: Optional[str] = None,
+             **kwargs) -> SSHHost:
+        """返回连接到本服务的 SSHHost；不同用户名对应连接池中不同的连接
+        :param name: 主机名称（默认 127.0.0.1），模拟多台主机时用于区分
+        """
+        host = SSHHost("127.0.0.1", username, password="bench", port=self.port, pool=pool, **kwargs)
+        if name:
+            host.name = name
+        return host
+
+    def close(self):
+        if self._socket is not None:
+            # 只 close 不会唤醒阻塞在 accept 中的线程，服务停止后仍会接受新连接
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._socket.close()
+            self._socket = None
+        with self._lock:
+            for transport in self._transports:
+                transport.close()
+            self._transports.clear()
+
+    def __enter__(self) -> "LocalSSHServer":
+        if self.port is None:
+            self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
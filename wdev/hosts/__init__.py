@@ -1,3 +1,11 @@
-from .host import Host
+from .host import Host, CommandStream
+from .breaker import CircuitBreaker, HostUnreachableError, default_breaker
+from .cancel import CancelToken, TaskCancelledError, cancel_scope, current_token
+from .facts import FactsCache, default_facts_cache
+from .limiter import AIMD, ConcurrencyLimiter, default_limiter
 from .local_host import LocalHost
-from .ssh_host import SSHHost
\ No newline at end of file
+from .ssh_pool import SSHConnectionPool
+from .ssh_host import SSHHost
+from .ssh_multiplexer import SSHMultiplexer
+from .transfer import FileTransfer, LocalFileTransfer, SFTPFileTransfer
+from .inventory import Inventory, HostSelection
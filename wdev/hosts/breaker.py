@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from wdev.hosts import Host
+
+
+class HostUnreachableError(ConnectionError):
+    """主机不可达：连接失败（重试后仍失败）或熔断器处于打开状态"""
+
+    def __init__(self, host_name: str, reason: str):
+        super().__init__(f"主机 {host_name} 不可达: {reason}")
+        self.host_name = host_name
+        self.reason = reason
+
+
+class _Circuit:
+    """单台主机的熔断状态"""
+    __slots__ = ("host", "failures", "opened_at", "next_probe", "probes", "last_error")
+
+    def __init__(self, host: "Host"):
+        self.host = host
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.next_probe = 0.0
+        self.probes = 0
+        self.last_error = ""
+
+
+class CircuitBreaker:
+    """按主机的熔断器
+
+    同一主机连续 failure_threshold 次连接失败后打开：该主机上的命令立即抛出 HostUnreachableError，
+    不再等待连接超时；打开期间由后台线程每 probe_interval 秒尝试连接一次（Host.probe），成功后关闭。
+    命令本身的失败（非零退出码、命令超时）不计入。
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = 3, probe_interval: float = 30.0, probe_workers: int = 8):
+        """
+        :param failure_threshold: 打开熔断器的连续连接失败次数，None 表示不熔断
+        :param probe_interval: 打开后探测主机的间隔（秒）
+        :param probe_workers: 同时探测的主机数
+        """
+        self._lock = threading.Lock()
+        # 主机标识 -> 状态，只保存失败过的主机
+        self._circuits: Dict[str, _Circuit] = {}
+        # 处于打开状态的主机标识 -> 状态
+        self._open: Dict[str, _Circuit] = {}
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.probe_workers = probe_workers
+        self.configure(failure_threshold, probe_interval)
+
+    def configure(self, failure_threshold: Optional[int] = 3, probe_interval: float = 30.0) -> "CircuitBreaker":
+        if failure_threshold is not None and failure_threshold < 1:
+            raise ValueError("failure_threshold 必须大于等于 1")
+        if probe_interval <= 0:
+            raise ValueError("probe_interval 必须大于 0")
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        if failure_threshold is None:
+            self.reset()
+        return self
+
+    def is_open(self, host: "Host") -> bool:
+        return bool(self._open) and host.identity in self._open
+
+    def check(self, host: "Host"):
+        """熔断器打开时抛出 HostUnreachableError"""
+        if not self._open:
+            return
+        circuit = self._open.get(host.identity)
+        if circuit is not None:
+            raise HostUnreachableError(host.name, f"连续 {circuit.failures} 次连接失败，等待恢复（{circuit.last_error}）")
+
+    def record_success(self, host: "Host"):
+        if not self._circuits:
+            return
+        with self._lock:
+            circuit = self._circuits.pop(host.identity, None)
+            reopened = self._open.pop(host.identity, None)
+        if circuit is not None and reopened is not None:
+            print(f"主机 {host.name} 已恢复连接，熔断器关闭")
+
+    def record_failure(self, host: "Host", error: BaseException):
+        if self.failure_threshold is None:
+            return
+        key = host.identity
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None:
+                circuit = self._circuits[key] = _Circuit(host)
+            circuit.failures += 1
+            circuit.last_error = str(error) or type(error).__name__
+            if key in self._open or circuit.failures < self.failure_threshold:
+                return
+            circuit.opened_at = time.monotonic()
+            circuit.next_probe = circuit.opened_at + self.probe_interval
+            self._open[key] = circuit
+            self._ensure_prober()
+        print(f"主机 {host.name} 连续 {circuit.failures} 次连接失败，熔断器打开: {circuit.last_error}")
+
+    def reset(self, host: Optional["Host"] = None):
+        """关闭某台主机（或全部主机）的熔断器并清空失败计数"""
+        with self._lock:
+            if host is None:
+                self._circuits.clear()
+                self._open.clear()
+            else:
+                self._circuits.pop(host.identity, None)
+                self._open.pop(host.identity, None)
+        self._wakeup.set()
+
+    def _ensure_prober(self):
+        # 调用方持有 self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._probe_loop, name="wdev-breaker-probe", daemon=True)
+            self._thread.start()
+        else:
+            self._wakeup.set()
+
+    def _probe(self, circuit: _Circuit):
+        host = circuit.host
+        try:
+            host.probe()
+        except Exception as e:
+            with self._lock:
+                circuit.probes += 1
+                circuit.last_error = str(e) or type(e).__name__
+                circuit.next_probe = time.monotonic() + self.probe_interval
+            return
+        self.record_success(host)
+
+    def _probe_loop(self):
+        with ThreadPoolExecutor(max_workers=self.probe_workers, thread_name_prefix="wdev-breaker") as executor:
+            while True:
+                self._wakeup.clear()
+                with self._lock:
+                    if not self._open:
+                        self._thread = None
+                        return
+                    now = time.monotonic()
+                    due = [circuit for circuit in self._open.values() if circuit.next_probe <= now]
+                    delay = min(circuit.next_probe for circuit in self._open.values()) - now
+                if due:
+                    list(executor.map(self._probe, due))
+                else:
+                    self._wakeup.wait(delay)
+
+    def stats(self) -> Dict[str, dict]:
+        """失败过的主机：连续失败次数、是否打开、已打开的秒数、探测次数和最近的错误"""
+        now = time.monotonic()
+        with self._lock:
+            circuits: List[_Circuit] = list(self._circuits.values())
+            opened = set(self._open)
+        return {circuit.host.name: {
+            "failures": circuit.failures,
+            "open": circuit.host.identity in opened,
+            "open_seconds": now - circuit.opened_at if circuit.host.identity in opened else 0.0,
+            "probes": circuit.probes,
+            "last_error": circuit.last_error,
+        } for circuit in circuits}
+
+
+# 进程级默认熔断器：连续 3 次连接失败后打开，每 30 秒探测一次
+default_breaker = CircuitBreaker()
@@ -0,0 +1,162 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+# 取消原因，同时作为工作流中步骤的状态
+TIMEOUT = "超时"
+CANCELLED = "已取消"
+
+# 命令被终止时的退出码（与 timeout 命令和 Ctrl+C 一致）
+TIMEOUT_EXIT_CODE = 124
+CANCEL_EXIT_CODE = 130
+
+
+class TaskCancelledError(Exception):
+    """任务超时或被取消"""
+
+    def __init__(self, reason: str = CANCELLED):
+        super().__init__(f"任务{reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """取消令牌
+
+    调用 cancel() 或到达截止时间后 cancelled 为 True，父令牌取消时子令牌一并取消。
+    主机执行命令时使用当前线程的令牌（见 cancel_scope）：令牌取消后本地命令的进程组被杀死、
+    SSH 命令的通道被关闭，返回已收到的输出和退出码 124（超时）或 130（取消）。
+    PythonTask 的可调用对象通过 task.cancel_token 检查或等待。
+    """
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CancelToken"] = None,
+                 internal: bool = False):
+        """
+        :param timeout: 从现在起的最长时间（秒），None 表示没有截止时间（仍受父令牌限制）
+        :param internal: 令牌不会被调用 cancel()（如没有超时的工作流内部令牌），只能因截止时间或父令牌而取消
+        """
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.parent = parent
+        self.internal = internal
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self._unlink = parent.on_cancel(self._cancel_from_parent) if parent is not None else None
+
+    def _cancel_from_parent(self):
+        self.cancel(self.parent.reason or CANCELLED)
+
+    def cancel(self, reason: str = CANCELLED):
+        """取消令牌并立即调用已注册的回调（如终止正在执行的命令）"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"取消回调执行失败: {str(e)}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """注册取消时的回调（已取消时立即调用），返回用于注销的函数
+            到达截止时间不会触发回调，等待命令的一方需要自行使用 remaining() 作为超时
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def close(self):
+        """不再使用的子令牌从父令牌上注销"""
+        if self._unlink is not None:
+            self._unlink()
+            self._unlink = None
+
+    @property
+    def cancellable(self) -> bool:
+        """令牌是否可能被取消（自身或父令牌有截止时间，或可能被调用 cancel()）"""
+        token = self
+        while token is not None:
+            if token.deadline is not None or not token.internal:
+                return True
+            token = token.parent
+        return False
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    @property
+    def reason(self) -> Optional[str]:
+        """取消原因：TIMEOUT / CANCELLED（或 cancel() 传入的原因），未取消时为 None"""
+        if self._event.is_set():
+            return self._reason
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return TIMEOUT
+        return self.parent.reason if self.parent is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """距最近的截止时间（含父令牌）的秒数，已取消时为 0，没有截止时间时为 None"""
+        if self._event.is_set():
+            return 0.0
+        remaining = None
+        if self.deadline is not None:
+            remaining = max(0.0, self.deadline - time.monotonic())
+        if self.parent is not None:
+            inherited = self.parent.remaining()
+            if inherited is not None and (remaining is None or inherited < remaining):
+                remaining = inherited
+        return remaining
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待最多 timeout 秒（不超过截止时间），返回令牌是否已取消；可代替 time.sleep 使用"""
+        remaining = self.remaining()
+        if remaining is not None and (timeout is None or remaining < timeout):
+            timeout = remaining
+        self._event.wait(timeout)
+        return self.cancelled
+
+    def raise_if_cancelled(self):
+        reason = self.reason
+        if reason is not None:
+            raise TaskCancelledError(reason)
+
+    def interrupted(self, output: str = "", error: str = "") -> Tuple[int, str, str]:
+        """命令因令牌取消而终止时的返回值"""
+        reason = self.reason or CANCELLED
+        exit_code = TIMEOUT_EXIT_CODE if reason == TIMEOUT else CANCEL_EXIT_CODE
+        return exit_code, output, error + f"命令{reason}，已终止\n"
+
+    def __reduce__(self):
+        # 传给进程池时只保留剩余时间
+        return CancelToken, (self.remaining(),)
+
+
+_local = threading.local()
+
+
+def current_token() -> Optional[CancelToken]:
+    """当前线程正在使用的取消令牌"""
+    return getattr(_local, "token", None)
+
+
+@contextmanager
+def cancel_scope(token: Optional[CancelToken]):
+    """在当前线程中使用 token，期间执行的命令受其控制"""
+    previous = getattr(_local, "token", None)
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
@@ -0,0 +1,256 @@
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from wdev.hosts import Host, SSHMultiplexer
+
+_MARKER = "@@wdev-facts:"
+
+# 一条命令收集全部信息，各部分以标记行分隔；缺少的命令或文件只会让对应部分为空
+FACTS_SCRIPT = "; ".join([
+    f"echo '{_MARKER}os'",
+    'echo "system=$(uname -s)"', 'echo "release=$(uname -r)"', 'echo "machine=$(uname -m)"',
+    'echo "hostname=$(uname -n)"', "cat /etc/os-release 2>/dev/null",
+    f"echo '{_MARKER}cpu'",
+    'echo "count=$(nproc 2>/dev/null || getconf _NPROCESSORS_ONLN 2>/dev/null)"',
+    "grep -m1 '^model name' /proc/cpuinfo 2>/dev/null",
+    'echo "load=$(cat /proc/loadavg 2>/dev/null)"',
+    'echo "uptime=$(cat /proc/uptime 2>/dev/null)"',
+    f"echo '{_MARKER}memory'", "cat /proc/meminfo 2>/dev/null",
+    f"echo '{_MARKER}disks'", "df -P -k 2>/dev/null",
+    f"echo '{_MARKER}processes'", "ps -eo pid=,ppid=,user=,pcpu=,pmem=,rss=,comm= 2>/dev/null",
+    f"echo '{_MARKER}ports'", "(ss -Htlnu 2>/dev/null || netstat -tlnu 2>/dev/null)",
+    "true",
+])
+
+FACTS_COMMAND = "sh -c " + shlex.quote(FACTS_SCRIPT)
+
+
+def _key_values(lines: List[str], separator: str = "=") -> Dict[str, str]:
+    values = {}
+    for line in lines:
+        key, sep, value = line.partition(separator)
+        if sep:
+            values[key.strip()] = value.strip().strip('"')
+    return values
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_os(lines: List[str]) -> Dict[str, Any]:
+    values = _key_values(lines)
+    return {
+        "system": values.get("system"),
+        "release": values.get("release"),
+        "machine": values.get("machine"),
+        "hostname": values.get("hostname"),
+        "distribution": values.get("ID"),
+        "distribution_version": values.get("VERSION_ID"),
+        "pretty_name": values.get("PRETTY_NAME"),
+    }
+
+
+def _parse_cpu(lines: List[str]) -> Dict[str, Any]:
+    values = _key_values(lines)
+    model = _key_values(lines, ":").get("model name")
+    load = values.get("load", "").split()
+    uptime = values.get("uptime", "").split()
+    return {
+        "count": _to_int(values.get("count")),
+        "model": model,
+        "load": [float(value) for value in load[:3]] if len(load) >= 3 else None,
+        "uptime": float(uptime[0]) if uptime else None,
+    }
+
+
+def _parse_memory(lines: List[str]) -> Dict[str, Any]:
+    # /proc/meminfo 中的单位是 kB
+    values = {key: _to_int(value.split()[0]) if value else None for key, value in _key_values(lines, ":").items()}
+
+    def size(key: str) -> Optional[int]:
+        value = values.get(key)
+        return value * 1024 if value is not None else None
+
+    return {"total": size("MemTotal"), "available": size("MemAvailable"), "free": size("MemFree"),
+            "swap_total": size("SwapTotal"), "swap_free": size("SwapFree")}
+
+
+def _parse_disks(lines: List[str]) -> List[Dict[str, Any]]:
+    disks = []
+    for line in lines[1:]:
+        parts = line.split()
+        # 挂载点中可能有空格
+        if len(parts) < 6 or not parts[1].isdigit():
+            continue
+        disks.append({
+            "filesystem": parts[0],
+            "size": int(parts[1]) * 1024,
+            "used": int(parts[2]) * 1024,
+            "available": int(parts[3]) * 1024,
+            "use_percent": _to_int(parts[4].rstrip("%")),
+            "mount": " ".join(parts[5:]),
+        })
+    return disks
+
+
+def _parse_processes(lines: List[str]) -> List[Dict[str, Any]]:
+    processes = []
+    for line in lines:
+        parts = line.split(None, 6)
+        if len(parts) < 7 or not parts[0].isdigit():
+            continue
+        processes.append({
+            "pid": int(parts[0]),
+            "ppid": _to_int(parts[1]),
+            "user": parts[2],
+            "cpu": float(parts[3]),
+            "mem": float(parts[4]),
+            "rss": (_to_int(parts[5]) or 0) * 1024,
+            "command": parts[6],
+        })
+    return processes
+
+
+def _parse_ports(lines: List[str]) -> List[Dict[str, Any]]:
+    ports = set()
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 4:
+            continue
+        if parts[1] in ("LISTEN", "UNCONN"):
+            # ss: Netid State Recv-Q Send-Q Local:Port Peer:Port
+            protocol, local = parts[0], parts[4] if len(parts) > 4 else ""
+        elif parts[0].startswith(("tcp", "udp")) and parts[1].isdigit():
+            # netstat: Proto Recv-Q Send-Q Local:Port Foreign:Port [State]
+            protocol, local = parts[0], parts[3]
+        else:
+            continue
+        address, _, port = local.rpartition(":")
+        if port.isdigit():
+            ports.add((protocol.rstrip("6"), address.strip("[]"), int(port)))
+    return [{"protocol": protocol, "address": address, "port": port}
+            for protocol, address, port in sorted(ports, key=lambda item: (item[2], item[0], item[1]))]
+
+
+_PARSERS = {"os": _parse_os, "cpu": _parse_cpu, "memory": _parse_memory, "disks": _parse_disks,
+            "processes": _parse_processes, "ports": _parse_ports}
+
+
+def parse_facts(output: str) -> Dict[str, Any]:
+    """解析 FACTS_SCRIPT 的输出"""
+    sections: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+    for line in output.splitlines():
+        if line.startswith(_MARKER):
+            current = sections.setdefault(line[len(_MARKER):].strip(), [])
+        elif current is not None and line.strip():
+            current.append(line)
+    facts = {name: parser(sections.get(name, [])) for name, parser in _PARSERS.items()}
+    facts["process_count"] = len(facts["processes"])
+    facts["gathered_at"] = time.time()
+    return facts
+
+
+class FactsCache:
+    """按主机缓存的主机信息，过期后下次访问时重新收集
+
+    同一主机同时只有一个线程在收集，其余线程等待并使用其结果。
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        """
+        :param ttl: 默认有效期（秒）
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # 主机标识 -> (过期时间, 信息)
+        self._facts: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._host_locks: Dict[str, threading.Lock] = {}
+
+    def _host_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            lock = self._host_locks.get(key)
+            if lock is None:
+                lock = self._host_locks[key] = threading.Lock()
+            return lock
+
+    def _fresh(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._facts.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def put(self, host: "Host", facts: Dict[str, Any], ttl: Optional[float] = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._facts[host.identity] = (expires, facts)
+
+    def get(self, host: "Host", ttl: Optional[float] = None, refresh: bool = False) -> Dict[str, Any]:
+        """返回主机信息，未缓存、已过期或 refresh 时执行一条命令重新收集"""
+        key = host.identity
+        if not refresh:
+            facts = self._fresh(key)
+            if facts is not None:
+                return facts
+        with self._host_lock(key):
+            if not refresh:
+                facts = self._fresh(key)
+                if facts is not None:
+                    return facts
+            exit_code, output, error = host.execute_command(FACTS_COMMAND)
+            if _MARKER not in output:
+                raise RuntimeError(f"收集主机 {host.name} 的信息失败: {error.strip() or exit_code}")
+            facts = parse_facts(output)
+            self.put(host, facts, ttl)
+            return facts
+
+    def prefetch(self, hosts: Iterable["Host"], multiplexer: Optional["SSHMultiplexer"] = None,
+                 max_workers: int = 16, ttl: Optional[float] = None) -> Dict[str, str]:
+        """预先收集多台主机的信息，返回收集失败的 主机名 -> 错误信息
+        :param multiplexer: 指定后 SSHHost 的命令由该引擎在单线程中并发执行
+        """
+        hosts = [host for host in hosts if self._fresh(host.identity) is None]
+        errors: Dict[str, str] = {}
+        if multiplexer is not None:
+            from wdev.hosts import SSHHost
+            remote = [host for host in hosts if isinstance(host, SSHHost)]
+            hosts = [host for host in hosts if not isinstance(host, SSHHost)]
+            outputs = multiplexer.run([(host, FACTS_COMMAND) for host in remote]) if remote else []
+            for host, (exit_code, output, error) in zip(remote, outputs):
+                if _MARKER in output:
+                    self.put(host, parse_facts(output), ttl)
+                else:
+                    errors[host.name] = error.strip() or f"exit code {exit_code}"
+
+        def gather(host: "Host"):
+            try:
+                self.get(host, ttl)
+            except Exception as e:
+                errors[host.name] = str(e)
+
+        if hosts:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(hosts))),
+                                    thread_name_prefix="wdev-facts") as executor:
+                list(executor.map(gather, hosts))
+        return errors
+
+    def invalidate(self, host: Optional["Host"] = None):
+        """清除某台主机（或全部主机）的缓存"""
+        with self._lock:
+            if host is None:
+                self._facts.clear()
+            else:
+                self._facts.pop(host.identity, None)
+
+
+# 进程级共享的主机信息缓存
+default_facts_cache = FactsCache()
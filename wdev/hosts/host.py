@@ -1,14 +1,224 @@
+import codecs
+import functools
 from abc import ABC, abstractmethod
-from typing import Tuple
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+from wdev.hosts.breaker import CircuitBreaker, default_breaker
+from wdev.hosts.cancel import current_token
+from wdev.hosts.facts import FactsCache, default_facts_cache
+from wdev.hosts.limiter import ConcurrencyLimiter, default_limiter
+
+# 行回调：on_line(流名称, 行)，流名称为 "stdout" 或 "stderr"
+LineCallback = Callable[[str, str], None]
+LineSource = Generator[Tuple[str, str], None, int]
+
+
+class LineSplitter:
+    """把字节块增量解码并切分为行（保留换行符），超长的行按 max_line 截断输出"""
+
+    def __init__(self, max_line: int = 65536):
+        self.max_line = max_line
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        parts = (self._pending + self._decoder.decode(data)).split("\n")
+        self._pending = parts.pop()
+        lines = [part + "\n" for part in parts]
+        while len(self._pending) >= self.max_line:
+            lines.append(self._pending[:self.max_line])
+            self._pending = self._pending[self.max_line:]
+        return lines
+
+    def flush(self) -> List[str]:
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        return [text] if text else []
+
+
+class CommandStream:
+    """命令的流式输出
+
+    迭代得到 (流名称, 行)，迭代结束后可通过 exit_code 获取退出码。
+    只能迭代一次；提前停止迭代时调用 close()（或使用 with 语句）终止命令并释放限流名额。
+    """
+
+    def __init__(self, source: LineSource, on_line: Optional[LineCallback] = None,
+                 acquire: Optional[Callable[[], Callable[[], None]]] = None):
+        """
+        :param acquire: 开始迭代时占用限流名额，返回释放名额的函数；命令结束或 close() 时立即释放
+        """
+        self._source = source
+        self._running: Optional[LineSource] = None
+        self._acquire = acquire
+        self._release: Optional[Callable[[], None]] = None
+        self.on_line = on_line
+        self.exit_code: Optional[int] = None
+
+    def __iter__(self):
+        source, self._source = self._source, None
+        if source is None:
+            raise RuntimeError("CommandStream 只能迭代一次")
+        self._running = source
+        if self._acquire is not None:
+            self._release = self._acquire()
+        try:
+            while True:
+                try:
+                    stream, line = next(source)
+                except StopIteration as stop:
+                    self.exit_code = stop.value
+                    break
+                if self.on_line:
+                    self.on_line(stream, line)
+                yield stream, line
+        finally:
+            self.close()
+
+    def close(self):
+        """终止尚未结束的命令并释放限流名额"""
+        source, self._running = self._running or self._source, None
+        self._source = None
+        if source is not None:
+            source.close()
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __enter__(self) -> "CommandStream":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def wait(self) -> int:
+        """消费剩余输出并返回退出码"""
+        for _ in self:
+            pass
+        return self.exit_code
+
+
+def _limited(execute_command):
+    """让子类实现的 execute_command 在限流器的名额内执行，熔断器打开时直接抛出 HostUnreachableError，
+        当前线程的取消令牌已取消时不再执行
+    """
+    @functools.wraps(execute_command)
+    def wrapper(self, command: str) -> Tuple[int, str, str]:
+        self.check_reachable()
+        token = current_token()
+        if token is not None and token.cancelled:
+            return token.interrupted()
+        limiter = self.limiter or default_limiter
+        if not limiter.active:
+            return execute_command(self, command)
+        return limiter.run(self, execute_command, self, command)
+    wrapper._limited = True
+    return wrapper
 
 
 class Host(ABC):
-    """主机基类，定义主机操作的接口"""
+    """主机基类，定义主机操作的接口
+
+    子类实现的 execute_command 会自动经过限流器（见 with_limiter），任务和可调用对象中的直接调用也受限制；
+    主机的熔断器打开时（见 with_breaker）直接抛出 HostUnreachableError。
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        execute_command = cls.__dict__.get("execute_command")
+        if execute_command is not None and not getattr(execute_command, "_limited", False) \
+                and not getattr(execute_command, "__isabstractmethod__", False):
+            cls.execute_command = _limited(execute_command)
 
     def __init__(self, name: str):
         self.name = name
+        # 所属的组（用于按组限流，从主机清单创建时自动设置）
+        self.groups: Tuple[str, ...] = ()
+        # 使用的限流器，None 表示使用进程级默认限流器
+        self.limiter: Optional[ConcurrencyLimiter] = None
+        # 使用的熔断器，None 表示使用进程级默认熔断器
+        self.breaker: Optional[CircuitBreaker] = None
+        # 主机变量（如从主机清单加载的自定义变量）
+        self.vars: Dict[str, Any] = {}
+        # 主机信息的有效期（秒，None 使用缓存的默认值）和缓存（None 使用进程级共享缓存）
+        self.facts_ttl: Optional[float] = None
+        self.facts_cache: Optional[FactsCache] = None
+
+    @property
+    def identity(self) -> str:
+        """区分不同主机的标识（用于缓存等）"""
+        return f"{type(self).__name__}:{self.name}"
+
+    def with_limiter(self, limiter: ConcurrencyLimiter) -> 'Host':
+        """使用指定的限流器（默认使用进程级 default_limiter）"""
+        self.limiter = limiter
+        return self
+
+    def with_breaker(self, breaker: CircuitBreaker) -> 'Host':
+        """使用指定的熔断器（默认使用进程级 default_breaker）"""
+        self.breaker = breaker
+        return self
+
+    @property
+    def reachable(self) -> bool:
+        """熔断器是否处于关闭状态"""
+        return not (self.breaker or default_breaker).is_open(self)
+
+    def check_reachable(self):
+        """熔断器打开时抛出 HostUnreachableError"""
+        (self.breaker or default_breaker).check(self)
+
+    def probe(self):
+        """检查主机能否连接，不能连接时抛出异常（熔断器打开后在后台调用）；默认认为可以连接"""
+        pass
+
+    def with_facts_cache(self, ttl: float, cache: Optional[FactsCache] = None) -> 'Host':
+        """设置主机信息的有效期（秒）和使用的缓存"""
+        self.facts_ttl = ttl
+        self.facts_cache = cache
+        return self
+
+    @property
+    def facts(self) -> Dict[str, Any]:
+        """主机信息：os / cpu / memory / disks / processes / ports 等
+            通过一条命令收集并按主机缓存，有效期内再次读取不会执行命令
+        """
+        return (self.facts_cache or default_facts_cache).get(self, self.facts_ttl)
+
+    def gather_facts(self) -> Dict[str, Any]:
+        """立即重新收集主机信息"""
+        return (self.facts_cache or default_facts_cache).get(self, self.facts_ttl, refresh=True)
 
     @abstractmethod
     def execute_command(self, command: str) -> Tuple[int, str, str]:
         """执行命令并返回退出码、标准输出和标准错误"""
-        pass
\ No newline at end of file
+        pass
+
+    def close(self):
+        """释放主机占用的资源（如长驻 shell 会话）"""
+        pass
+
+    def open_transfer(self, chunk_size: Optional[int] = None):
+        """打开文件传输会话（FileTransfer），由支持文件传输的子类实现"""
+        raise NotImplementedError(f"{type(self).__name__} 不支持文件传输")
+
+    def stream_command(self, command: str, on_line: Optional[LineCallback] = None) -> CommandStream:
+        """执行命令并按行流式返回输出，不在内存中保留完整输出
+            没有迭代完时应调用 close() 或使用 with 语句，及时终止命令并释放限流名额
+        """
+        self.check_reachable()
+        limiter = self.limiter or default_limiter
+        # 默认实现通过 execute_command 执行，已经经过限流器
+        acquire = None
+        if limiter.active and type(self)._stream_lines is not Host._stream_lines:
+            acquire = functools.partial(limiter.hold, self)
+        return CommandStream(self._stream_lines(command), on_line, acquire)
+
+    def _stream_lines(self, command: str) -> LineSource:
+        """默认实现：完整执行后再按行切分，子类可覆盖为真正的流式读取"""
+        exit_code, output, error = self.execute_command(command)
+        for line in output.splitlines(keepends=True):
+            yield "stdout", line
+        for line in error.splitlines(keepends=True):
+            yield "stderr", line
+        return exit_code
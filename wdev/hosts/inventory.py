@@ -0,0 +1,376 @@
+import fnmatch
+import os
+import re
+import threading
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import yaml
+
+from wdev.hosts import Host
+from wdev.hosts.local_host import LocalHost
+from wdev.hosts.ssh_host import SSHHost
+from wdev.hosts.ssh_pool import SSHConnectionPool
+
+# 用于创建主机对象的变量，其余变量保存在 Host.vars 中
+CONNECTION_KEYS = ("connection", "hostname", "username", "password", "key_filename", "port", "session",
+                   "connect_timeout", "command_timeout", "retries")
+
+_RANGE = re.compile(r"\[([0-9]+|[a-z]):([0-9]+|[a-z])\]")
+# 选择模式中的分隔符：逗号，或方括号之外的冒号（web-[01:03] 中的冒号属于范围）
+_SEPARATOR = re.compile(r",|:(?![^\[]*\])")
+
+
+def expand_hosts(pattern: str) -> List[str]:
+    """展开主机名中的范围：web-[01:03] -> web-01, web-02, web-03；db-[a:c] -> db-a, db-b, db-c"""
+    match = _RANGE.search(pattern)
+    if match is None:
+        return [pattern]
+    start, end = match.groups()
+    head, tail = pattern[:match.start()], pattern[match.end():]
+    if start.isdigit() and end.isdigit():
+        width = len(start) if start.startswith("0") else 0
+        values = [str(i).zfill(width) for i in range(int(start), int(end) + 1)]
+    elif start.isalpha() and end.isalpha():
+        values = [chr(c) for c in range(ord(start), ord(end) + 1)]
+    else:
+        raise ValueError(f"无效的主机范围: {pattern}")
+    return [name for value in values for name in expand_hosts(f"{head}{value}{tail}")]
+
+
+def parse_shard(shard: Union[str, Tuple[int, int]]) -> Tuple[int, int]:
+    """解析 "3/8" 或 (3, 8)，序号从 1 开始"""
+    if isinstance(shard, str):
+        index, _, count = shard.partition("/")
+        shard = (int(index), int(count))
+    index, count = shard
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"无效的分片: {index}/{count}")
+    return index, count
+
+
+class _HostRecord:
+    """紧凑的主机记录：变量 = 共享的组变量 profile（由所属的组决定）+ 主机自身的覆盖值"""
+    __slots__ = ("name", "overrides")
+
+    def __init__(self, name: str, overrides: Optional[Dict[str, Any]]):
+        self.name = name
+        self.overrides = overrides
+
+
+class HostSelection:
+    """按模式选出的一组主机（只保存序号），迭代时才创建主机对象"""
+
+    def __init__(self, inventory: "Inventory", indices: Sequence[int]):
+        self.inventory = inventory
+        self.indices = array("L", indices)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __iter__(self) -> Iterator[Host]:
+        for index in self.indices:
+            yield self.inventory._host_at(index)
+
+    @property
+    def names(self) -> List[str]:
+        records = self.inventory._records
+        return [records[index].name for index in self.indices]
+
+    def shard(self, shard: Union[str, Tuple[int, int]]) -> "HostSelection":
+        """按主机名哈希分片，主机增减时其余主机所在的分片不变"""
+        index, count = parse_shard(shard)
+        records = self.inventory._records
+        return HostSelection(self.inventory, [i for i in self.indices
+                                              if zlib.crc32(records[i].name.encode()) % count == index - 1])
+
+    def limit(self, count: int) -> "HostSelection":
+        return HostSelection(self.inventory, self.indices[:count])
+
+    def __repr__(self) -> str:
+        return f"HostSelection({len(self)} hosts)"
+
+
+class Inventory:
+    """主机清单
+
+    从 YAML 加载主机、组和变量，格式：
+
+        defaults:                 # 所有主机的默认变量
+          username: root
+        groups:
+          web:
+            vars: {port: 2222}
+            hosts:
+              - web-[01:50].example.com
+              - {name: web-canary, hostname: 10.0.0.9, canary: true}
+          prod:
+            children: [web]       # 子组的主机也属于该组
+        hosts:                    # 不属于任何组的主机
+          - localhost: {connection: local}
+
+    变量优先级：defaults < 组变量 < 主机变量。组变量同样作用于通过 children 间接所属的主机，
+    父组在前、子组在后（同一层级按组定义顺序）合并，例如上例中 web 的变量覆盖 prod 的变量。
+    只保存名称和共享的变量，主机对象（及其连接）在工作流实际用到时才创建。
+    """
+
+    def __init__(self, defaults: Optional[Dict[str, Any]] = None, pool: Optional[SSHConnectionPool] = None):
+        """
+        :param pool: 创建 SSHHost 时使用的连接池，默认使用进程级共享连接池
+        """
+        self.pool = pool
+        self._records: List[_HostRecord] = []
+        self._index: Dict[str, int] = {}
+        # profile 是合并后的变量字典，多台主机共享；(已有 profile, 组名) -> 合并组变量后的 profile
+        self._profiles: List[Dict[str, Any]] = [dict(defaults or {})]
+        self._merged: Dict[Tuple[int, str], int] = {}
+        self._groups: Dict[str, array] = {}
+        self._group_vars: Dict[str, Dict[str, Any]] = {}
+        self._children: Dict[str, List[str]] = {}
+        self._hosts: Dict[int, Host] = {}
+        # 主机序号 -> (所属的组（含通过 children 间接所属的组）, profile)，首次读取变量或创建主机对象时才计算
+        self._memberships: Optional[Dict[int, Tuple[Tuple[str, ...], int]]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, pool: Optional[SSHConnectionPool] = None) -> "Inventory":
+        """从 YAML 文件加载（有 libyaml 时使用 C 解析器）"""
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        with open(path, encoding="utf-8") as f:
+            data = yaml.load(f, Loader=loader) or {}
+        return cls.from_dict(data, pool)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], pool: Optional[SSHConnectionPool] = None) -> "Inventory":
+        inventory = cls(data.get("defaults"), pool)
+        groups = data.get("groups") or {}
+        for group, spec in groups.items():
+            spec = spec or {}
+            inventory.add_group(group, spec.get("vars"), spec.get("children"))
+        for group, spec in groups.items():
+            for entry in (spec or {}).get("hosts") or []:
+                inventory._add_entry(entry, group)
+        for entry in data.get("hosts") or []:
+            inventory._add_entry(entry, None)
+        return inventory
+
+    def _add_entry(self, entry: Union[str, Dict[str, Any]], group: Optional[str]):
+        # 支持 "name"、{name: ..., 变量...} 和 {name: {变量...}} 三种写法
+        if isinstance(entry, str):
+            name, host_vars = entry, None
+        elif "name" in entry:
+            host_vars = dict(entry)
+            name = host_vars.pop("name")
+        elif len(entry) == 1:
+            name, host_vars = next(iter(entry.items()))
+        else:
+            raise ValueError(f"无效的主机条目: {entry}")
+        for expanded in expand_hosts(str(name)):
+            self.add_host(expanded, [group] if group else (), **(host_vars or {}))
+
+    def add_group(self, name: str, group_vars: Optional[Dict[str, Any]] = None,
+                  children: Optional[List[str]] = None) -> "Inventory":
+        self._memberships = None
+        self._groups.setdefault(name, array("L"))
+        if group_vars:
+            self._group_vars.setdefault(name, {}).update(group_vars)
+            # 组变量变化后已合并的 profile 失效
+            self._profiles = self._profiles[:1]
+            self._merged.clear()
+        if children:
+            self._children.setdefault(name, []).extend(children)
+        return self
+
+    def _profile_with(self, profile: int, group: str) -> int:
+        group_vars = self._group_vars.get(group)
+        if not group_vars:
+            return profile
+        key = (profile, group)
+        merged = self._merged.get(key)
+        if merged is None:
+            merged = self._merged[key] = len(self._profiles)
+            self._profiles.append({**self._profiles[profile], **group_vars})
+        return merged
+
+    def add_host(self, name: str, groups: Sequence[str] = (), **host_vars) -> "Inventory":
+        """添加主机，重复添加时加入新的组并合并变量"""
+        self._memberships = None
+        index = self._index.get(name)
+        if index is None:
+            index = self._index[name] = len(self._records)
+            self._records.append(_HostRecord(name, None))
+        record = self._records[index]
+        for group in groups:
+            members = self._groups.setdefault(group, array("L"))
+            if not members or members[-1] != index:
+                members.append(index)
+        if host_vars:
+            record.overrides = {**(record.overrides or {}), **host_vars}
+        self._hosts.pop(index, None)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    @property
+    def groups(self) -> List[str]:
+        return list(self._groups)
+
+    def vars(self, name: str) -> Dict[str, Any]:
+        """主机合并后的变量"""
+        index = self._index[name]
+        return {**self._profiles[self._membership(index)[1]], **(self._records[index].overrides or {})}
+
+    def _group_members(self, group: str, seen: Optional[Set[str]] = None) -> Set[int]:
+        seen = seen if seen is not None else set()
+        if group in seen:
+            return set()
+        seen.add(group)
+        members = set(self._groups.get(group, ()))
+        for child in self._children.get(group, ()):
+            members |= self._group_members(child, seen)
+        return members
+
+    def _match(self, term: str) -> Set[int]:
+        if term in ("all", "*"):
+            return set(range(len(self._records)))
+        if term in self._groups:
+            return self._group_members(term)
+        if term in self._index:
+            return {self._index[term]}
+        if term.startswith("~"):
+            regex = re.compile(term[1:])
+            return {i for i, record in enumerate(self._records) if regex.search(record.name)}
+        if _RANGE.search(term):
+            # 范围按主机名展开，清单中不存在的主机忽略
+            matched: Set[int] = set()
+            for name in expand_hosts(term):
+                if name in self._index:
+                    matched.add(self._index[name])
+                elif any(c in name for c in "*?["):
+                    matched |= self._match(name)
+            return matched
+        if any(c in term for c in "*?["):
+            regex = re.compile(fnmatch.translate(term))
+            return {i for i, record in enumerate(self._records) if regex.match(record.name)}
+        raise ValueError(f"没有匹配的组或主机: {term}")
+
+    def select(self, pattern: str = "all", shard: Optional[Union[str, Tuple[int, int]]] = None) -> HostSelection:
+        """按模式选择主机
+
+        模式由逗号或冒号分隔的项组成，每项可以是组名、主机名、范围（web-[01:03]，与清单中的写法相同）、
+        通配符（web-*）或正则（~web-\\d+）；前缀 & 表示取交集，! 表示排除，例如 "web,db:&prod:!canary"。
+        方括号内的冒号属于范围，不作为分隔符。
+        :param shard: 只取其中一个分片，如 "3/8" 表示按主机名哈希分为 8 份中的第 3 份
+        """
+        selected: Set[int] = set()
+        intersections: List[Set[int]] = []
+        exclusions: Set[int] = set()
+        for term in _SEPARATOR.split(pattern):
+            term = term.strip()
+            if not term:
+                continue
+            if term.startswith("&"):
+                intersections.append(self._match(term[1:]))
+            elif term.startswith("!"):
+                exclusions |= self._match(term[1:])
+            else:
+                selected |= self._match(term)
+        for members in intersections:
+            selected &= members
+        selection = HostSelection(self, sorted(selected - exclusions))
+        return selection.shard(shard) if shard is not None else selection
+
+    def host(self, name: str) -> Host:
+        """主机对象，首次访问时创建"""
+        return self._host_at(self._index[name])
+
+    def _host_at(self, index: int) -> Host:
+        host = self._hosts.get(index)
+        if host is None:
+            with self._lock:
+                host = self._hosts.get(index)
+                if host is None:
+                    host = self._hosts[index] = self._create(self._records[index])
+        return host
+
+    def _ancestors(self, direct: Tuple[str, ...], parents: Dict[str, List[str]]) -> Dict[str, int]:
+        """直接所属的组及其所有父组 -> 与主机之间的最大层数（直接所属为 0）"""
+        depths: Dict[str, int] = {}
+
+        def visit(group: str, depth: int, path: Tuple[str, ...]):
+            if group in path or depths.get(group, -1) >= depth:
+                return
+            depths[group] = depth
+            for parent in parents.get(group, ()):
+                visit(parent, depth + 1, path + (group,))
+
+        for group in direct:
+            visit(group, 0, ())
+        return depths
+
+    def _membership(self, index: int) -> Tuple[Tuple[str, ...], int]:
+        """主机所属的组和合并后的 profile；直接所属的组相同的主机共享同一结果"""
+        if self._memberships is None:
+            direct: Dict[int, List[str]] = {}
+            for group, members in self._groups.items():
+                for member in members:
+                    direct.setdefault(member, []).append(group)
+            parents: Dict[str, List[str]] = {}
+            for parent, children in self._children.items():
+                for child in children:
+                    parents.setdefault(child, []).append(parent)
+            order = {group: i for i, group in enumerate(self._groups)}
+            resolved: Dict[Tuple[str, ...], Tuple[Tuple[str, ...], int]] = {}
+            memberships = {}
+            for member, groups in direct.items():
+                key = tuple(groups)
+                entry = resolved.get(key)
+                if entry is None:
+                    depths = self._ancestors(key, parents)
+                    profile = 0
+                    for group in sorted(depths, key=lambda g: (-depths[g], order.get(g, len(order)))):
+                        profile = self._profile_with(profile, group)
+                    entry = resolved[key] = (tuple(sorted(depths, key=lambda g: order.get(g, len(order)))), profile)
+                memberships[member] = entry
+            self._memberships = memberships
+        return self._memberships.get(index, ((), 0))
+
+    def _create(self, record: _HostRecord) -> Host:
+        groups, profile = self._membership(self._index[record.name])
+        host_vars = {**self._profiles[profile], **(record.overrides or {})}
+        if host_vars.get("connection", "ssh") == "local":
+            host = LocalHost(session=bool(host_vars.get("session", False)))
+            host.name = record.name
+        else:
+            password = host_vars.get("password")
+            key_filename = host_vars.get("key_filename")
+            host = SSHHost(
+                str(host_vars.get("hostname", record.name)),
+                str(host_vars.get("username", "root")),
+                password=os.path.expandvars(str(password)) if password is not None else None,
+                key_filename=os.path.expanduser(str(key_filename)) if key_filename is not None else None,
+                port=int(host_vars.get("port", 22)),
+                pool=self.pool,
+                session=bool(host_vars.get("session", False)),
+                connect_timeout=float(host_vars.get("connect_timeout", 10.0)),
+                command_timeout=float(host_vars["command_timeout"]) if host_vars.get("command_timeout") else None,
+            )
+            if "retries" in host_vars:
+                host.with_retry(int(host_vars["retries"]))
+            host.name = record.name
+        host.vars = {key: value for key, value in host_vars.items() if key not in CONNECTION_KEYS}
+        host.groups = groups
+        return host
+
+    def forget(self, selection: Optional[HostSelection] = None):
+        """释放已创建的主机对象（关闭长驻会话），下次访问时重新创建"""
+        with self._lock:
+            indices = list(self._hosts) if selection is None else list(selection.indices)
+            hosts = [self._hosts.pop(index) for index in indices if index in self._hosts]
+        for host in hosts:
+            host.close()
@@ -0,0 +1,256 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from wdev.metrics import instrumentation
+
+if TYPE_CHECKING:
+    from wdev.hosts import Host
+
+# SSH 客户端在连接失败等情况下返回的退出码
+_CONNECTION_ERROR = 255
+
+
+class AIMD:
+    """加性增、乘性减的并发调整策略
+
+    命令成功且耗时不超过 target_latency 时，每完成约 limit 条命令上限加 increase；
+    命令出错（抛出异常或退出码 255）或超时时上限乘以 decrease，cooldown 秒内最多下调一次。
+    """
+
+    def __init__(self, target_latency: float = 1.0, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 increase: float = 1.0, decrease: float = 0.5, cooldown: Optional[float] = None):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("需要满足 1 <= min_limit <= initial <= max_limit")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease 必须在 0 和 1 之间")
+        self.target_latency = target_latency
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = target_latency if cooldown is None else cooldown
+
+
+class _Slot:
+    """上限可调整的信号量，同时统计等待次数和时间"""
+    __slots__ = ("limit", "in_use", "cond", "aimd", "last_decrease", "acquired", "waited", "wait_seconds",
+                 "max_wait")
+
+    def __init__(self, limit: float, aimd: Optional[AIMD] = None):
+        self.limit = float(limit)
+        self.in_use = 0
+        self.cond = threading.Condition()
+        self.aimd = aimd
+        self.last_decrease = 0.0
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self) -> float:
+        """占用一个名额，返回等待的秒数"""
+        with self.cond:
+            self.acquired += 1
+            if self.in_use < max(1, int(self.limit)):
+                self.in_use += 1
+                return 0.0
+            started = time.monotonic()
+            while self.in_use >= max(1, int(self.limit)):
+                self.cond.wait()
+            self.in_use += 1
+            waited = time.monotonic() - started
+            self.waited += 1
+            self.wait_seconds += waited
+            self.max_wait = max(self.max_wait, waited)
+            return waited
+
+    def try_acquire(self) -> bool:
+        """不等待地占用一个名额，名额已满时返回 False"""
+        with self.cond:
+            if self.in_use >= max(1, int(self.limit)):
+                return False
+            self.acquired += 1
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self.cond:
+            self.in_use -= 1
+            self.cond.notify()
+
+    def feedback(self, latency: float, error: bool):
+        aimd = self.aimd
+        if aimd is None:
+            return
+        with self.cond:
+            before = int(self.limit)
+            if error or latency > aimd.target_latency:
+                now = time.monotonic()
+                if now - self.last_decrease >= aimd.cooldown:
+                    self.limit = max(float(aimd.min_limit), self.limit * aimd.decrease)
+                    self.last_decrease = now
+            else:
+                self.limit = min(float(aimd.max_limit), self.limit + aimd.increase / self.limit)
+            if int(self.limit) > before:
+                self.cond.notify_all()
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {"limit": int(self.limit), "in_use": self.in_use, "acquired": self.acquired,
+                    "waited": self.waited, "wait_seconds": self.wait_seconds, "max_wait": self.max_wait}
+
+
+class ConcurrencyLimiter:
+    """限制对主机同时执行的命令数
+
+    每条命令依次占用全局、所属各组（Host.groups）和该主机的名额（固定顺序，避免互相等待），
+    未配置的层级不做限制。指定 aimd 时每台主机的上限按命令耗时和错误率自动调整。
+    等待时间记录在 stats() 中，并以 wait 阶段上报给 metrics。
+    """
+
+    def __init__(self, global_limit: Optional[int] = None, per_host: Optional[int] = None,
+                 per_group: Optional[Dict[str, int]] = None, aimd: Optional[AIMD] = None):
+        """
+        :param global_limit: 所有主机合计的并发命令数上限
+        :param per_host: 每台主机的并发命令数上限（指定 aimd 时由 aimd 控制）
+        :param per_group: 组名 -> 该组所有主机合计的上限
+        """
+        self._lock = threading.Lock()
+        self._slots: Dict[str, _Slot] = {}
+        # 当前线程已占用名额的主机，嵌套调用不再重复占用
+        self._local = threading.local()
+        self.configure(global_limit, per_host, per_group, aimd)
+
+    def configure(self, global_limit: Optional[int] = None, per_host: Optional[int] = None,
+                  per_group: Optional[Dict[str, int]] = None, aimd: Optional[AIMD] = None) -> "ConcurrencyLimiter":
+        """重新设置上限（统计数据一并清空），正在执行的命令不受影响"""
+        for limit in [global_limit, per_host, *(per_group or {}).values()]:
+            if limit is not None and limit < 1:
+                raise ValueError("并发上限必须大于等于 1")
+        with self._lock:
+            self.global_limit = global_limit
+            self.per_host = per_host
+            self.per_group = dict(per_group or {})
+            self.aimd = aimd
+            self._slots = {}
+            self._global = _Slot(global_limit) if global_limit is not None else None
+        return self
+
+    @property
+    def active(self) -> bool:
+        return self._global is not None or self.per_host is not None or bool(self.per_group) \
+            or self.aimd is not None
+
+    def _slot(self, key: str, limit: float, aimd: Optional[AIMD] = None) -> _Slot:
+        slot = self._slots.get(key)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._slots[key] = _Slot(limit, aimd)
+        return slot
+
+    def _host_slot(self, host: "Host") -> Optional[_Slot]:
+        if self.aimd is not None:
+            return self._slot(f"host:{host.identity}", self.aimd.initial, self.aimd)
+        if self.per_host is not None:
+            return self._slot(f"host:{host.identity}", self.per_host)
+        return None
+
+    def _slots_for(self, host: "Host") -> List[_Slot]:
+        slots = [self._global] if self._global is not None else []
+        for group in sorted(set(host.groups)):
+            limit = self.per_group.get(group)
+            if limit is not None:
+                slots.append(self._slot(f"group:{group}", limit))
+        host_slot = self._host_slot(host)
+        if host_slot is not None:
+            slots.append(host_slot)
+        return slots
+
+    def _held(self) -> set:
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = set()
+        return held
+
+    @contextmanager
+    def slot(self, host: "Host"):
+        """占用执行一条命令所需的全部名额，返回是否实际占用（当前线程已占用该主机的名额时不再占用）"""
+        held = self._held()
+        key = host.identity
+        if key in held:
+            yield False
+            return
+        release = self.hold(host)
+        held.add(key)
+        try:
+            yield True
+        finally:
+            held.discard(key)
+            release()
+
+    def hold(self, host: "Host", blocking: bool = True) -> Optional[Callable[[], None]]:
+        """占用执行一条命令所需的全部名额，返回释放名额的函数（可重复调用）
+
+        与 slot() 不同，名额不记在当前线程上，用于流式命令和多路复用器：命令运行期间在其他线程或回调中
+        对同一主机执行的命令仍需占用名额，命令结束或被放弃时由调用方立即释放。
+        :param blocking: 为 False 时不等待，任一名额已满则返回 None
+        """
+        slots = self._slots_for(host)
+        acquired = []
+        waited = 0.0
+        try:
+            for slot in slots:
+                if blocking:
+                    waited += slot.acquire()
+                elif not slot.try_acquire():
+                    for held in reversed(acquired):
+                        held.release()
+                    return None
+                acquired.append(slot)
+        except BaseException:
+            for slot in reversed(acquired):
+                slot.release()
+            raise
+        if waited:
+            instrumentation.record("wait", waited, host=host.name)
+
+        def release():
+            while acquired:
+                acquired.pop().release()
+        return release
+
+    def run(self, host: "Host", func, *args, **kwargs):
+        """在名额内调用 func（通常是主机的 execute_command），并把耗时和错误反馈给 AIMD"""
+        with self.slot(host) as acquired:
+            if self.aimd is None or not acquired:
+                return func(*args, **kwargs)
+            started = time.monotonic()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = isinstance(result, tuple) and bool(result) and result[0] == _CONNECTION_ERROR
+                return result
+            finally:
+                self.feedback(host, time.monotonic() - started, error)
+
+    def feedback(self, host: "Host", latency: float, error: bool):
+        """把一条命令的耗时和是否出错反馈给 AIMD（未启用 AIMD 时不做任何事）"""
+        if self.aimd is not None:
+            self._host_slot(host).feedback(latency, error)
+
+    def stats(self) -> Dict[str, dict]:
+        """各名额的当前上限、使用中数量、占用次数、等待次数、总等待时间和最长等待时间"""
+        with self._lock:
+            slots = dict(self._slots)
+        if self._global is not None:
+            slots["global"] = self._global
+        return {key: slot.stats() for key, slot in sorted(slots.items())}
+
+
+# 进程级默认限流器，默认不限制；通过 default_limiter.configure(...) 启用
+default_limiter = ConcurrencyLimiter()
@@ -1,22 +1,154 @@
+import os
+import selectors
+import signal
 import subprocess
-from typing import Tuple, Optional
+from typing import Dict, List, Optional, Tuple
 
 from wdev.hosts import Host
+from wdev.hosts.cancel import current_token
+from wdev.hosts.host import LineSource, LineSplitter
+from wdev.hosts.session import LocalShellSession
+from wdev.hosts.transfer import DEFAULT_CHUNK_SIZE, LocalFileTransfer
+from wdev.metrics import instrumentation
+
+
+def _descendants(pid: int) -> List[int]:
+    """通过 /proc 查找进程的所有子孙进程（非 Linux 系统返回空列表）"""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 格式：pid (comm) state ppid ...，comm 中可能包含空格和括号
+        ppid = int(stat[stat.rindex(b")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    result = []
+    stack = [pid]
+    while stack:
+        for child in children.get(stack.pop(), ()):
+            result.append(child)
+            stack.append(child)
+    return result
+
+
+def _kill(process: subprocess.Popen, group: bool):
+    """杀死命令及其子进程：命令在独立的进程组中时杀死整个进程组，否则逐个杀死子孙进程"""
+    if process.poll() is not None:
+        return
+    if group:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except (ProcessLookupError, PermissionError, AttributeError):
+            pass
+    for pid in _descendants(process.pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    process.kill()
 
 
 class LocalHost(Host):
     """本地主机实现"""
 
-    def __init__(self):
+    def __init__(self, session: bool = False):
+        """
+        :param session: 是否使用长驻 shell 会话执行命令（省去每条命令启动 shell 的开销）
+        """
         super().__init__("localhost")
+        self.session = LocalShellSession() if session else None
 
     def execute_command(self, command: str) -> Tuple[int, str, str]:
+        token = current_token()
+        with instrumentation.timer("exec", host=self.name):
+            if self.session is not None:
+                return self.session.execute_command(command, token)
+            # 可能超时或被取消时命令在独立的进程组中执行，终止时连同其子进程一起杀死；
+            # 否则留在当前进程组中，终端的 Ctrl+C 可以直接传给命令（取消时逐个杀死子孙进程）
+            group = token is not None and token.cancellable
+            process = subprocess.Popen(
+                command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=group
+            )
+            unregister = token.on_cancel(lambda: _kill(process, group)) if token is not None else None
+            try:
+                stdout, stderr = process.communicate(timeout=token.remaining() if token is not None else None)
+            except subprocess.TimeoutExpired:
+                _kill(process, group)
+                stdout, stderr = process.communicate()
+            except BaseException:
+                # KeyboardInterrupt 等：不留下孤儿进程
+                _kill(process, group)
+                process.wait()
+                raise
+            finally:
+                if unregister is not None:
+                    unregister()
+            if token is not None and token.cancelled and process.returncode < 0:
+                return token.interrupted(stdout, stderr)
+            return process.returncode, stdout, stderr
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+    def open_transfer(self, chunk_size: Optional[int] = None) -> LocalFileTransfer:
+        return LocalFileTransfer(chunk_size or DEFAULT_CHUNK_SIZE)
+
+    def _stream_lines(self, command: str) -> LineSource:
+        token = current_token()
+        group = token is not None and token.cancellable
         process = subprocess.Popen(
             command,
             shell=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True
+            start_new_session=group
         )
-        stdout, stderr = process.communicate()
-        return process.returncode, stdout, stderr
\ No newline at end of file
+        unregister = token.on_cancel(lambda: _kill(process, group)) if token is not None else None
+        selector = selectors.DefaultSelector()
+        selector.register(process.stdout, selectors.EVENT_READ, ("stdout", LineSplitter()))
+        selector.register(process.stderr, selectors.EVENT_READ, ("stderr", LineSplitter()))
+        try:
+            while selector.get_map():
+                events = selector.select(token.remaining() if token is not None else None)
+                if not events and token is not None and token.cancelled:
+                    # 到达截止时间：终止后继续读到 EOF
+                    _kill(process, group)
+                for key, _ in events:
+                    stream, splitter = key.data
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        lines = splitter.feed(data)
+                    else:
+                        selector.unregister(key.fileobj)
+                        lines = splitter.flush()
+                    for line in lines:
+                        yield stream, line
+            exit_code = process.wait()
+            if token is not None and token.cancelled and exit_code < 0:
+                exit_code, _, message = token.interrupted()
+                yield "stderr", message
+            return exit_code
+        finally:
+            if unregister is not None:
+                unregister()
+            selector.close()
+            if process.poll() is None:
+                _kill(process, group)
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
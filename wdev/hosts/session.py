@@ -0,0 +1,205 @@
+import os
+import selectors
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+import paramiko
+
+from wdev.hosts.cancel import CancelToken
+
+
+class ShellSession(ABC):
+    """长驻 shell 会话
+
+    所有命令写入同一个 shell 进程执行，不再为每条命令创建进程/通道。
+    每条命令在子 shell 中通过 eval 执行（工作目录、环境变量和 exit 不影响会话），
+    执行结束后分别向标准输出和标准错误写入哨兵标记，用于切分输出并获取退出码。
+    同一会话中的命令串行执行；命令超时或被取消时关闭整个会话，下一条命令重新启动 shell。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _start(self):
+        """启动 shell"""
+        pass
+
+    @abstractmethod
+    def is_alive(self) -> bool:
+        """shell 是否仍可用"""
+        pass
+
+    @abstractmethod
+    def _write(self, data: bytes):
+        """写入 shell 的标准输入"""
+        pass
+
+    @abstractmethod
+    def _read(self, timeout: Optional[float] = None) -> Optional[List[Tuple[str, bytes]]]:
+        """阻塞读取已到达的输出，返回 (流名称, 数据) 列表，shell 退出时返回空列表，timeout 秒内没有输出时返回 None"""
+        pass
+
+    @abstractmethod
+    def close(self):
+        """关闭 shell"""
+        pass
+
+    def execute_command(self, command: str, token: Optional[CancelToken] = None) -> Tuple[int, str, str]:
+        with self._lock:
+            if not self.is_alive():
+                self.close()
+                self._start()
+            marker = f"__WDEV_{uuid.uuid4().hex}__"
+            script = (f"( eval {shlex.quote(command)}\n) </dev/null\n"
+                      f"printf '\\n%s %d\\n' {marker} $?\n"
+                      f"printf '\\n%s\\n' {marker} >&2\n")
+            self._write(script.encode())
+
+            stdout_end = f"\n{marker} ".encode()
+            stderr_end = f"\n{marker}\n".encode()
+            buffers = {"stdout": bytearray(), "stderr": bytearray()}
+            # 每个流中已确认不含标记的长度，避免重复扫描整个缓冲区
+            scanned = {"stdout": 0, "stderr": 0}
+            ends = {"stdout": -1, "stderr": -1}
+            while ends["stdout"] < 0 or not buffers["stdout"].endswith(b"\n") or ends["stderr"] < 0:
+                timeout = None
+                if token is not None:
+                    # 有取消令牌时至少每 0.5 秒检查一次
+                    remaining = token.remaining()
+                    timeout = 0.5 if remaining is None else min(0.5, remaining)
+                chunks = self._read(timeout)
+                if chunks is None:
+                    if token is not None and token.cancelled:
+                        self.close()
+                        return token.interrupted(bytes(buffers["stdout"]).decode(errors="replace"),
+                                                 bytes(buffers["stderr"]).decode(errors="replace"))
+                    continue
+                if not chunks:
+                    self.close()
+                    raise ConnectionError("shell 会话意外退出")
+                for stream, data in chunks:
+                    buffer = buffers[stream]
+                    buffer.extend(data)
+                    if ends[stream] < 0:
+                        pattern = stdout_end if stream == "stdout" else stderr_end
+                        ends[stream] = buffer.find(pattern, scanned[stream])
+                        scanned[stream] = max(0, len(buffer) - len(pattern))
+
+            stdout = buffers["stdout"]
+            exit_code = int(stdout[ends["stdout"] + len(stdout_end):].strip())
+            return (exit_code,
+                    stdout[:ends["stdout"]].decode(errors="replace"),
+                    buffers["stderr"][:ends["stderr"]].decode(errors="replace"))
+
+
+class LocalShellSession(ShellSession):
+    """本地长驻 /bin/sh 会话"""
+
+    def __init__(self):
+        super().__init__()
+        self._process: Optional[subprocess.Popen] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            ["/bin/sh"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._process.stdout, selectors.EVENT_READ, "stdout")
+        self._selector.register(self._process.stderr, selectors.EVENT_READ, "stderr")
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _write(self, data: bytes):
+        self._process.stdin.write(data)
+
+    def _read(self, timeout: Optional[float] = None) -> Optional[List[Tuple[str, bytes]]]:
+        events = self._selector.select(timeout)
+        if not events:
+            return None
+        chunks = []
+        for key, _ in events:
+            data = os.read(key.fd, 65536)
+            if data:
+                chunks.append((key.data, data))
+        return chunks
+
+    def close(self):
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+                self._process.wait()
+            for pipe in (self._process.stdin, self._process.stdout, self._process.stderr):
+                pipe.close()
+            self._process = None
+
+
+class SSHShellSession(ShellSession):
+    """SSH 远程长驻 shell 会话，会话存续期间占用连接池中的一个通道名额"""
+
+    def __init__(self, host):
+        super().__init__()
+        self.host = host
+        self._channel: Optional[paramiko.Channel] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+
+    def _start(self):
+        channel = self.host._open_channel()
+        try:
+            # 直接执行 /bin/sh，而不是用户的登录 shell：不输出 motd 和 profile 中的内容，
+            # 登录 shell 为 fish、csh 等时 eval 和标记的写法仍然有效
+            channel.exec_command("/bin/sh")
+        except Exception:
+            channel.close()
+            self.host.pool.release(self.host)
+            raise
+        self._channel = channel
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(channel, selectors.EVENT_READ)
+
+    def is_alive(self) -> bool:
+        channel = self._channel
+        return (channel is not None and not channel.closed and not channel.eof_received
+                and channel.get_transport().is_active())
+
+    def _write(self, data: bytes):
+        self._channel.sendall(data)
+
+    def _read(self, timeout: Optional[float] = None) -> Optional[List[Tuple[str, bytes]]]:
+        channel = self._channel
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if wait <= 0:
+                return None
+            self._selector.select(wait)
+            chunks = []
+            while channel.recv_ready():
+                chunks.append(("stdout", channel.recv(65536)))
+            while channel.recv_stderr_ready():
+                chunks.append(("stderr", channel.recv_stderr(65536)))
+            if chunks or channel.eof_received or channel.closed:
+                return chunks
+
+    def close(self):
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+            self.host.pool.release(self.host)
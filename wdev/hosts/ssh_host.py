@@ -1,41 +1,241 @@
+import random
+import selectors
+import time
 import paramiko
 from typing import Tuple, Optional
 from wdev.hosts import Host
+from wdev.hosts.breaker import HostUnreachableError, default_breaker
+from wdev.hosts.cancel import CancelToken, current_token
+from wdev.hosts.host import LineSource, LineSplitter
+from wdev.hosts.session import SSHShellSession
+from wdev.hosts.ssh_pool import SSHConnectionPool, default_pool
+from wdev.hosts.transfer import DEFAULT_CHUNK_SIZE, SFTPFileTransfer
+from wdev.metrics import instrumentation
 
 
 class SSHHost(Host):
     """SSH远程主机实现"""
 
     def __init__(self, hostname: str, username: str, password: Optional[str] = None,
-                 key_filename: Optional[str] = None, port: int = 22):
+                 key_filename: Optional[str] = None, port: int = 22,
+                 pool: Optional[SSHConnectionPool] = None, session: bool = False,
+                 connect_timeout: float = 10.0, command_timeout: Optional[float] = None):
+        """
+        :param pool: 使用的连接池，默认使用进程级共享连接池
+        :param session: 是否使用长驻 shell 会话执行命令（省去每条命令打开通道和启动远程 shell 的开销）
+        :param connect_timeout: TCP 连接、SSH 握手和认证各自的超时时间（秒）
+        :param command_timeout: 命令的最长执行时间（秒），超时后关闭通道并返回退出码 124；None 表示不限制
+                                （长驻会话中不生效）
+        """
         super().__init__(hostname)
         self.hostname = hostname
         self.username = username
         self.password = password
         self.key_filename = key_filename
         self.port = port
-        self._client = None
+        self.pool = pool or default_pool
+        self.session = SSHShellSession(self) if session else None
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        # 连接失败后的重试次数，以及指数退避的初始间隔和最大间隔（秒）
+        self.retries = 2
+        self.retry_backoff = 0.5
+        self.max_backoff = 10.0
 
-    def _get_client(self) -> paramiko.SSHClient:
-        if not self._client:
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    def with_timeouts(self, connect: Optional[float] = None, command: Optional[float] = None) -> 'SSHHost':
+        """设置连接超时和命令超时（秒），未指定的保持不变"""
+        if connect is not None:
+            self.connect_timeout = connect
+        if command is not None:
+            self.command_timeout = command
+        return self
+
+    def with_retry(self, retries: int = 2, backoff: float = 0.5, max_backoff: float = 10.0) -> 'SSHHost':
+        """连接失败后最多重试 retries 次，第 n 次重试前等待 backoff * 2^n 秒（不超过 max_backoff）的一半到全部
+            认证失败和主机密钥不匹配不重试
+        """
+        if retries < 0:
+            raise ValueError("retries 必须大于等于 0")
+        self.retries = retries
+        self.retry_backoff = backoff
+        self.max_backoff = max_backoff
+        return self
+
+    @property
+    def identity(self) -> str:
+        return f"ssh://{self.username}@{self.hostname}:{self.port}"
+
+    def _open_client(self) -> paramiko.SSHClient:
+        """尝试建立一次SSH连接"""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
             client.connect(
                 self.hostname,
                 port=self.port,
                 username=self.username,
                 password=self.password,
-                key_filename=self.key_filename
+                key_filename=self.key_filename,
+                timeout=self.connect_timeout,
+                banner_timeout=self.connect_timeout,
+                auth_timeout=self.connect_timeout
             )
-            self._client = client
-        return self._client
+        except BaseException:
+            client.close()
+            raise
+        return client
+
+    def _backoff(self, attempt: int) -> float:
+        # 指数退避，随机取一半到全部，避免大量主机同时重试
+        delay = min(self.max_backoff, self.retry_backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _connect(self) -> paramiko.SSHClient:
+        """建立一条新的SSH连接（由连接池调用）
+            连接失败时按指数退避重试，每次失败都计入熔断器；重试用尽或熔断器打开后抛出 HostUnreachableError
+        """
+        breaker = self.breaker or default_breaker
+        attempt = 0
+        while True:
+            breaker.check(self)
+            try:
+                client = self._open_client()
+            except (paramiko.AuthenticationException, paramiko.BadHostKeyException):
+                raise
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                breaker.record_failure(self, e)
+                if attempt >= self.retries or breaker.is_open(self):
+                    raise HostUnreachableError(self.name, str(e) or type(e).__name__) from e
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            breaker.record_success(self)
+            return client
+
+    def probe(self):
+        self._open_client().close()
+
+    def _get_client(self) -> paramiko.SSHClient:
+        return self.pool.get_client(self)
 
     def execute_command(self, command: str) -> Tuple[int, str, str]:
-        client = self._get_client()
-        stdin, stdout, stderr = client.exec_command(command)
-        exit_code = stdout.channel.recv_exit_status()
-        return exit_code, stdout.read().decode(), stderr.read().decode()
-
-    def __del__(self):
-        if self._client:
-            self._client.close()
\ No newline at end of file
+        token = current_token()
+        if self.session is not None:
+            with instrumentation.timer("exec", host=self.name):
+                return self.session.execute_command(command, token)
+        channel = self._open_channel()
+        try:
+            with instrumentation.timer("exec", host=self.name):
+                channel.exec_command(command)
+                # 令牌被取消时关闭通道，等待立即结束
+                unregister = token.on_cancel(channel.close) if token is not None else None
+                try:
+                    finished, stdout, stderr = self._read_until_exit(channel, self._wait_timeout(token))
+                finally:
+                    if unregister is not None:
+                        unregister()
+            with instrumentation.timer("read", host=self.name):
+                output, error = stdout.decode(errors="replace"), stderr.decode(errors="replace")
+            if token is not None and token.cancelled and channel.exit_status == -1:
+                return token.interrupted(output, error)
+            if not finished:
+                return 124, output, error + f"命令执行超过 {self.command_timeout} 秒，已终止\n"
+            return channel.recv_exit_status(), output, error
+        finally:
+            channel.close()
+            self.pool.release(self)
+
+    def _wait_timeout(self, token: Optional[CancelToken]) -> Optional[float]:
+        """等待命令结束的最长时间：命令超时和令牌截止时间中较早者"""
+        timeouts = [timeout for timeout in (self.command_timeout, token.remaining() if token is not None else None)
+                    if timeout is not None]
+        return min(timeouts) if timeouts else None
+
+    @staticmethod
+    def _read_until_exit(channel: paramiko.Channel, timeout: Optional[float]) -> Tuple[bool, bytes, bytes]:
+        """边等待边读取输出，直到命令结束、通道被关闭或超过 timeout 秒，返回 (是否已结束, 标准输出, 标准错误)
+            输出超过通道窗口大小时远端会等待读取，因此不能先等待退出码再读取
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        stdout, stderr = [], []
+        with selectors.DefaultSelector() as selector:
+            selector.register(channel, selectors.EVENT_READ)
+            while True:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False, b"".join(stdout), b"".join(stderr)
+                selector.select(0.5 if remaining is None else min(0.5, remaining))
+                # 先读数据再判断EOF，EOF之后缓冲区中不会再有新数据
+                eof = channel.eof_received or channel.closed
+                while channel.recv_ready():
+                    stdout.append(channel.recv(32768))
+                while channel.recv_stderr_ready():
+                    stderr.append(channel.recv_stderr(32768))
+                if eof:
+                    break
+        remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        return channel.status_event.wait(remaining), b"".join(stdout), b"".join(stderr)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+    def open_transfer(self, chunk_size: Optional[int] = None) -> SFTPFileTransfer:
+        return SFTPFileTransfer(self, chunk_size or DEFAULT_CHUNK_SIZE)
+
+    def _open_channel(self) -> paramiko.Channel:
+        """占用连接池中的一个通道名额并打开新通道，通道关闭后由调用方 pool.release 归还名额
+            连接已断开时（命令尚未开始执行）归还名额，重新取用连接后重试一次
+        """
+        for attempt in range(2):
+            client = self.pool.acquire(self)
+            try:
+                return client.get_transport().open_session()
+            except (paramiko.SSHException, EOFError, OSError, AttributeError):
+                self.pool.invalidate(self, client)
+                self.pool.release(self)
+                if attempt:
+                    raise
+            except BaseException:
+                self.pool.release(self)
+                raise
+
+    def _stream_lines(self, command: str) -> LineSource:
+        token = current_token()
+        channel = self._open_channel()
+        selector = selectors.DefaultSelector()
+        try:
+            channel.exec_command(command)
+            selector.register(channel, selectors.EVENT_READ)
+            stdout, stderr = LineSplitter(), LineSplitter()
+            interrupted = False
+            while True:
+                remaining = token.remaining() if token is not None else None
+                selector.select(0.5 if remaining is None else min(0.5, remaining))
+                if token is not None and token.cancelled and not channel.exit_status_ready():
+                    # 超时或被取消：关闭通道，输出已收到的部分
+                    interrupted = True
+                    channel.close()
+                # 先读数据再判断EOF，EOF之后缓冲区中不会再有新数据
+                eof = channel.eof_received or channel.closed
+                while channel.recv_ready():
+                    for line in stdout.feed(channel.recv(32768)):
+                        yield "stdout", line
+                while channel.recv_stderr_ready():
+                    for line in stderr.feed(channel.recv_stderr(32768)):
+                        yield "stderr", line
+                if eof:
+                    break
+            for line in stdout.flush():
+                yield "stdout", line
+            for line in stderr.flush():
+                yield "stderr", line
+            if interrupted:
+                exit_code, _, message = token.interrupted()
+                yield "stderr", message
+                return exit_code
+            return channel.recv_exit_status()
+        finally:
+            selector.close()
+            channel.close()
+            self.pool.release(self)
@@ -0,0 +1,221 @@
+import selectors
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import paramiko
+
+from wdev.hosts.cancel import CancelToken, current_token
+from wdev.hosts.limiter import default_limiter
+from wdev.hosts.ssh_host import SSHHost
+from wdev.metrics import instrumentation
+
+CommandResult = Tuple[int, str, str]
+
+
+def _no_limit():
+    """限流器未启用时的占位释放函数"""
+
+
+class _ChannelState:
+    """单个正在执行的命令通道的状态"""
+    __slots__ = ("index", "host", "channel", "token", "stdout", "stderr", "started", "release_limit")
+
+    def __init__(self, index: int, host: SSHHost, channel: paramiko.Channel, token: Optional[CancelToken],
+                 release_limit: Callable[[], None]):
+        self.index = index
+        self.host = host
+        self.channel = channel
+        self.token = token
+        self.stdout: List[bytes] = []
+        self.stderr: List[bytes] = []
+        self.started = time.perf_counter()
+        # 释放限流器名额的函数
+        self.release_limit = release_limit
+
+    def release(self):
+        """关闭通道并归还连接池和限流器的名额"""
+        self.channel.close()
+        self.host.pool.release(self.host)
+        self.release_limit()
+
+
+class SSHMultiplexer:
+    """在单个线程中通过 selector 同时驱动多台 SSHHost 上的命令通道
+
+    执行命令的线程不再阻塞在 recv_exit_status() 上，
+    并发规模只受文件描述符数量(每个通道占用2个)限制。
+    每个通道同样占用主机限流器（Host.limiter 或默认限流器）的名额，名额已满的命令留到下一轮。
+    """
+
+    def __init__(self, max_channels: int = 256, connect_workers: int = 16,
+                 poll_interval: float = 0.5, chunk_size: int = 32768):
+        """
+        :param max_channels: 同时打开的最大通道数
+        :param connect_workers: 建立SSH连接时使用的线程数
+        :param poll_interval: selector 的最长等待时间（秒）
+        :param chunk_size: 每次从通道读取的最大字节数
+        """
+        self.max_channels = max_channels
+        self.connect_workers = connect_workers
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+
+    def _connect_all(self, hosts: Sequence[SSHHost]) -> Dict[SSHHost, object]:
+        """并发建立连接，返回 主机 -> SSHClient 或连接异常"""
+        def connect(host: SSHHost):
+            try:
+                return host._get_client()
+            except Exception as e:
+                return e
+
+        workers = max(1, min(self.connect_workers, len(hosts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wdev-ssh-connect") as executor:
+            return dict(zip(hosts, executor.map(connect, hosts)))
+
+    def _drain(self, state: _ChannelState):
+        channel = state.channel
+        while channel.recv_ready():
+            state.stdout.append(channel.recv(self.chunk_size))
+        while channel.recv_stderr_ready():
+            state.stderr.append(channel.recv_stderr(self.chunk_size))
+
+    def run(self, commands: Sequence[Tuple[SSHHost, str]],
+            on_complete: Optional[Callable[[int, int, str, str], None]] = None,
+            tokens: Optional[Sequence[Optional[CancelToken]]] = None) -> List[CommandResult]:
+        """
+        并发执行命令，按输入顺序返回 (退出码, 标准输出, 标准错误)
+        连接或通道异常时退出码为 -1，异常信息写入标准错误
+        :param commands: (主机, 命令) 列表
+        :param on_complete: 每条命令完成时回调 on_complete(索引, 退出码, 标准输出, 标准错误)
+        :param tokens: 每条命令的取消令牌，默认都使用当前线程的令牌；令牌取消后关闭对应的通道
+        """
+        results: List[Optional[CommandResult]] = [None] * len(commands)
+        if not commands:
+            return []
+        if tokens is None:
+            tokens = [current_token()] * len(commands)
+        cancellable = any(token is not None for token in tokens)
+
+        def finish(index: int, exit_code: int, output: str, error: str):
+            results[index] = (exit_code, output, error)
+            if on_complete:
+                on_complete(index, exit_code, output, error)
+
+        hosts = list(dict.fromkeys(host for host, _ in commands))
+        clients = self._connect_all(hosts)
+
+        queue = deque(enumerate(commands))
+        selector = selectors.DefaultSelector()
+        active: Dict[paramiko.Channel, _ChannelState] = {}
+        # 已收到EOF、等待退出码的通道（EOF后管道始终可读，不能继续放在selector中）
+        awaiting: List[_ChannelState] = []
+
+        def open_channels():
+            deferred = []
+            while queue and len(active) + len(awaiting) < self.max_channels:
+                index, (host, command) = queue.popleft()
+                token = tokens[index]
+                if token is not None and token.cancelled:
+                    finish(index, *token.interrupted())
+                    continue
+                if isinstance(clients[host], Exception):
+                    finish(index, -1, "", str(clients[host]))
+                    continue
+                # 限流器或连接池的名额已满时留到下一轮
+                limiter = host.limiter or default_limiter
+                release_limit = limiter.hold(host, blocking=False) if limiter.active else _no_limit
+                if release_limit is None:
+                    deferred.append((index, (host, command)))
+                    continue
+                try:
+                    client = host.pool.acquire(host, blocking=False)
+                except Exception as e:
+                    release_limit()
+                    finish(index, -1, "", str(e))
+                    continue
+                if client is None:
+                    release_limit()
+                    deferred.append((index, (host, command)))
+                    continue
+                try:
+                    channel = client.get_transport().open_session()
+                    channel.exec_command(command)
+                except Exception as e:
+                    host.pool.release(host)
+                    release_limit()
+                    finish(index, -1, "", str(e))
+                    continue
+                state = _ChannelState(index, host, channel, token, release_limit)
+                active[channel] = state
+                selector.register(channel, selectors.EVENT_READ, state)
+            queue.extendleft(reversed(deferred))
+
+        def close_channel(state: _ChannelState):
+            channel = state.channel
+            exit_code = channel.recv_exit_status() if channel.exit_status_ready() else -1
+            state.release()
+            elapsed = time.perf_counter() - state.started
+            (state.host.limiter or default_limiter).feedback(state.host, elapsed, exit_code in (-1, 255))
+            instrumentation.record("exec", elapsed, host=state.host.name)
+            finish(state.index,
+                   exit_code,
+                   b"".join(state.stdout).decode(errors="replace"),
+                   b"".join(state.stderr).decode(errors="replace"))
+
+        try:
+            open_channels()
+            while active or awaiting or queue:
+                timeout = 0.005 if awaiting or not active else self.poll_interval
+                if active:
+                    events = selector.select(timeout)
+                else:
+                    # 所有通道名额都被其他线程占用，稍后重试
+                    time.sleep(timeout)
+                    events = []
+                ready = [key.data for key, _ in events]
+                if not events and not awaiting:
+                    # 兜底：超时后检查全部通道，防止丢失事件
+                    ready = list(active.values())
+
+                for state in ready:
+                    self._drain(state)
+                    channel = state.channel
+                    if channel.eof_received or channel.closed:
+                        self._drain(state)
+                        selector.unregister(channel)
+                        del active[channel]
+                        awaiting.append(state)
+
+                interrupted = [state for state in list(active.values()) + awaiting
+                               if state.token is not None and state.token.cancelled
+                               and not state.channel.exit_status_ready()] if cancellable else []
+                for state in interrupted:
+                    # 超时或被取消：关闭通道，返回已收到的输出
+                    self._drain(state)
+                    if state.channel in active:
+                        selector.unregister(state.channel)
+                        del active[state.channel]
+                    else:
+                        awaiting.remove(state)
+                    state.release()
+                    finish(state.index, *state.token.interrupted(b"".join(state.stdout).decode(errors="replace"),
+                                                                 b"".join(state.stderr).decode(errors="replace")))
+
+                still_waiting = []
+                for state in awaiting:
+                    if state.channel.exit_status_ready() or state.channel.closed:
+                        close_channel(state)
+                    else:
+                        still_waiting.append(state)
+                awaiting = still_waiting
+                open_channels()
+        finally:
+            for channel, state in list(active.items()):
+                selector.unregister(channel)
+                state.release()
+            for state in awaiting:
+                state.release()
+            selector.close()
+        return results
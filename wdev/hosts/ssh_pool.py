@@ -0,0 +1,167 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import paramiko
+
+from wdev.metrics import instrumentation
+
+PoolKey = Tuple[str, int, str, Optional[str]]
+
+
+class _PooledConnection:
+    """连接池中的一条SSH连接"""
+    __slots__ = ("lock", "client", "slots", "in_use", "last_used")
+
+    def __init__(self, max_channels: int):
+        self.lock = threading.Lock()
+        self.client: Optional[paramiko.SSHClient] = None
+        self.slots = threading.BoundedSemaphore(max_channels)
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+class SSHConnectionPool:
+    """进程级SSH连接池
+
+    按 (主机, 端口, 用户, 密钥) 复用连接，多个工作流/调度线程中的同名主机共享同一条连接。
+    取用连接时做健康检查并透明重连，空闲连接超时后关闭，并限制每条连接上的并发通道数。
+    """
+
+    def __init__(self, max_channels: int = 8, keepalive_interval: int = 30,
+                 idle_timeout: float = 300, sweep_interval: float = 30):
+        """
+        :param max_channels: 每条连接上同时打开的最大通道数（OpenSSH 默认 MaxSessions 为 10）
+        :param keepalive_interval: keepalive 发送间隔（秒），0 表示不发送
+        :param idle_timeout: 空闲连接的最长保留时间（秒）
+        :param sweep_interval: 检查空闲连接的最小间隔（秒）
+        """
+        self.max_channels = max_channels
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[PoolKey, _PooledConnection] = {}
+        self._last_sweep = time.monotonic()
+
+    @staticmethod
+    def key_of(host) -> PoolKey:
+        return host.hostname, host.port, host.username, host.key_filename
+
+    @staticmethod
+    def _is_alive(client: Optional[paramiko.SSHClient]) -> bool:
+        if client is None:
+            return False
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _entry(self, host) -> _PooledConnection:
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self.close_idle()
+        with self._lock:
+            entry = self._entries.get(self.key_of(host))
+            if entry is None:
+                entry = self._entries[self.key_of(host)] = _PooledConnection(self.max_channels)
+            return entry
+
+    def get_client(self, host) -> paramiko.SSHClient:
+        """获取可用的连接，连接失效时自动重连"""
+        entry = self._entry(host)
+        with entry.lock:
+            if not self._is_alive(entry.client):
+                if entry.client is not None:
+                    entry.client.close()
+                    entry.client = None
+                with instrumentation.timer("connect", host=host.name):
+                    client = host._connect()
+                if self.keepalive_interval:
+                    client.get_transport().set_keepalive(self.keepalive_interval)
+                entry.client = client
+            entry.last_used = time.monotonic()
+            return entry.client
+
+    def acquire(self, host, blocking: bool = True,
+                timeout: Optional[float] = None) -> Optional[paramiko.SSHClient]:
+        """占用连接上的一个通道名额并返回连接，非阻塞或超时未获取到名额时返回 None"""
+        entry = self._entry(host)
+        if not entry.slots.acquire(blocking, timeout):
+            return None
+        with entry.lock:
+            entry.in_use += 1
+        try:
+            return self.get_client(host)
+        except Exception:
+            self.release(host)
+            raise
+
+    def release(self, host):
+        """归还通道名额"""
+        entry = self._entry(host)
+        with entry.lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+        entry.slots.release()
+
+    @contextmanager
+    def channel(self, host, timeout: Optional[float] = None):
+        """占用一个通道名额的上下文"""
+        client = self.acquire(host, timeout=timeout)
+        if client is None:
+            raise TimeoutError(f"等待主机 {host.name} 的SSH通道超时")
+        try:
+            yield client
+        finally:
+            self.release(host)
+
+    def invalidate(self, host, client: Optional[paramiko.SSHClient] = None):
+        """关闭失效的连接，下次取用时重连；指定 client 时仅当它仍是当前连接才关闭"""
+        entry = self._entry(host)
+        with entry.lock:
+            if entry.client is not None and (client is None or entry.client is client):
+                entry.client.close()
+                entry.client = None
+
+    def close_idle(self):
+        """关闭超过空闲时间且没有通道在使用的连接"""
+        now = time.monotonic()
+        with self._lock:
+            self._last_sweep = now
+            entries = list(self._entries.values())
+        for entry in entries:
+            # 正在建立连接的条目直接跳过，避免被慢连接阻塞
+            if not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                if entry.client is not None and entry.in_use == 0 \
+                        and now - entry.last_used >= self.idle_timeout:
+                    entry.client.close()
+                    entry.client = None
+            finally:
+                entry.lock.release()
+
+    def close_all(self):
+        """关闭池中的全部连接"""
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            with entry.lock:
+                if entry.client is not None:
+                    entry.client.close()
+                    entry.client = None
+
+    def stats(self) -> Dict[str, int]:
+        """连接池状态：连接数、存活连接数、使用中的通道数"""
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.client is not None]
+        return {
+            "connections": len(entries),
+            "alive": sum(1 for entry in entries if self._is_alive(entry.client)),
+            "channels_in_use": sum(entry.in_use for entry in entries),
+        }
+
+
+default_pool = SSHConnectionPool()
+atexit.register(default_pool.close_all)
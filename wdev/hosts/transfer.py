@@ -0,0 +1,315 @@
+import hashlib
+import os
+import posixpath
+import shlex
+import shutil
+import stat
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import paramiko
+
+from wdev.metrics import instrumentation
+
+# 每次传输请求的块大小，paramiko 单个 SFTP 写请求上限为 32K
+DEFAULT_CHUNK_SIZE = 32768
+# 单条命令中最多携带的路径数，避免超过命令行长度限制
+_PATHS_PER_COMMAND = 200
+
+_digest_lock = threading.Lock()
+# (路径, 大小, 修改时间) -> sha256，同一个文件分发到多台主机时只计算一次
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str) -> str:
+    """本地文件的 sha256，按 (路径, 大小, 修改时间) 缓存"""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _digest_lock:
+            _digests[key] = digest
+    return digest
+
+
+def _batches(paths: Sequence[str]) -> Iterable[Sequence[str]]:
+    for i in range(0, len(paths), _PATHS_PER_COMMAND):
+        yield paths[i:i + _PATHS_PER_COMMAND]
+
+
+def _temp_name(path: str) -> str:
+    return f"{path}.wdev-{uuid.uuid4().hex[:8]}.part"
+
+
+class FileTransfer(ABC):
+    """主机上的文件传输会话
+
+    文件先写入同目录下的临时文件再重命名，中断的传输不会留下不完整的目标文件。
+    一个会话同一时间只传输一个文件，需要多个文件同时传输时每个线程使用各自的会话。
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    @abstractmethod
+    def sizes(self, paths: Sequence[str]) -> Dict[str, int]:
+        """主机上文件的大小，不存在的文件不包含在结果中"""
+        pass
+
+    @abstractmethod
+    def hashes(self, paths: Sequence[str]) -> Dict[str, str]:
+        """主机上文件的 sha256，不存在的文件不包含在结果中"""
+        pass
+
+    @abstractmethod
+    def list_files(self, path: str) -> List[Tuple[str, int]]:
+        """path 下所有文件的 (相对路径, 大小)；path 是文件时返回 [("", 大小)]，不存在时返回 []"""
+        pass
+
+    @abstractmethod
+    def makedirs(self, paths: Sequence[str]):
+        """创建目录（含上级目录）"""
+        pass
+
+    @abstractmethod
+    def remove(self, paths: Sequence[str]):
+        """删除文件"""
+        pass
+
+    @abstractmethod
+    def put(self, local_path: str, remote_path: str):
+        """上传文件，保留权限和修改时间"""
+        pass
+
+    @abstractmethod
+    def get(self, remote_path: str, local_path: str):
+        """下载文件，保留权限和修改时间"""
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "FileTransfer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalFileTransfer(FileTransfer):
+    """本地主机：直接复制文件"""
+
+    def sizes(self, paths: Sequence[str]) -> Dict[str, int]:
+        result = {}
+        for path in paths:
+            try:
+                result[path] = os.stat(path).st_size
+            except OSError:
+                pass
+        return result
+
+    def hashes(self, paths: Sequence[str]) -> Dict[str, str]:
+        result = {}
+        for path in paths:
+            try:
+                result[path] = file_digest(path)
+            except OSError:
+                pass
+        return result
+
+    def list_files(self, path: str) -> List[Tuple[str, int]]:
+        if os.path.isfile(path):
+            return [("", os.stat(path).st_size)]
+        files = []
+        for root, _, names in os.walk(path):
+            for name in names:
+                full = os.path.join(root, name)
+                files.append((os.path.relpath(full, path).replace(os.sep, "/"), os.stat(full).st_size))
+        return files
+
+    def makedirs(self, paths: Sequence[str]):
+        for path in paths:
+            os.makedirs(path, exist_ok=True)
+
+    def remove(self, paths: Sequence[str]):
+        for path in paths:
+            os.remove(path)
+
+    def _copy(self, source: str, target: str):
+        tmp_path = _temp_name(target)
+        try:
+            with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, self.chunk_size)
+            shutil.copystat(source, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, local_path: str, remote_path: str):
+        self._copy(local_path, remote_path)
+
+    def get(self, remote_path: str, local_path: str):
+        self._copy(remote_path, local_path)
+
+
+class SFTPFileTransfer(FileTransfer):
+    """SSH 主机：通过 SFTP 分块流水线传输（不等待每个块的确认），
+    大小和哈希的查询通过一条远程命令批量完成。会话占用连接池中的一个通道名额。
+    """
+
+    def __init__(self, host, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.host = host
+        self._client = host.pool.acquire(host)
+        try:
+            with instrumentation.timer("connect", host=host.name):
+                self.sftp = self._client.open_sftp()
+        except Exception:
+            host.pool.release(host)
+            raise
+
+    def _run(self, command: str) -> Tuple[int, str, str]:
+        stdin, stdout, stderr = self._client.exec_command(command)
+        exit_code = stdout.channel.recv_exit_status()
+        return exit_code, stdout.read().decode(errors="replace"), stderr.read().decode(errors="replace")
+
+    def sizes(self, paths: Sequence[str]) -> Dict[str, int]:
+        result = {}
+        for batch in _batches(paths):
+            # 每行 "大小 路径"，不存在的文件只输出到标准错误
+            exit_code, output, _ = self._run("stat -c '%s %n' -- " + " ".join(shlex.quote(p) for p in batch))
+            if exit_code == 127:
+                return self._sizes_by_sftp(paths)
+            for line in output.splitlines():
+                size, _, path = line.partition(" ")
+                if size.isdigit():
+                    result[path] = int(size)
+        return result
+
+    def _sizes_by_sftp(self, paths: Sequence[str]) -> Dict[str, int]:
+        result = {}
+        for path in paths:
+            try:
+                result[path] = self.sftp.stat(path).st_size
+            except IOError:
+                pass
+        return result
+
+    def hashes(self, paths: Sequence[str]) -> Dict[str, str]:
+        result = {}
+        for batch in _batches(paths):
+            exit_code, output, _ = self._run("sha256sum -- " + " ".join(shlex.quote(p) for p in batch))
+            if exit_code == 127:
+                return self._hashes_by_sftp(paths)
+            for line in output.splitlines():
+                # 文件名含反斜杠或换行时 sha256sum 在行首加 "\\" 并转义
+                escaped = line.startswith("\\")
+                digest, _, path = line.lstrip("\\").partition("  ")
+                if escaped:
+                    path = path.replace("\\n", "\n").replace("\\\\", "\\")
+                result[path] = digest
+        return result
+
+    def _hashes_by_sftp(self, paths: Sequence[str]) -> Dict[str, str]:
+        result = {}
+        for path in paths:
+            try:
+                with self.sftp.open(path, "rb") as f:
+                    f.prefetch()
+                    h = hashlib.sha256()
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        h.update(chunk)
+                result[path] = h.hexdigest()
+            except IOError:
+                pass
+        return result
+
+    def list_files(self, path: str) -> List[Tuple[str, int]]:
+        try:
+            attr = self.sftp.stat(path)
+        except IOError:
+            return []
+        if not stat.S_ISDIR(attr.st_mode):
+            return [("", attr.st_size)]
+        files = []
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            for entry in self.sftp.listdir_attr(posixpath.join(path, relative) if relative else path):
+                child = posixpath.join(relative, entry.filename) if relative else entry.filename
+                if stat.S_ISDIR(entry.st_mode):
+                    pending.append(child)
+                elif stat.S_ISREG(entry.st_mode):
+                    files.append((child, entry.st_size))
+        return files
+
+    def makedirs(self, paths: Sequence[str]):
+        for batch in _batches(paths):
+            exit_code, _, error = self._run("mkdir -p -- " + " ".join(shlex.quote(p) for p in batch))
+            if exit_code != 0:
+                raise IOError(f"创建目录失败: {error.strip()}")
+
+    def remove(self, paths: Sequence[str]):
+        for path in paths:
+            self.sftp.remove(path)
+
+    def put(self, local_path: str, remote_path: str):
+        st = os.stat(local_path)
+        tmp_path = _temp_name(remote_path)
+        try:
+            with open(local_path, "rb") as src, self.sftp.open(tmp_path, "wb", self.chunk_size) as dst:
+                dst.set_pipelined(True)
+                for chunk in iter(lambda: src.read(self.chunk_size), b""):
+                    dst.write(chunk)
+            self.sftp.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+            self.sftp.utime(tmp_path, (st.st_atime, st.st_mtime))
+            self._rename(tmp_path, remote_path)
+        except BaseException:
+            try:
+                self.sftp.remove(tmp_path)
+            except (IOError, OSError, paramiko.SSHException):
+                pass
+            raise
+
+    def _rename(self, source: str, target: str):
+        try:
+            self.sftp.posix_rename(source, target)
+        except IOError:
+            # 服务器不支持 posix-rename 扩展时，普通 rename 不能覆盖已有文件
+            try:
+                self.sftp.remove(target)
+            except IOError:
+                pass
+            self.sftp.rename(source, target)
+
+    def get(self, remote_path: str, local_path: str):
+        attr = self.sftp.stat(remote_path)
+        tmp_path = _temp_name(local_path)
+        try:
+            with self.sftp.open(remote_path, "rb", self.chunk_size) as src, open(tmp_path, "wb") as dst:
+                # 预先发出所有读请求，按块流水线接收
+                src.prefetch(attr.st_size)
+                shutil.copyfileobj(src, dst, self.chunk_size)
+            os.chmod(tmp_path, stat.S_IMODE(attr.st_mode))
+            os.utime(tmp_path, (attr.st_atime, attr.st_mtime))
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def close(self):
+        if self.sftp is not None:
+            self.sftp.close()
+            self.sftp = None
+            self.host.pool.release(self.host)
@@ -0,0 +1,3 @@
+from .instrument import Instrumentation, MetricsSink, instrumentation
+from .prometheus import HistogramSink, PrometheusExporter
+from .profile import profile_run, profiled
\ No newline at end of file
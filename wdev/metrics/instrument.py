@@ -0,0 +1,101 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+# 内置的计时阶段
+PHASES = ("connect", "wait", "exec", "read", "callable", "task", "notify", "workflow")
+
+
+class MetricsSink(ABC):
+    """计时数据的接收端"""
+
+    @abstractmethod
+    def record(self, phase: str, seconds: float, workflow: str, host: str, task: str):
+        """记录一次耗时（秒）"""
+        pass
+
+
+class _Timer:
+    __slots__ = ("owner", "phase", "host", "task", "started")
+
+    def __init__(self, owner: "Instrumentation", phase: str, host: Optional[str], task: Optional[str]):
+        self.owner = owner
+        self.phase = phase
+        self.host = host
+        self.task = task
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.owner.record(self.phase, time.perf_counter() - self.started, self.host, self.task)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Instrumentation:
+    """计时埋点
+
+    主机、任务、工作流和通知器在各阶段调用 timer()/record()，数据交给已注册的 sink。
+    没有注册 sink 时 timer() 返回空操作对象，几乎没有开销。
+    未显式指定的 workflow/host/task 标签取自当前线程的上下文（由工作流在执行时设置）。
+    """
+
+    def __init__(self):
+        self.sinks: List[MetricsSink] = []
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def add_sink(self, sink: MetricsSink) -> MetricsSink:
+        self.sinks = self.sinks + [sink]
+        return sink
+
+    def remove_sink(self, sink: MetricsSink):
+        self.sinks = [s for s in self.sinks if s is not sink]
+
+    def set_context(self, workflow: Optional[str] = None, host: Optional[str] = None, task: Optional[str] = None):
+        """设置当前线程的默认标签"""
+        local = self._local
+        local.workflow, local.host, local.task = workflow, host, task
+
+    def record(self, phase: str, seconds: float, host: Optional[str] = None, task: Optional[str] = None,
+               workflow: Optional[str] = None):
+        sinks = self.sinks
+        if not sinks:
+            return
+        local = self._local
+        workflow = workflow or getattr(local, "workflow", None) or ""
+        host = host or getattr(local, "host", None) or ""
+        task = task or getattr(local, "task", None) or ""
+        for sink in sinks:
+            try:
+                sink.record(phase, seconds, workflow, host, task)
+            except Exception as e:
+                print(f"Metrics sink {type(sink).__name__} failed: {str(e)}")
+
+    def timer(self, phase: str, host: Optional[str] = None, task: Optional[str] = None):
+        """计时上下文管理器：with instrumentation.timer("exec", host=...): ..."""
+        if not self.sinks:
+            return _NULL_TIMER
+        return _Timer(self, phase, host, task)
+
+
+# 进程级埋点
+instrumentation = Instrumentation()
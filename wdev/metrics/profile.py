@@ -0,0 +1,41 @@
+import cProfile
+import io
+import pstats
+from contextlib import contextmanager
+from typing import Optional
+
+
+def _report(profiler: cProfile.Profile, sort: str, limit: int) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+@contextmanager
+def profiled(path: str, sort: str = "cumulative", limit: int = 30):
+    """在 cProfile 下执行代码块，原始数据写入 path（可用 snakeviz / pstats 查看），文本摘要写入 path.txt"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        with open(f"{path}.txt", "w", encoding="utf-8") as f:
+            f.write(_report(profiler, sort, limit))
+
+
+def profile_run(workflow, path: Optional[str] = None, sort: str = "cumulative", limit: int = 30) -> str:
+    """在 cProfile 下执行一次工作流，返回按 sort 排序的前 limit 行统计
+        cProfile 只统计当前线程，需要完整的调用栈时请使用逐台主机顺序执行的工作流
+    :param path: 保存原始统计数据的文件
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        workflow.execute()
+    finally:
+        profiler.disable()
+    if path:
+        profiler.dump_stats(path)
+    return _report(profiler, sort, limit)
@@ -0,0 +1,147 @@
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .instrument import MetricsSink
+
+# 默认桶（秒），覆盖本地命令到慢速远程命令
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+LabelKey = Tuple[str, str, str, str]
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class HistogramSink(MetricsSink):
+    """按 (阶段, 工作流, 主机, 任务) 聚合的耗时直方图，可导出为 Prometheus 文本格式"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, per_host: bool = True, per_task: bool = True):
+        """
+        :param per_host: 是否按主机区分（主机很多时可关闭以控制序列数量）
+        :param per_task: 是否按任务区分
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.per_host = per_host
+        self.per_task = per_task
+        self._lock = threading.Lock()
+        self._histograms: Dict[LabelKey, _Histogram] = {}
+
+    def record(self, phase: str, seconds: float, workflow: str, host: str, task: str):
+        key = (phase, workflow, host if self.per_host else "", task if self.per_task else "")
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def summary(self, phase: Optional[str] = None) -> List[dict]:
+        """各序列的次数、总耗时和平均耗时"""
+        with self._lock:
+            items = [(key, h.count, h.sum) for key, h in self._histograms.items()]
+        return [{"phase": key[0], "workflow": key[1], "host": key[2], "task": key[3],
+                 "count": count, "sum": total, "avg": total / count if count else 0.0}
+                for key, count, total in sorted(items) if phase is None or key[0] == phase]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def to_prometheus(self, name: str = "wdev_phase_seconds") -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            items = [(key, list(h.counts), h.sum, h.count) for key, h in sorted(self._histograms.items())]
+        lines = [f"# HELP {name} Time spent per phase (connect, wait, exec, read, callable, task, notify, workflow).",
+                 f"# TYPE {name} histogram"]
+        bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+        for (phase, workflow, host, task), counts, total, count in items:
+            labels = (f'phase="{_escape(phase)}",workflow="{_escape(workflow)}",'
+                      f'host="{_escape(host)}",task="{_escape(task)}"')
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {total}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """定期把直方图写入文件（供 node_exporter textfile collector 读取），或在本地 HTTP 端口提供 /metrics"""
+
+    def __init__(self, sink: HistogramSink, path: Optional[str] = None, http_port: Optional[int] = None,
+                 interval: float = 15.0):
+        """
+        :param path: 输出文件路径，原子写入
+        :param http_port: 在 127.0.0.1 的该端口上提供指标
+        :param interval: 写入文件的间隔（秒）
+        """
+        self.sink = sink
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        if http_port is not None:
+            self._start_http(http_port)
+        if path:
+            self._thread = threading.Thread(target=self._write_loop, name="wdev-metrics-file", daemon=True)
+            self._thread.start()
+
+    def write(self):
+        """立即写入文件"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.sink.to_prometheus())
+        os.replace(tmp_path, self.path)
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"写入指标文件失败: {str(e)}")
+
+    def _start_http(self, port: int):
+        sink = self.sink
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = sink.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, name="wdev-metrics-http", daemon=True)
+        thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
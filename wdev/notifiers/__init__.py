@@ -1,3 +1,4 @@
 from .notifier import Notifier
 from .email_notifier import EmailNotifier
-from .console_notifier import ConsoleNotifier
\ No newline at end of file
+from .console_notifier import ConsoleNotifier
+from .async_notifier import AsyncNotifier
\ No newline at end of file
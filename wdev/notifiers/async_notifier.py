@@ -0,0 +1,137 @@
+import atexit
+import queue
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from wdev.notifiers import Notifier
+
+_STOP = object()
+
+# 被包装的通知器 -> 共享的异步通知器，同一个通知器添加到多个工作流时合并发送
+_shared: Dict[Notifier, "AsyncNotifier"] = {}
+_shared_lock = threading.Lock()
+
+
+class AsyncNotifier(Notifier):
+    """异步批量通知器
+
+    包装另一个通知器：notify 只把消息放入队列并立即返回，由后台线程发送，工作流不会因通知而阻塞。
+    在 batch_interval 秒内到达的消息合并为一批（通过被包装通知器的 notify_batch 发送，默认合并为一条摘要），
+    同一个实例可以添加到多个工作流中，得到跨工作流的汇总通知。发送失败时按指数退避重试。
+    """
+
+    def __init__(self, notifier: Notifier, batch_interval: float = 0.0, max_batch: int = 100,
+                 max_retries: int = 3, backoff: float = 1.0, max_backoff: float = 60.0):
+        """
+        :param notifier: 实际发送通知的通知器
+        :param batch_interval: 收到第一条消息后等待合并更多消息的时间（秒），0 表示只合并已在队列中的消息
+        :param max_batch: 每批最多合并的消息数
+        :param max_retries: 发送失败后的最大重试次数
+        :param backoff: 第一次重试前的等待时间（秒），之后每次翻倍
+        :param max_backoff: 重试等待时间上限（秒）
+        """
+        super().__init__(f"async-{notifier.name}")
+        self.notifier = notifier
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sent = 0
+        self.failed = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # 进程退出前尽量把队列中的消息发完（后台线程重启时不重复注册）
+        atexit.register(self.close, 30)
+
+    @classmethod
+    def wrap(cls, notifier: Notifier) -> "AsyncNotifier":
+        """返回 notifier 对应的异步通知器（默认参数，同一个 notifier 始终返回同一个实例），
+            notifier 本身是 AsyncNotifier 时原样返回
+        """
+        if isinstance(notifier, AsyncNotifier):
+            return notifier
+        with _shared_lock:
+            wrapper = _shared.get(notifier)
+            if wrapper is None:
+                wrapper = _shared[notifier] = cls(notifier)
+            return wrapper
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name=f"wdev-notifier-{self.notifier.name}",
+                                                daemon=True)
+                self._thread.start()
+
+    def notify(self, subject: str, message: str, **kwargs) -> bool:
+        self._ensure_started()
+        with self._idle:
+            self._pending += 1
+        self._queue.put((subject, message))
+        return True
+
+    def _collect(self, first) -> Tuple[List[Tuple[str, str]], bool]:
+        """从队列中收集一批消息，返回 (消息列表, 是否收到停止信号)"""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _deliver(self, batch: List[Tuple[str, str]]):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                success = self.notifier.notify_batch(batch)
+            except Exception as e:
+                print(f"Notifier {self.notifier.name} failed: {str(e)}")
+                success = False
+            if success:
+                self.sent += len(batch)
+                return
+            if attempt < self.max_retries:
+                # 带随机抖动的指数退避
+                time.sleep(min(delay, self.max_backoff) * random.uniform(0.5, 1.0))
+                delay *= 2
+        self.failed += len(batch)
+        print(f"Notifier {self.notifier.name} gave up on {len(batch)} message(s)")
+
+    def _worker(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stopping = self._collect(item)
+            try:
+                self._deliver(batch)
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中的消息全部处理完，返回是否在超时前完成"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """发送剩余消息后停止后台线程"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.flush(timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
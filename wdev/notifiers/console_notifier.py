@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 from wdev.notifiers import Notifier
 
 
@@ -11,4 +13,8 @@ class ConsoleNotifier(Notifier):
         # print(f"\n=== {subject} ===")
         print(message)
         # print("=" * (len(subject) + 8))
-        return True
\ No newline at end of file
+        return True
+
+    def notify_batch(self, messages: List[Tuple[str, str]]) -> bool:
+        print("\n".join(message for _, message in messages))
+        return True
@@ -1,26 +1,67 @@
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, Any, Union
+from typing import Dict, Any, Optional, Union
 import os
 
 from wdev.notifiers import Notifier
 
 
 class EmailNotifier(Notifier):
-    """邮件通知器"""
+    """邮件通知器
+        SMTP 连接在多次发送之间复用，空闲超过 idle_timeout 秒或连接断开时自动重连
+    """
 
     def __init__(self, recipients: Union[str, list],
                  smtp_host: str = None,
                  smtp_port: int = None,
                  smtp_user: str = None,
-                 smtp_password: str = None):
+                 smtp_password: str = None,
+                 use_tls: bool = True,
+                 timeout: float = 30,
+                 idle_timeout: float = 120):
         super().__init__("email")
         self.recipients = recipients if isinstance(recipients, list) else [recipients]
         self.smtp_host = smtp_host or os.getenv("SMTP_HOST")
         self.smtp_port = smtp_port or int(os.getenv("SMTP_PORT", "587"))
         self.smtp_user = smtp_user or os.getenv("SMTP_USER")
         self.smtp_password = smtp_password or os.getenv("SMTP_PASSWORD")
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.smtp_user and self.smtp_password:
+                server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _get_server(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def close(self):
+        """关闭复用的 SMTP 连接"""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                self._server.close()
+            self._server = None
 
     def notify(self, subject: str, message: str, **kwargs) -> bool:
         try:
@@ -31,11 +72,15 @@ class EmailNotifier(Notifier):
 
             msg.attach(MIMEText(message, "plain"))
 
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
+            with self._lock:
+                try:
+                    self._get_server().send_message(msg)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # 复用的连接已被服务器关闭，释放旧连接后重连并重试一次
+                    self.close()
+                    self._get_server().send_message(msg)
+                self._last_used = time.monotonic()
             return True
         except Exception as e:
             print(f"Failed to send email: {str(e)}")
-            return False
\ No newline at end of file
+            return False
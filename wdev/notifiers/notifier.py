@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import List, Tuple
 
 class Notifier(ABC):
     """通知器基类"""
@@ -9,4 +10,12 @@ class Notifier(ABC):
     @abstractmethod
     def notify(self, subject: str, message: str, **kwargs) -> bool:
         """发送通知"""
-        pass
\ No newline at end of file
+        pass
+
+    def notify_batch(self, messages: List[Tuple[str, str]]) -> bool:
+        """批量发送通知，默认把多条消息合并为一条摘要发送"""
+        if len(messages) == 1:
+            return self.notify(*messages[0])
+        subject = f"{messages[0][0]} 等 {len(messages)} 条通知"
+        body = "\n\n".join(f"=== {item_subject} ===\n{message}" for item_subject, message in messages)
+        return self.notify(subject, body)
@@ -1,3 +1,5 @@
 from .task import Task, TaskResult
+from .cache import ResultCache
 from .python_task import PythonTask
-from .shell_task import ShellTask
\ No newline at end of file
+from .shell_task import ShellTask
+from .file_task import FileTask, UploadTask, DownloadTask, SyncTask, upload_to_hosts
\ No newline at end of file
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from wdev.tasks.task import TaskResult
+
+
+class ResultCache:
+    """任务结果缓存
+
+    内存中为容量有限的 LRU，条目按 TTL 过期；指定 path 时同时写入磁盘目录，
+    内存未命中时从磁盘读取，进程重启后仍可命中。成功和失败的结果都会缓存。
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        """
+        :param max_entries: 内存中最多保存的条目数，超出时淘汰最久未使用的条目
+        :param path: 磁盘缓存目录，None 表示只在内存中缓存
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries 必须大于等于 1")
+        self.max_entries = max_entries
+        self.path = path
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        # 键 -> (过期时间 time.time(), 结果)
+        self._entries: "OrderedDict[str, Tuple[float, TaskResult]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """由若干部分生成缓存键"""
+        return hashlib.sha256(repr(parts).encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pickle")
+
+    def _load(self, key: str) -> Optional[Tuple[float, "TaskResult"]]:
+        try:
+            with open(self._file(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"读取结果缓存失败: {str(e)}")
+            return None
+
+    def _dump(self, key: str, entry: Tuple[float, "TaskResult"]):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".wdev-cache-")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(tmp_path, self._file(key))
+        except Exception as e:
+            print(f"写入结果缓存失败: {str(e)}")
+
+    def get(self, key: str) -> Optional["TaskResult"]:
+        """返回未过期的缓存结果，没有时返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        if self.path:
+            entry = self._load(key)
+            if entry is not None and entry[0] > now:
+                with self._lock:
+                    self._store(key, entry)
+                    self.hits += 1
+                return entry[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key: str, entry: Tuple[float, "TaskResult"]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key: str, result: "TaskResult", ttl: float):
+        """缓存结果 ttl 秒"""
+        entry = (time.time() + ttl, result)
+        with self._lock:
+            self._store(key, entry)
+        if self.path:
+            self._dump(key, entry)
+
+    def clear(self):
+        """清空内存和磁盘中的缓存"""
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            for name in os.listdir(self.path):
+                if name.endswith(".pickle"):
+                    os.unlink(os.path.join(self.path, name))
+
+    def stats(self) -> Dict[str, float]:
+        """命中/未命中/淘汰次数和命中率"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# 进程级共享缓存
+default_cache = ResultCache()
@@ -0,0 +1,258 @@
+import os
+import posixpath
+import queue
+import threading
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from wdev.hosts import Host, HostUnreachableError
+from wdev.hosts.transfer import FileTransfer, file_digest
+from wdev.tasks import Task, TaskResult
+
+
+class FileTask(Task):
+    """文件传输任务基类
+
+    主机上大小和 sha256 都与源文件一致的文件会被跳过；需要传输的文件由多个传输会话同时传输
+    （SSH 主机上每个会话是一个 SFTP 通道，块按流水线发送）。
+    结果的 data 中包含 transferred / skipped / deleted（路径列表）和 bytes（传输的字节数）。
+    子类指定 _method 并实现 _plan。
+    """
+    # 传输会话上调用的方法：put（上传）或 get（下载）
+    _method: str
+
+    def __init__(self, name: str, source: str, destination: str, description: str = ""):
+        super().__init__(name, description)
+        self.source = source
+        self.destination = destination
+        self.files = 4
+        self.chunk_size: Optional[int] = None
+
+    def with_parallel(self, files: int = 4) -> 'FileTask':
+        """同一主机上同时传输的文件数"""
+        if files < 1:
+            raise ValueError("files 必须大于等于 1")
+        self.files = files
+        return self
+
+    def with_chunk_size(self, chunk_size: int) -> 'FileTask':
+        """每个传输请求的块大小（字节）"""
+        if chunk_size < 1:
+            raise ValueError("chunk_size 必须大于 0")
+        self.chunk_size = chunk_size
+        return self
+
+    def _transfer_all(self, host: Host, first: FileTransfer, method: str,
+                      jobs: List[Tuple[str, str]]) -> List[str]:
+        """用最多 files 个会话并行执行 put/get，返回失败信息；first 由当前线程使用并在结束时关闭
+
+        每个工作线程打开自己的会话后持续从队列取文件，直到队列为空才关闭会话，
+        连接池通道名额不足时后启动的线程会等待先完成的线程释放名额。
+        """
+        pending: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        for job in jobs:
+            pending.put(job)
+        errors: List[str] = []
+        lock = threading.Lock()
+
+        token = self.cancel_token
+
+        def drain(transfer: FileTransfer):
+            while True:
+                if token.cancelled:
+                    # 超时或被取消：正在传输的文件传完后不再开始新的文件
+                    return
+                try:
+                    source, target = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    getattr(transfer, method)(source, target)
+                except Exception as e:
+                    with lock:
+                        errors.append(f"{source} -> {target}: {str(e)}")
+
+        def worker():
+            if pending.empty():
+                return
+            try:
+                transfer = host.open_transfer(self.chunk_size)
+            except Exception as e:
+                # 其余线程会继续处理队列中的文件
+                with lock:
+                    errors.append(f"打开传输会话失败: {str(e)}")
+                return
+            try:
+                drain(transfer)
+            finally:
+                transfer.close()
+
+        workers = min(self.files, len(jobs)) - 1
+        try:
+            if workers <= 0:
+                drain(first)
+            else:
+                with ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix=f"wdev-transfer-{host.name}") as executor:
+                    futures = [executor.submit(worker) for _ in range(workers)]
+                    drain(first)
+                    first.close()
+                    for future in futures:
+                        future.result()
+        finally:
+            first.close()
+        if token.cancelled and not pending.empty():
+            errors.append(f"任务{token.reason}，剩余 {pending.qsize()} 个文件未传输")
+        return errors
+
+    def _result(self, transferred: List[str], skipped: List[str], deleted: List[str], size: int,
+                errors: List[str]) -> TaskResult:
+        output = f"传输 {len(transferred)} 个文件（{size} 字节），跳过 {len(skipped)} 个未变化的文件"
+        if deleted:
+            output += f"，删除 {len(deleted)} 个文件"
+        return TaskResult(success=not errors, output=output + "\n", error="\n".join(errors),
+                          data={"transferred": transferred, "skipped": skipped, "deleted": deleted, "bytes": size})
+
+    @abstractmethod
+    def _plan(self, host: Host) -> Tuple[FileTransfer, List[Tuple[str, str]], List[str], List[str], int]:
+        """打开第一个会话，返回 (会话, 需要传输的 (源, 目标), 跳过的目标, 删除的目标, 需要传输的字节数)"""
+        pass
+
+    def execute(self, host: Host) -> TaskResult:
+        try:
+            with self.cancel_scope():
+                first, jobs, skipped, deleted, size = self._plan(host)
+                errors = self._transfer_all(host, first, self._method, jobs)
+            self.task_results = self._result([target for _, target in jobs], skipped, deleted, size, errors)
+        except HostUnreachableError:
+            raise
+        except Exception as e:
+            self.task_results = TaskResult(success=False, output="", error=str(e))
+        return self.task_results
+
+
+class UploadTask(FileTask):
+    """上传文件或目录（递归）到主机
+
+    remote_path 以 / 结尾时，单个文件上传到该目录下的同名文件。
+    """
+    _method = "put"
+
+    def __init__(self, name: str, local_path: str, remote_path: str, description: str = ""):
+        super().__init__(name, local_path, remote_path, description)
+        self.delete = False
+
+    def _local_files(self) -> List[Tuple[str, str, int]]:
+        """(本地路径, 主机上的路径, 大小)"""
+        if os.path.isdir(self.source):
+            files = []
+            for root, _, names in os.walk(self.source):
+                for name in sorted(names):
+                    local = os.path.join(root, name)
+                    relative = os.path.relpath(local, self.source).replace(os.sep, "/")
+                    files.append((local, posixpath.join(self.destination, relative), os.stat(local).st_size))
+            return files
+        target = self.destination
+        if target.endswith("/"):
+            target = posixpath.join(target, os.path.basename(self.source))
+        return [(self.source, target, os.stat(self.source).st_size)]
+
+    def _extraneous(self, transfer: FileTransfer, targets: Iterable[str]) -> List[str]:
+        """主机上目标目录中多余的文件（仅源为目录时）"""
+        if not os.path.isdir(self.source):
+            return []
+        wanted = set(targets)
+        return [posixpath.join(self.destination, relative) for relative, _ in transfer.list_files(self.destination)
+                if posixpath.join(self.destination, relative) not in wanted]
+
+    def _plan(self, host: Host):
+        files = self._local_files()
+        first = host.open_transfer(self.chunk_size)
+        try:
+            remote_sizes = first.sizes([target for _, target, _ in files])
+            same_size = [(local, target) for local, target, size in files if remote_sizes.get(target) == size]
+            remote_hashes = first.hashes([target for _, target in same_size]) if same_size else {}
+            skipped = [target for local, target in same_size if remote_hashes.get(target) == file_digest(local)]
+            unchanged = set(skipped)
+            jobs = [(local, target) for local, target, _ in files if target not in unchanged]
+            size = sum(size for _, target, size in files if target not in unchanged)
+            deleted = self._extraneous(first, (target for _, target, _ in files)) if self.delete else []
+            if deleted:
+                first.remove(deleted)
+            directories = sorted({posixpath.dirname(target) for _, target in jobs} - {""})
+            if directories:
+                first.makedirs(directories)
+        except BaseException:
+            first.close()
+            raise
+        return first, jobs, skipped, deleted, size
+
+
+class SyncTask(UploadTask):
+    """把本地目录同步到主机：上传变化的文件，并删除主机上目标目录中本地不存在的文件"""
+
+    def __init__(self, name: str, local_path: str, remote_path: str, description: str = "", delete: bool = True):
+        super().__init__(name, local_path, remote_path, description)
+        self.delete = delete
+
+
+class DownloadTask(FileTask):
+    """从主机下载文件或目录（递归）
+
+    local_path 中的 {host} 会替换为主机名，多台主机可以下载到各自的目录；
+    local_path 是已存在的目录或以路径分隔符结尾时，单个文件下载到该目录下的同名文件。
+    """
+    _method = "get"
+
+    def __init__(self, name: str, remote_path: str, local_path: str, description: str = ""):
+        super().__init__(name, remote_path, local_path, description)
+
+    def _plan(self, host: Host):
+        destination = self.destination.replace("{host}", host.name)
+        first = host.open_transfer(self.chunk_size)
+        try:
+            listing = first.list_files(self.source)
+            if not listing:
+                raise FileNotFoundError(f"主机 {host.name} 上不存在 {self.source}")
+            if listing[0][0] == "":
+                if destination.endswith(("/", os.sep)) or os.path.isdir(destination):
+                    destination = os.path.join(destination, posixpath.basename(self.source))
+                files = [(self.source, destination, listing[0][1])]
+            else:
+                files = [(posixpath.join(self.source, relative), os.path.join(destination, *relative.split("/")), size)
+                         for relative, size in listing]
+            same_size = [(remote, local) for remote, local, size in files
+                         if os.path.isfile(local) and os.stat(local).st_size == size]
+            remote_hashes = first.hashes([remote for remote, _ in same_size]) if same_size else {}
+            skipped = [local for remote, local in same_size if remote_hashes.get(remote) == file_digest(local)]
+            unchanged = set(skipped)
+            jobs = [(remote, local) for remote, local, _ in files if local not in unchanged]
+            size = sum(size for _, local, size in files if local not in unchanged)
+            for directory in sorted({os.path.dirname(local) for _, local in jobs} - {""}):
+                os.makedirs(directory, exist_ok=True)
+        except BaseException:
+            first.close()
+            raise
+        return first, jobs, skipped, [], size
+
+
+def upload_to_hosts(hosts: Iterable[Host], local_path: str, remote_path: str, max_workers: int = 16,
+                    files: int = 4) -> Dict[str, TaskResult]:
+    """把同一份文件或目录并行上传到多台主机，返回 主机名 -> 结果
+        本地文件的哈希只计算一次；需要失败分支、通知等功能时请在工作流中使用 UploadTask（max_workers > 1）
+    """
+    task = UploadTask("upload", local_path, remote_path).with_parallel(files)
+    hosts = list(hosts)
+
+    def upload(host: Host) -> TaskResult:
+        # 不可达的主机只记为失败，不影响其他主机
+        try:
+            return task.execute(host)
+        except HostUnreachableError as e:
+            return TaskResult(success=False, output="", error=str(e))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(hosts))),
+                            thread_name_prefix="wdev-upload") as executor:
+        results = executor.map(upload, hosts)
+        return {host.name: result for host, result in zip(hosts, results)}
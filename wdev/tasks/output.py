@@ -0,0 +1,56 @@
+import mmap
+import os
+import tempfile
+import weakref
+from typing import Union
+
+_ENCODING = "utf-8"
+# 编码时保留孤立的代理字符；解码时非 UTF-8 字节替换为 U+FFFD（原始字节通过 tobytes() 获取）
+_ENCODE_ERRORS = "surrogatepass"
+_DECODE_ERRORS = "replace"
+
+
+class OutputData:
+    """任务输出的紧凑存储
+
+    输出以 UTF-8 字节保存；超过 spill_threshold 字节时写入临时文件，
+    内存中只保留文件路径，读取时通过 mmap 按需解码。对象被回收时删除临时文件。
+    传入的字节不要求是合法的 UTF-8，解码时无法识别的字节显示为 U+FFFD。
+    """
+    __slots__ = ("_data", "_path", "size", "spill_threshold", "__weakref__")
+
+    def __init__(self, value: Union[str, bytes], spill_threshold: int):
+        data = value.encode(_ENCODING, _ENCODE_ERRORS) if isinstance(value, str) else bytes(value)
+        self.size = len(data)
+        self.spill_threshold = spill_threshold
+        self._path = None
+        self._data = data
+        if spill_threshold is not None and self.size > spill_threshold:
+            fd, self._path = tempfile.mkstemp(prefix="wdev-output-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            self._data = None
+            weakref.finalize(self, os.unlink, self._path)
+
+    @property
+    def spilled(self) -> bool:
+        """输出是否已写入临时文件"""
+        return self._path is not None
+
+    def tobytes(self) -> bytes:
+        if self._path is None:
+            return self._data
+        if self.size == 0:
+            return b""
+        with open(self._path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return buffer[:]
+
+    def __reduce__(self):
+        # 跨进程传递时携带内容本身，由接收方重新决定是否转存
+        return OutputData, (self.tobytes(), self.spill_threshold)
+
+    def __str__(self) -> str:
+        return self.tobytes().decode(_ENCODING, _DECODE_ERRORS)
+
+    def __len__(self) -> int:
+        return self.size
@@ -1,5 +1,65 @@
-from wdev.hosts import Host
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from wdev.hosts import Host, HostUnreachableError, TaskCancelledError
+from wdev.hosts.cancel import TIMEOUT
+from wdev.metrics import instrumentation
 from wdev.tasks import TaskResult, Task
+from wdev.tasks.cache import ResultCache
+
+_default_executor: Optional[ProcessPoolExecutor] = None
+_default_executor_lock = threading.Lock()
+
+
+def default_process_pool() -> ProcessPoolExecutor:
+    """进程级共享的进程池，首次使用时创建，进程数为 CPU 核数"""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            # 当前进程中有 paramiko 等后台线程，避免直接 fork
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _default_executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context)
+        return _default_executor
+
+
+class HostUnavailableError(AttributeError):
+    """在进程池中执行的 PythonTask 访问了主机对象（hasattr / getattr 默认值仍可正常使用）"""
+
+
+class TaskSnapshot:
+    """在子进程中代替 Task 传给可调用对象，只包含名称、描述、（上游）任务结果和取消令牌（只保留剩余时间）"""
+    def __init__(self, task: Task):
+        self.name = task.name
+        self.description = task.description
+        self.task_results = task.task_results
+        self.cancel_token = task.cancel_token
+        self.pre_task = TaskSnapshot(task.pre_task) if task.pre_task is not None else None
+
+
+class DetachedHost(Host):
+    """在子进程中代替 Host 传给可调用对象，只能读取主机名称"""
+    def __init__(self, name: str):
+        super().__init__(name)
+
+    def execute_command(self, command: str):
+        raise HostUnavailableError(f"进程池中无法访问主机 {self.name}，需要主机对象的任务请不要使用 with_process_pool")
+
+    def __getattr__(self, item):
+        raise HostUnavailableError(f"进程池中无法访问主机 {self.name} 的属性 {item}")
+
+    def __reduce__(self):
+        return DetachedHost, (self.name,)
+
+
+def _call_in_process(payload: bytes) -> TaskResult:
+    callable_obj, task, host, kwargs = pickle.loads(payload)
+    return callable_obj(task, host, **kwargs)
+
 
 class PythonTask(Task):
     """Python可调用对象任务"""
@@ -7,12 +67,74 @@ class PythonTask(Task):
         super().__init__(name, description)
         self.callable_obj = callable_obj
         self.kwargs = kwargs
+        self.executor: Optional[Executor] = None
+        self.inline_fallback = True
+
+    def with_process_pool(self, executor: Optional[Executor] = None, inline_fallback: bool = True):
+        """在进程池中执行可调用对象，适用于 CPU 密集的任务
+            可调用对象收到的 task 为 TaskSnapshot（可读取 pre_task.task_results），host 为 DetachedHost（不能执行命令）
+            可调用对象、参数和返回值都必须可以被 pickle
+        :param executor: 使用的进程池，默认使用进程级共享进程池
+        :param inline_fallback: 可调用对象或参数无法 pickle 时，是否改为在当前线程中执行
+                                （提交前检查；已在子进程中开始执行的可调用对象失败时不会重新执行）
+        """
+        self.executor = executor or default_process_pool()
+        self.inline_fallback = inline_fallback
+        return self
+
+    def _execute_in_pool(self, host: Host) -> TaskResult:
+        args = (self.callable_obj, TaskSnapshot(self), DetachedHost(host.name), self.kwargs)
+        # 只序列化一次：提交序列化后的字节，无法 pickle 时在提交前就能发现
+        try:
+            payload = pickle.dumps(args)
+        except Exception as e:
+            if self.inline_fallback:
+                return self.callable_obj(self, host, **self.kwargs)
+            raise ValueError(f"可调用对象无法在进程池中执行: {e}") from e
+        return self._wait_result(self.executor.submit(_call_in_process, payload))
+
+    def _wait_result(self, future):
+        """等待进程池中的结果，超时或被取消时不再等待（子进程中的可调用对象无法强制终止）"""
+        token = self.cancel_token
+        while True:
+            remaining = token.remaining()
+            try:
+                return future.result(0.5 if remaining is None else min(0.5, remaining))
+            except FutureTimeoutError:
+                # 可调用对象自身抛出的 TimeoutError
+                if future.done():
+                    raise
+                if token.cancelled:
+                    future.cancel()
+                    raise TaskCancelledError(token.reason or TIMEOUT)
+
+    def cache_key(self, host: Host) -> str:
+        # 可调用对象以模块、限定名和定义位置标识，进程重启后仍然稳定
+        fn = self.callable_obj
+        code = getattr(fn, "__code__", None)
+        identity = (getattr(fn, "__module__", None), getattr(fn, "__qualname__", type(fn).__qualname__),
+                    code.co_filename if code else None, code.co_firstlineno if code else None)
+        return ResultCache.make_key("python", host.identity, identity, sorted(self.kwargs.items()))
 
     def execute(self,host: Host) -> TaskResult:
+        cached = self.cached_result(host)
+        if cached is not None:
+            return cached
         try:
-            self.task_results = self.callable_obj(self,host,**self.kwargs)
+            with instrumentation.timer("callable", host=host.name, task=self.name), self.cancel_scope():
+                if self.executor is not None:
+                    self.task_results = self._execute_in_pool(host)
+                else:
+                    self.task_results = self.callable_obj(self,host,**self.kwargs)
+        except HostUnreachableError:
+            # 由工作流标记为不可达并跳过该主机的后续任务
+            raise
         except Exception as e:
             # print("执行Python任务时发生错误:", e)
             self.task_results = TaskResult(success=False, output="", error=str(e))
+            return self.task_results
 
-        return self.task_results
\ No newline at end of file
+        # 超时或取消的结果不缓存
+        if self.cancel_reason is None:
+            self.store_result(host, self.task_results)
+        return self.task_results
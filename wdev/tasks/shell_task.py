@@ -1,5 +1,35 @@
+from collections import deque
+from typing import Optional, Tuple
+
 from wdev.hosts import Host
+from wdev.hosts.host import LineCallback
 from wdev.tasks import TaskResult, Task
+from wdev.tasks.cache import ResultCache
+
+
+class OutputBuffer:
+    """只保留开头 head_lines 行和结尾 tail_lines 行的输出缓冲"""
+    def __init__(self, head_lines: int, tail_lines: int):
+        self.head_lines = head_lines
+        self.head = []
+        self.tail = deque(maxlen=tail_lines)
+        self.dropped = 0
+
+    def append(self, line: str):
+        if len(self.head) < self.head_lines:
+            self.head.append(line)
+            return
+        if len(self.tail) == self.tail.maxlen:
+            self.dropped += 1
+        if self.tail.maxlen:
+            self.tail.append(line)
+
+    def getvalue(self) -> str:
+        parts = list(self.head)
+        if self.dropped:
+            parts.append(f"... 省略 {self.dropped} 行 ...\n")
+        parts.extend(self.tail)
+        return "".join(parts)
 
 
 class ShellTask(Task):
@@ -8,24 +38,43 @@ class ShellTask(Task):
         super().__init__(name, description)
         self.command = command
         self.command_field = None
+        self.output_limit: Optional[Tuple[int, int]] = None
+        self.on_line: Optional[LineCallback] = None
 
     def with_data_command(self,field):
         "用于从前置任务的结果中获取命令"
         self.command_field = field
         return self
 
-    def execute(self,host: Host) -> TaskResult:
-        all_output = []
-        all_errors = []
-        success = True
+    def with_output_limit(self, head_lines: int = 100, tail_lines: int = 100,
+                          on_line: Optional[LineCallback] = None):
+        """流式读取命令输出，结果中只保留开头和结尾的若干行
+        :param on_line: 每读到一行时回调 on_line(流名称, 行)，可用于实时处理完整输出
+        """
+        self.output_limit = (head_lines, tail_lines)
+        self.on_line = on_line
+        return self
 
+    def render_command(self) -> str:
+        """解析本次要执行的命令（支持从前置任务结果中获取）"""
+        command = self.command
         if self.command_field is not None:
             if self.pre_task is None:
                 raise ValueError("无上游任务，with_data_command 失效")
             if self.pre_task.task_results is None or self.pre_task.task_results.data is None:
                 raise ValueError("无法从上游任务中获取结果")
-            self.command = self.pre_task.task_results.data.get(self.command_field, self.command)
-        exit_code, output, error = host.execute_command(self.command)
+            command = self.pre_task.task_results.data.get(self.command_field, self.command)
+        return command
+
+    def cache_key(self, host: Host) -> str:
+        return ResultCache.make_key("shell", host.identity, self.render_command(), self.output_limit)
+
+    def build_result(self, exit_code: int, output: str, error: str) -> TaskResult:
+        """根据命令的退出码和输出构造任务结果"""
+        all_output = []
+        all_errors = []
+        success = True
+
         if exit_code != 0:
             success = False
             all_output.append(error)
@@ -34,6 +83,30 @@ class ShellTask(Task):
         self.task_results = TaskResult(
             success=success,
             output="".join(all_output),
-            error="".join(all_errors)
+            error="".join(all_errors),
+            exit_code=exit_code
         )
-        return self.task_results
\ No newline at end of file
+        return self.task_results
+
+    def _execute_streaming(self, host: Host, command: str) -> Tuple[int, str, str]:
+        buffers = {"stdout": OutputBuffer(*self.output_limit), "stderr": OutputBuffer(*self.output_limit)}
+        with host.stream_command(command, self.on_line) as stream:
+            for name, line in stream:
+                buffers[name].append(line)
+        return stream.exit_code, buffers["stdout"].getvalue(), buffers["stderr"].getvalue()
+
+    def execute(self,host: Host) -> TaskResult:
+        cached = self.cached_result(host)
+        if cached is not None:
+            return cached
+        command = self.render_command()
+        with self.cancel_scope():
+            if self.output_limit is not None:
+                exit_code, output, error = self._execute_streaming(host, command)
+            else:
+                exit_code, output, error = host.execute_command(command)
+        result = self.build_result(exit_code, output, error)
+        # 超时或取消的结果不缓存
+        if self.cancel_reason is None:
+            self.store_result(host, result)
+        return result
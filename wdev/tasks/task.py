@@ -1,14 +1,54 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
-from wdev.hosts import Host
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Union
+from wdev.hosts import Host, CancelToken, cancel_scope, current_token
+from wdev.tasks.cache import ResultCache, default_cache
+from wdev.tasks.output import OutputData
 
 class TaskResult:
-    """任务执行结果"""
-    def __init__(self, success: bool, output: str="", error: str = "", data: Dict[str, Any] = None):
+    """任务执行结果
+        output/error 以字节形式紧凑保存，超过 spill_threshold 字节时转存到临时文件，读取时按需解码
+    """
+    __slots__ = ("success", "_output", "_error", "data", "exit_code")
+
+    # 输出转存到临时文件的阈值（字节），None 表示始终保存在内存中
+    spill_threshold: Optional[int] = 64 * 1024
+
+    def __init__(self, success: bool, output: Union[str, bytes]="", error: Union[str, bytes] = "",
+                 data: Dict[str, Any] = None, exit_code: Optional[int] = None):
         self.success = success
         self.output = output
         self.error = error
         self.data = data or {}
+        # 命令的退出码，非命令类任务为 None
+        self.exit_code = exit_code
+
+    @property
+    def output(self) -> str:
+        return str(self._output)
+
+    @output.setter
+    def output(self, value: Union[str, bytes]):
+        self._output = OutputData(value, self.spill_threshold)
+
+    @property
+    def error(self) -> str:
+        return str(self._error)
+
+    @error.setter
+    def error(self, value: Union[str, bytes]):
+        self._error = OutputData(value, self.spill_threshold)
+
+    @property
+    def output_bytes(self) -> bytes:
+        """原始输出字节"""
+        return self._output.tobytes()
+
+    @property
+    def output_size(self) -> int:
+        """输出字节数，不需要解码"""
+        return len(self._output)
 
 class Task(ABC):
     """任务基类"""
@@ -18,7 +58,21 @@ class Task(ABC):
         self.pre_task: Optional[Task] = None
         self.next_success: Optional[Task] = None
         self.next_failure: Optional[Task] = None
-        self.task_results: Optional[TaskResult] = None
+        # 同一个任务会在多个主机(线程)上并行执行，结果按线程隔离
+        self._local = threading.local()
+        self.cache: Optional[ResultCache] = None
+        self.cache_ttl = 0.0
+        # 单次执行的最长时间（秒），None 表示只受工作流的截止时间限制
+        self.timeout: Optional[float] = None
+
+    @property
+    def task_results(self) -> Optional[TaskResult]:
+        """当前线程中该任务最近一次的执行结果"""
+        return getattr(self._local, "task_results", None)
+
+    @task_results.setter
+    def task_results(self, value: Optional[TaskResult]):
+        self._local.task_results = value
 
     def set_pre_task(self, task: 'Task') -> 'Task':
         """设置父任务
@@ -39,7 +93,84 @@ class Task(ABC):
         self.next_failure = next_task
         return self
 
+    def with_timeout(self, timeout: float) -> 'Task':
+        """限制单次执行的最长时间（秒）
+            超时后本地命令的进程组被杀死、SSH 命令的通道被关闭，任务失败（状态为「超时」）并走失败分支；
+            PythonTask 的可调用对象需要自行检查 task.cancel_token
+        """
+        if timeout <= 0:
+            raise ValueError("timeout 必须大于 0")
+        self.timeout = timeout
+        return self
+
+    @property
+    def cancel_token(self) -> CancelToken:
+        """当前线程中本任务最近一次执行所用的取消令牌，可调用对象可通过它检查是否已超时或被取消
+            （cancel_token.cancelled、cancel_token.wait(秒)、cancel_token.raise_if_cancelled()）
+        """
+        token = getattr(self._local, "cancel_token", None)
+        if token is None:
+            token = self._local.cancel_token = current_token() or CancelToken()
+        return token
+
+    @contextmanager
+    def cancel_scope(self):
+        """执行期间使用的取消令牌：在当前线程令牌（如工作流的截止时间）的基础上加上任务自身的超时"""
+        parent = current_token()
+        token = CancelToken(self.timeout, parent) if self.timeout is not None else parent
+        self._local.cancel_token = token if token is not None else CancelToken()
+        self._local.cancel_reason = None
+        try:
+            with cancel_scope(token):
+                yield self._local.cancel_token
+        finally:
+            self._local.cancel_reason = self._local.cancel_token.reason
+            if token is not parent:
+                token.close()
+
+    @property
+    def cancel_reason(self) -> Optional[str]:
+        """当前线程中本任务最近一次执行结束时令牌的取消原因（TIMEOUT / CANCELLED），没有超时或取消时为 None"""
+        return getattr(self._local, "cancel_reason", None)
+
+    def with_cache(self, ttl: float, cache: Optional[ResultCache] = None) -> 'Task':
+        """缓存任务结果 ttl 秒，适用于只读的检查类任务
+            同一主机上相同的命令（或相同的可调用对象和参数）在有效期内直接返回缓存结果，并按该结果走成功/失败分支
+        :param cache: 使用的缓存，默认使用进程级共享缓存
+        """
+        if ttl <= 0:
+            raise ValueError("ttl 必须大于 0")
+        self.cache = cache or default_cache
+        self.cache_ttl = ttl
+        return self
+
+    def cache_key(self, host: Host) -> Optional[str]:
+        """本次执行的缓存键，返回 None 表示不缓存，由子类实现"""
+        return None
+
+    def cached_result(self, host: Host) -> Optional[TaskResult]:
+        """返回缓存中的结果（命中时同时记为本任务的执行结果），未启用缓存或未命中时返回 None"""
+        if self.cache is None:
+            return None
+        key = self.cache_key(host)
+        result = self.cache.get(key) if key is not None else None
+        if result is not None:
+            self.task_results = result
+            self._local.cancel_reason = None
+        return result
+
+    def store_result(self, host: Host, result: TaskResult, key: Optional[str] = None):
+        """把执行结果写入缓存
+        :param key: 执行时计算的缓存键，默认重新计算
+        """
+        if self.cache is None:
+            return
+        if key is None:
+            key = self.cache_key(host)
+        if key is not None:
+            self.cache.put(key, result, self.cache_ttl)
+
     @abstractmethod
     def execute(self,host: Host) -> TaskResult:
         """执行任务"""
-        pass
\ No newline at end of file
+        pass
@@ -1,3 +1,6 @@
 from .workflow import Workflow
 from .simple import SimpleWorkflow
+from .dag import DagWorkflow
+from .journal import RunJournal
+from .history import RunHistory
 from .scheduler import WorkflowScheduler
@@ -0,0 +1,60 @@
+import shlex
+import uuid
+from typing import List, Tuple
+
+from ..tasks import Task, ShellTask
+
+CommandResult = Tuple[int, str, str]
+
+
+def find_chain(task: Task) -> List[ShellTask]:
+    """从 task 开始沿成功分支收集连续的、命令固定、不使用缓存且没有单独超时的普通 ShellTask"""
+    chain = []
+    while type(task) is ShellTask and task.command_field is None and task.output_limit is None \
+            and task.cache is None and task.timeout is None:
+        chain.append(task)
+        task = task.next_success
+    return chain
+
+
+class ChainScript:
+    """把一条成功链上的多个命令合并为一个脚本，在主机上一次执行
+
+    每一步在子 shell 中通过 eval 执行，结束后向标准输出和标准错误写入带步骤序号的标记，
+    任一步失败后脚本立即结束，与逐个执行时只沿失败分支继续的语义一致。
+    """
+
+    def __init__(self, chain: List[ShellTask]):
+        self.chain = chain
+        self.marker = f"__WDEV_{uuid.uuid4().hex}"
+        lines = []
+        for i, task in enumerate(chain):
+            lines.append(f"( eval {shlex.quote(task.render_command())}\n) </dev/null")
+            lines.append("__wdev_rc=$?")
+            lines.append(f"printf '\\n%s %d\\n' {self.marker}_{i} $__wdev_rc")
+            lines.append(f"printf '\\n%s\\n' {self.marker}_{i} >&2")
+            lines.append("[ $__wdev_rc -eq 0 ] || exit 0")
+        self.script = "\n".join(lines) + "\n"
+
+    def parse(self, exit_code: int, stdout: str, stderr: str) -> List[CommandResult]:
+        """
+        按步骤拆分脚本输出，返回已执行步骤的 (退出码, 标准输出, 标准错误)
+        脚本异常中断时，最后一步的退出码为脚本退出码（为0时记为-1），并带上剩余输出
+        """
+        results = []
+        out_pos = err_pos = 0
+        for i in range(len(self.chain)):
+            out_end = stdout.find(f"\n{self.marker}_{i} ", out_pos)
+            err_end = stderr.find(f"\n{self.marker}_{i}\n", err_pos)
+            if out_end < 0 or err_end < 0:
+                results.append((exit_code or -1, stdout[out_pos:], stderr[err_pos:]))
+                break
+            line_start = out_end + len(self.marker) + len(str(i)) + 3
+            line_end = stdout.find("\n", line_start)
+            step_code = int(stdout[line_start:line_end])
+            results.append((step_code, stdout[out_pos:out_end], stderr[err_pos:err_end]))
+            out_pos = line_end + 1
+            err_pos = err_end + len(self.marker) + len(str(i)) + 3
+            if step_code != 0:
+                break
+        return results
@@ -0,0 +1,314 @@
+import heapq
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .plan import FAILURE_STATUSES, UNREACHABLE
+from .simple import TaskNode
+from .workflow import TaskRecord, Workflow
+from ..hosts import CancelToken, Host, HostUnreachableError, cancel_scope
+from ..hosts.cancel import CANCELLED, TIMEOUT
+from ..metrics import instrumentation
+from ..tasks import Task, TaskResult
+
+# 运行条件：success 上游全部成功，failure 任一上游失败，always 上游全部结束即可
+CONDITIONS = ("success", "failure", "always")
+Condition = Union[str, Callable[[Dict[str, TaskResult]], bool]]
+
+
+class DagNode(TaskNode):
+    """DAG 中某个任务在某台主机上的一次执行"""
+    __slots__ = ("upstream", "started", "duration")
+
+    def __init__(self, task: Task, host: Host):
+        super().__init__(task, host)
+        self.upstream: List["DagNode"] = []
+        self.started: Optional[float] = None   # 相对工作流开始的时间（秒）
+        self.duration: Optional[float] = None
+
+    @property
+    def finished(self) -> Optional[float]:
+        if self.started is None or self.duration is None:
+            return None
+        return self.started + self.duration
+
+    def skip(self):
+        """条件不满足，不执行"""
+        self.status = "跳过"
+
+
+class DagWorkflow(Workflow):
+    """有向无环图工作流
+
+    任务通过 depends_on 声明任意多个上游任务，并通过 condition 决定上游结束后是否运行。
+    所有主机上已就绪的任务放入同一个就绪队列，由线程池并发执行，关键路径上的任务优先调度；
+    执行结束后按主机给出关键路径报告。
+    """
+
+    def __init__(self, name: str, description: str = "", max_workers: int = 4,
+                 host_concurrency: Optional[int] = None):
+        """
+        :param max_workers: 同时执行的任务数（所有主机合计）
+        :param host_concurrency: 单台主机上同时执行的任务数上限，None 表示不限制
+        """
+        super().__init__(name, description)
+        if max_workers < 1:
+            raise ValueError("max_workers 必须大于等于 1")
+        if host_concurrency is not None and host_concurrency < 1:
+            raise ValueError("host_concurrency 必须大于等于 1")
+        self.max_workers = max_workers
+        self.host_concurrency = host_concurrency
+        self.dependencies: Dict[Task, List[Task]] = {}
+        self.conditions: Dict[Task, Condition] = {}
+        self.task_track: Dict[str, List[DagNode]] = {}
+        self.critical_paths: Dict[str, List[DagNode]] = {}
+        # 任务 -> 最近一次运行的平均耗时，用于估算关键路径
+        self._estimates: Dict[Task, float] = {}
+        self._routes_cache: Tuple[int, str] = (-1, "")
+        # 最近一次运行开始的 time.time()，与节点的相对时间相加得到结束时间
+        self._started_wall = 0.0
+
+    def add_task(self, task: Task, depends_on: Optional[List[Task]] = None, condition: Condition = "success"):
+        """添加任务
+        :param depends_on: 上游任务列表，必须是已经添加到工作流中的任务（保证没有环）
+        :param condition: success / failure / always，或接收 {上游任务名: TaskResult} 返回 bool 的函数；
+                          被跳过的上游不算成功也不算失败
+        """
+        if task in self.dependencies:
+            raise ValueError(f"任务 {task.name} 已经在工作流中")
+        if not callable(condition) and condition not in CONDITIONS:
+            raise ValueError(f"condition 必须是 {CONDITIONS} 之一或函数")
+        depends_on = list(depends_on or [])
+        for upstream in depends_on:
+            if upstream not in self.dependencies:
+                raise ValueError(f"上游任务 {upstream.name} 需要先添加到工作流中")
+        # 单一上游时沿用 pre_task 的约定，任务中可读取 pre_task.task_results
+        if depends_on and task.pre_task is None:
+            task.set_pre_task(depends_on[0])
+        self.dependencies[task] = depends_on
+        self.conditions[task] = condition
+        self.tasks.append(task)
+        return self
+
+    def _downstream(self) -> Dict[Task, List[Task]]:
+        children: Dict[Task, List[Task]] = {task: [] for task in self.tasks}
+        for task in self.tasks:
+            for upstream in self.dependencies[task]:
+                children[upstream].append(task)
+        return children
+
+    def _ranks(self, children: Dict[Task, List[Task]]) -> Dict[Task, float]:
+        """每个任务到终点的最长预计耗时，数值越大越应优先执行"""
+        ranks: Dict[Task, float] = {}
+        # tasks 按添加顺序即为拓扑序，逆序计算
+        for task in reversed(self.tasks):
+            tail = max((ranks[child] for child in children[task]), default=0.0)
+            ranks[task] = self._estimates.get(task, 1.0) + tail
+        return ranks
+
+    def _should_run(self, node: DagNode) -> bool:
+        condition = self.conditions[node.task]
+        if callable(condition):
+            return bool(condition({up.task.name: up.result for up in node.upstream if up.result is not None}))
+        statuses = [up.status for up in node.upstream]
+        if condition == "success":
+            return all(status == "成功" for status in statuses)
+        if condition == "failure":
+            return any(status in ("失败", TIMEOUT) for status in statuses)
+        return True
+
+    def _run_node(self, node: DagNode, started_at: float, token: CancelToken) -> DagNode:
+        # 恢复上游结果，供任务通过 pre_task.task_results 读取
+        for up in node.upstream:
+            if up.result is not None:
+                up.task.task_results = up.result
+        instrumentation.set_context(self.name, node.host.name, node.task.name)
+        node.started = time.monotonic() - started_at
+        if token.cancelled:
+            # 工作流已超时或被取消，排队中的任务不再执行
+            node.interrupt(token.reason, f"工作流{token.reason}")
+            node.duration = 0.0
+            return node
+        try:
+            # 熔断器打开时不再执行；依赖它的任务随之跳过（always 条件的任务同样标记为不可达）
+            node.host.check_reachable()
+            with cancel_scope(token):
+                node.execute()
+        except HostUnreachableError as e:
+            node.interrupt(UNREACHABLE, str(e))
+        except Exception as e:
+            node.complete(TaskResult(success=False, output="", error=str(e)))
+        node.duration = time.monotonic() - started_at - node.started
+        instrumentation.record("task", node.duration)
+        return node
+
+    def execute(self) -> bool:
+        """执行工作流：各主机上的任务按依赖关系并发执行"""
+        if not self.tasks:
+            raise ValueError("工作流中没有任务")
+        if not self.hosts:
+            raise ValueError("工作流中没有主机")
+        self.task_track.clear()
+        self.critical_paths.clear()
+        self.touch()
+
+        children = self._downstream()
+        ranks = self._ranks(children)
+        host_nodes: List[Dict[Task, DagNode]] = []
+        remaining: Dict[DagNode, int] = {}
+        graph_of: Dict[DagNode, Dict[Task, DagNode]] = {}
+        for host in self.hosts:
+            nodes = {task: DagNode(task, host) for task in self.tasks}
+            for task, node in nodes.items():
+                node.upstream = [nodes[up] for up in self.dependencies[task]]
+                remaining[node] = len(node.upstream)
+                graph_of[node] = nodes
+            host_nodes.append(nodes)
+
+        # 就绪队列：(-关键路径长度, 序号, 节点)
+        ready: List[Tuple[float, int, DagNode]] = []
+        counter = itertools.count()
+
+        def release(node: DagNode):
+            """节点结束（执行或跳过）后更新下游计数，条件不满足的下游标记为跳过并继续传播"""
+            stack = [node]
+            while stack:
+                finished = stack.pop()
+                for child_task in children[finished.task]:
+                    child = graph_of[finished][child_task]
+                    remaining[child] -= 1
+                    if remaining[child]:
+                        continue
+                    if self._should_run(child):
+                        heapq.heappush(ready, (-ranks[child_task], next(counter), child))
+                    else:
+                        child.skip()
+                        stack.append(child)
+
+        for nodes in host_nodes:
+            for task, node in nodes.items():
+                if not remaining[node]:
+                    heapq.heappush(ready, (-ranks[task], next(counter), node))
+
+        started_at = time.monotonic()
+        self._started_wall = time.time()
+        token = self._run_token()
+        host_running: Dict[int, int] = {}
+        workers = self.max_workers
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"wdev-{self.name}") as executor:
+            futures = {}
+            while ready or futures:
+                deferred = []
+                while ready and len(futures) < workers:
+                    item = heapq.heappop(ready)
+                    node = item[2]
+                    if self.host_concurrency is not None and \
+                            host_running.get(id(node.host), 0) >= self.host_concurrency:
+                        deferred.append(item)
+                        continue
+                    host_running[id(node.host)] = host_running.get(id(node.host), 0) + 1
+                    futures[executor.submit(self._run_node, node, started_at, token)] = node
+                for item in deferred:
+                    heapq.heappush(ready, item)
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = futures.pop(future)
+                    host_running[id(node.host)] -= 1
+                    release(node)
+        token.close()
+
+        instrumentation.set_context(self.name)
+        instrumentation.record("workflow", time.monotonic() - started_at)
+        durations: Dict[Task, List[float]] = {}
+        for host, nodes in zip(self.hosts, host_nodes):
+            track = list(nodes.values())
+            self.task_track.setdefault(host.name, []).extend(track)
+            self.critical_paths[host.name] = self._critical_path(track)
+            for node in track:
+                if node.duration is not None:
+                    durations.setdefault(node.task, []).append(node.duration)
+        self._estimates = {task: sum(values) / len(values) for task, values in durations.items()}
+        self.touch()
+        self.notify_all("工作流执行完成", self.print_task_routes())
+        # 任一任务失败、超时、被取消或主机不可达时整体失败
+        return not any(node.status in FAILURE_STATUSES for nodes in host_nodes for node in nodes.values())
+
+    def task_records(self) -> List[TaskRecord]:
+        """最近一次运行中执行过或被跳过的任务"""
+        records = []
+        # 步骤为任务在工作流中的序号（与 SimpleWorkflow 的计划步骤一样，同一任务在各主机上相同）
+        steps = {task: step for step, task in enumerate(self.tasks)}
+        for host_name, nodes in list(self.task_track.items()):
+            for node in nodes:
+                if node.status != "未执行":
+                    finished = None if node.finished is None else self._started_wall + node.finished
+                    records.append(TaskRecord(host_name, node.task.name, steps[node.task], node.status,
+                                              node.result, node.duration, finished))
+        return records
+
+    @staticmethod
+    def _critical_path(nodes: List[DagNode]) -> List[DagNode]:
+        """从最后结束的节点沿最晚结束的上游回溯，得到决定总耗时的任务链"""
+        executed = [node for node in nodes if node.finished is not None]
+        if not executed:
+            return []
+        node = max(executed, key=lambda n: n.finished)
+        path = [node]
+        while True:
+            upstream = [up for up in node.upstream if up.finished is not None]
+            if not upstream:
+                break
+            node = max(upstream, key=lambda n: n.finished)
+            path.append(node)
+        return path[::-1]
+
+    def critical_path_report(self, host_name: str) -> str:
+        """某台主机的关键路径文本"""
+        path = self.critical_paths.get(host_name)
+        if not path:
+            return "关键路径: -"
+        steps = " → ".join(f"{node.task.name}({node.duration:.2f}s)" for node in path)
+        return f"关键路径: {steps}  合计 {path[-1].finished - path[0].started:.2f}s"
+
+    def print_task_routes(self) -> str:
+        """按主机列出每个任务的状态、耗时和上游任务，并附带关键路径"""
+        if self._routes_cache[0] == self.version:
+            return self._routes_cache[1]
+
+        COLOR_GREEN = '\033[92m'
+        COLOR_RED = '\033[91m'
+        COLOR_YELLOW = '\033[93m'
+        COLOR_GRAY = '\033[90m'
+        COLOR_MAGENTA = '\033[95m'
+        COLOR_RESET = '\033[0m'
+
+        STATUS_COLORS = {
+            "成功": COLOR_GREEN,
+            "失败": COLOR_RED,
+            "未执行": COLOR_YELLOW,
+            "跳过": COLOR_GRAY,
+            UNREACHABLE: COLOR_MAGENTA,
+            TIMEOUT: COLOR_RED,
+            CANCELLED: COLOR_GRAY,
+        }
+
+        result_msg = []
+        for host_name, nodes in list(self.task_track.items()):
+            result_msg.append(f"\n=====主机: {host_name}  工作流:{self.name}=====")
+            for node in nodes:
+                color = STATUS_COLORS.get(node.status, COLOR_RESET)
+                line = f"{color}[{node.status}] {node.task.name}{COLOR_RESET}"
+                if node.duration is not None:
+                    line += f"  {node.duration:.2f}s"
+                if node.upstream:
+                    line += "  ← " + ", ".join(up.task.name for up in node.upstream)
+                condition = self.conditions[node.task]
+                if condition != "success":
+                    line += f" ({getattr(condition, '__name__', condition)})"
+                result_msg.append(line)
+            result_msg.append(self.critical_path_report(host_name))
+            result_msg.append("=======================================")
+        routes = "\n".join(result_msg)
+        self._routes_cache = (self.version, routes)
+        return routes
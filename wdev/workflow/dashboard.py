@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from prettytable import PrettyTable
+
+VIEWS = ("full", "summary")
+
+
+def _fmt_time(moment) -> Optional[str]:
+    return moment.strftime("%Y-%m-%d %H:%M:%S") if moment else None
+
+
+class StatusBoard:
+    """调度器状态展示
+
+    按任务记录状态签名，只有签名变化的任务才重新生成表格行，工作流的执行路径只在工作流版本变化时重新渲染；
+    没有任何变化时不刷新终端。另可输出 JSON 快照到文件或本地 HTTP 接口。
+    """
+
+    def __init__(self, scheduler, view: str = "full", snapshot_path: Optional[str] = None,
+                 http_port: Optional[int] = None, console: bool = True, history=None):
+        """
+        :param view: full 显示完整表格（含执行路径），summary 只显示各状态数量和每个工作流的概要
+        :param snapshot_path: JSON 快照文件路径，状态变化时原子写入
+        :param http_port: 在 127.0.0.1 的该端口上提供 JSON 快照（GET /）
+        :param console: 是否输出到终端
+        :param history: RunHistory，指定后显示每个工作流最近 24 小时的运行次数、失败次数和平均耗时
+        """
+        if view not in VIEWS:
+            raise ValueError(f"view 必须是 {VIEWS} 之一")
+        self.scheduler = scheduler
+        self.view = view
+        self.snapshot_path = snapshot_path
+        self.console = console
+        self.history = history
+        # 任务名 -> (状态签名, 表格行, 快照)
+        self._rows: Dict[str, Tuple[tuple, list, dict]] = {}
+        # 任务名 -> (工作流版本, 执行路径文本)
+        self._routes: Dict[str, Tuple[int, str]] = {}
+        self._snapshot_json = "{}"
+        self._server: Optional[ThreadingHTTPServer] = None
+        if http_port is not None:
+            self._start_http(http_port)
+
+    @staticmethod
+    def _status(job) -> str:
+        return "Running" if job.is_running else ("Queued" if job.queued else "Waiting")
+
+    @staticmethod
+    def _schedule(job) -> str:
+        schedule_info = []
+        if job.interval:
+            schedule_info.append(f"Every {job.interval}s")
+        if job.at_time:
+            schedule_info.append(f"At {job.at_time}")
+        if job.cron:
+            schedule_info.append(f"Cron {job.cron.expression}")
+        return " and ".join(schedule_info) if schedule_info else "Manual"
+
+    def _route_text(self, name: str, job) -> str:
+        version = job.workflow.version
+        cached = self._routes.get(name)
+        if cached is None or cached[0] != version:
+            cached = self._routes[name] = (version, job.workflow.print_task_routes())
+        return cached[1]
+
+    def _row(self, name: str, job) -> Tuple[list, dict]:
+        status = self._status(job)
+        wait = f"{job.last_wait * 1000:.1f}" if job.last_wait is not None else "-"
+        duration = f"{job.last_duration:.2f}" if job.last_duration is not None else "-"
+        last_run = _fmt_time(job.last_run) or "Never"
+        next_run = _fmt_time(job.next_run) or "-"
+        schedule = self._schedule(job)
+        history = self._history_stats(name)
+        if self.view == "full":
+            row = [name, status, last_run, duration, next_run, schedule, job.async_mode,
+                   job.queued, wait, job.skipped]
+        else:
+            row = [name, status, last_run, duration, next_run, job.last_success]
+        if history is not None:
+            avg = f"{history['avg_duration']:.2f}" if history["avg_duration"] is not None else "-"
+            row += [history["runs"], history["failures"], avg]
+        if self.view == "full":
+            row.append(self._route_text(name, job))
+        snapshot = {
+            "name": name,
+            "status": status,
+            "last_run": _fmt_time(job.last_run),
+            "last_duration": job.last_duration,
+            "last_success": job.last_success,
+            "next_run": _fmt_time(job.next_run),
+            "schedule": schedule,
+            "async": job.async_mode,
+            "queued": job.queued,
+            "last_wait": job.last_wait,
+            "skipped": job.skipped,
+        }
+        if history is not None:
+            snapshot["history_24h"] = history
+        return row, snapshot
+
+    def _history_stats(self, name: str) -> Optional[dict]:
+        if self.history is None:
+            return None
+        try:
+            return self.history.workflow_stats(name, time.time() - 86400)
+        except Exception as e:
+            print(f"读取运行历史失败: {str(e)}")
+            return None
+
+    def refresh(self) -> bool:
+        """更新状态，有变化时刷新终端和快照，返回是否有变化"""
+        jobs = list(self.scheduler.jobs.items())
+        changed = len(jobs) != len(self._rows) or any(name not in self._rows for name, _ in jobs)
+        rows: List[list] = []
+        snapshots: List[dict] = []
+        for name, job in jobs:
+            signature = (self._status(job), job.last_run, job.next_run, job.last_duration, job.last_success,
+                         job.queued, job.last_wait, job.skipped, job.workflow.version,
+                         self.history.generation if self.history is not None else None)
+            cached = self._rows.get(name)
+            if cached is None or cached[0] != signature:
+                row, snapshot = self._row(name, job)
+                cached = self._rows[name] = (signature, row, snapshot)
+                changed = True
+            rows.append(cached[1])
+            snapshots.append(cached[2])
+        for name in set(self._rows) - {name for name, _ in jobs}:
+            del self._rows[name]
+            self._routes.pop(name, None)
+
+        if not changed:
+            return False
+
+        stats = self.scheduler.executor.stats()
+        counts: Dict[str, int] = {}
+        for snapshot in snapshots:
+            counts[snapshot["status"]] = counts.get(snapshot["status"], 0) + 1
+        self._snapshot_json = json.dumps({"executor": stats, "counts": counts, "jobs": snapshots},
+                                         ensure_ascii=False)
+        if self.snapshot_path:
+            self._write_snapshot()
+        if self.console:
+            self._print(rows, counts, stats)
+        return True
+
+    def _print(self, rows: List[list], counts: Dict[str, int], stats: dict):
+        if self.view == "full":
+            columns = ["Workflow Name", "Status", "Last Run", "Duration(s)", "Next Run", "Schedule", "Async",
+                       "Queued", "Wait(ms)", "Skipped"]
+        else:
+            columns = ["Workflow Name", "Status", "Last Run", "Duration(s)", "Next Run", "Success"]
+        if self.history is not None:
+            columns += ["Runs(24h)", "Failed(24h)", "Avg(s)"]
+        if self.view == "full":
+            columns.append("Log")
+        x = PrettyTable(columns)
+        if self.view == "full":
+            x.align["Log"] = "l"
+        for row in rows:
+            x.add_row(row)
+        summary = "  ".join(f"{status}: {counts.get(status, 0)}" for status in ("Running", "Queued", "Waiting"))
+        # 光标归位并清除到屏幕末尾，比 \033c 重置终端开销小
+        print("\033[H\033[J", end="")
+        print(x, end='\n')
+        print(f"{summary}  Workers: {stats['running']}/{stats['max_workers']}  Queue depth: {stats['queue_depth']}  "
+              f"Avg wait: {stats['avg_wait'] * 1000:.1f}ms  Max wait: {stats['max_wait'] * 1000:.1f}ms  "
+              f"Skipped: {stats['skipped']}")
+
+    def snapshot_json(self) -> str:
+        """最近一次的 JSON 快照"""
+        return self._snapshot_json
+
+    def _write_snapshot(self):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self._snapshot_json)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _start_http(self, port: int):
+        board = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = board.snapshot_json().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, name="wdev-status-http", daemon=True)
+        thread.start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
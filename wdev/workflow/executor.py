@@ -0,0 +1,146 @@
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+OVERLAP_POLICIES = ("skip", "queue_one", "cancel_previous")
+
+
+class JobExecutor:
+    """调度器使用的有界工作线程池
+
+    - 全局最多 max_workers 个工作流同时运行，其余按优先级（数值大者优先）排队
+    - 同一个任务不会并发运行，按任务的 overlap 策略处理重叠触发：
+        skip            任务正在运行或排队时忽略本次触发
+        queue_one       任务正在运行时最多再排队一次
+        cancel_previous 丢弃尚未开始的排队，并取消正在运行的实例（WorkflowJob.cancel），本次触发排队等待
+    - 统计排队深度和排队等待时间
+    """
+
+    def __init__(self, max_workers: int = 4):
+        if max_workers < 1:
+            raise ValueError("max_workers 必须大于等于 1")
+        self.max_workers = max_workers
+        self._cond = threading.Condition()
+        # 排队条目：(-优先级, 序号, 入队时间, 任务)
+        self._queue: List[Tuple[int, int, float, object]] = []
+        self._counter = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+        self.running = 0
+        self.dispatched = 0
+        self.skipped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, job) -> bool:
+        """按任务的重叠策略提交一次运行，被忽略时返回 False"""
+        with self._cond:
+            if self._shutdown:
+                return False
+            policy = job.overlap
+            if policy == "skip" and (job.is_running or job.queued):
+                job.skipped += 1
+                self.skipped += 1
+                return False
+            if policy == "queue_one" and job.queued:
+                job.skipped += 1
+                self.skipped += 1
+                return False
+            if policy == "cancel_previous":
+                self._discard(job)
+                if job.is_running:
+                    job.cancel()
+            job.queued += 1
+            self._queue.append((-job.priority, next(self._counter), time.monotonic(), job))
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker, name=f"wdev-scheduler-{len(self._threads)}")
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify_all()
+            return True
+
+    def _discard(self, job) -> int:
+        kept = [item for item in self._queue if item[3] is not job]
+        dropped = len(self._queue) - len(kept)
+        self._queue = kept
+        job.queued -= dropped
+        return dropped
+
+    def _take(self) -> Optional[Tuple[float, object]]:
+        """取出优先级最高且当前没有在运行的任务"""
+        for item in sorted(self._queue):
+            job = item[3]
+            if not job.is_running:
+                self._queue.remove(item)
+                return item[2], job
+        return None
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待正在运行的工作流全部结束，返回是否在 timeout 秒内结束"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.running == 0, timeout)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                taken = self._take()
+                while taken is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    taken = self._take()
+                enqueued_at, job = taken
+                wait = time.monotonic() - enqueued_at
+                job.queued -= 1
+                job.is_running = True
+                job.last_wait = wait
+                job.cancel_event.clear()
+                self.running += 1
+                self.dispatched += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                job._run_workflow()
+            finally:
+                with self._cond:
+                    job.is_running = False
+                    self.running -= 1
+                    self._cond.notify_all()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, float]:
+        """执行器统计：运行数、排队深度、平均/最长等待时间（秒）、已忽略的触发次数"""
+        with self._cond:
+            return {
+                "running": self.running,
+                "max_workers": self.max_workers,
+                "queue_depth": len(self._queue),
+                "dispatched": self.dispatched,
+                "skipped": self.skipped,
+                "avg_wait": self.total_wait / self.dispatched if self.dispatched else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+    def start(self):
+        """shutdown 之后重新接收任务（调度器再次启动时调用）"""
+        with self._cond:
+            self._shutdown = False
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+
+    def shutdown(self, cancel_queued: bool = True, wait: bool = False):
+        """停止接收新任务；默认丢弃排队中的运行，正在运行的工作流执行完毕后线程退出"""
+        with self._cond:
+            self._shutdown = True
+            if cancel_queued:
+                for item in self._queue:
+                    item[3].queued -= 1
+                self._queue.clear()
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join()
@@ -0,0 +1,345 @@
+import argparse
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .plan import FAILURE_STATUSES
+from .workflow import Workflow
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    workflow TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER NOT NULL,
+    hosts INTEGER NOT NULL,
+    failed_tasks INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_workflow_started ON runs (workflow, started);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started);
+CREATE TABLE IF NOT EXISTS task_runs (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    workflow TEXT NOT NULL,
+    host TEXT NOT NULL,
+    task TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    duration REAL,
+    output TEXT,
+    error TEXT,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_runs_run ON task_runs (run);
+CREATE INDEX IF NOT EXISTS idx_task_runs_task ON task_runs (workflow, task, finished);
+CREATE INDEX IF NOT EXISTS idx_task_runs_host ON task_runs (host, finished);
+CREATE INDEX IF NOT EXISTS idx_task_runs_status ON task_runs (status, finished);
+"""
+
+_STOP = object()
+
+# 计为失败的任务状态（与工作流 execute() 的返回值一致）
+_FAILED_SQL = f"status IN ({', '.join('?' * len(FAILURE_STATUSES))})"
+
+# (运行信息, 任务记录列表)
+_PendingRun = Tuple[tuple, List[tuple]]
+
+
+class RunHistory:
+    """基于 SQLite 的运行历史
+
+    保存每次运行以及各主机上每个任务的状态、退出码、耗时和截断后的输出。
+    record() 只把记录放入队列，由后台线程批量写入（一个事务写入多次运行），并按保留天数定期清理。
+    查询使用独立连接（WAL 模式下读写互不阻塞）。
+    """
+
+    def __init__(self, path: str, retention_days: Optional[float] = 30, max_output: int = 4096,
+                 batch_size: int = 200, flush_interval: float = 1.0):
+        """
+        :param path: 数据库文件路径
+        :param retention_days: 保留最近多少天的记录，None 表示不清理
+        :param max_output: 每个任务保存的输出/错误的最大字符数
+        :param batch_size: 每个事务最多写入的运行数
+        :param flush_interval: 收到记录后最多等待多久写入（秒）
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.max_output = max_output
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # 已写入的运行数，可用于判断展示内容是否需要刷新
+        self.generation = 0
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._last_prune = 0.0
+        # 后台写入线程在第一次 record() 时启动，只查询时不启动
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._thread is None:
+                # 进程退出前写入队列中剩余的记录
+                atexit.register(self.close, 30)
+            self._thread = threading.Thread(target=self._writer, name="wdev-history", daemon=True)
+            self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(self, workflow: Workflow, started: float, finished: float, success: bool,
+               run_id: Optional[str] = None):
+        """记录一次运行（started/finished 为 time.time() 时间戳），在后台写入
+            任务的结束时间为任务自身的结束时间；跳过和从运行日志恢复的任务在本次运行中没有执行，记为运行结束时间
+        """
+        tasks = []
+        for record in workflow.task_records():
+            result = record.result
+            tasks.append((workflow.name, record.host, record.task, record.step, record.status,
+                          result.exit_code if result is not None else None, record.duration,
+                          result.output[:self.max_output] if result is not None else None,
+                          result.error[:self.max_output] if result is not None else None,
+                          record.finished if record.finished is not None else finished))
+        hosts = len({task[1] for task in tasks})
+        failed = sum(1 for task in tasks if task[4] in FAILURE_STATUSES)
+        run = (run_id, workflow.name, started, finished, finished - started, int(bool(success)), hosts, failed)
+        self._ensure_started()
+        with self._idle:
+            self._pending += 1
+        self._queue.put((run, tasks))
+
+    def _write(self, conn: sqlite3.Connection, batch: List[_PendingRun]):
+        with conn:
+            for run, tasks in batch:
+                cursor = conn.execute(
+                    "INSERT INTO runs (run_id, workflow, started, finished, duration, success, hosts, failed_tasks) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", run)
+                conn.executemany(
+                    "INSERT INTO task_runs (run, workflow, host, task, step, status, exit_code, duration, output, "
+                    "error, finished) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid,) + task for task in tasks])
+
+    def _writer(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write(conn, batch)
+                self.generation += len(batch)
+                if time.time() - self._last_prune >= 3600:
+                    self.prune(conn)
+            except sqlite3.Error as e:
+                print(f"写入运行历史失败: {str(e)}")
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+        conn.close()
+
+    def prune(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        """删除超过保留天数的记录，返回删除的运行数"""
+        if self.retention_days is None:
+            return 0
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            with conn:
+                cutoff = time.time() - self.retention_days * 86400
+                conn.execute("DELETE FROM task_runs WHERE run IN (SELECT id FROM runs WHERE started < ?)", (cutoff,))
+                deleted = conn.execute("DELETE FROM runs WHERE started < ?", (cutoff,)).rowcount
+            self._last_prune = time.time()
+            return deleted
+        finally:
+            if own:
+                conn.close()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已记录的运行全部写入，返回是否在超时前完成"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """写入剩余记录后停止后台线程"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _query(self, sql: str, params: tuple) -> List[dict]:
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def runs(self, workflow: Optional[str] = None, since: Optional[float] = None, limit: int = 100) -> List[dict]:
+        """最近的运行（按开始时间倒序）"""
+        conditions, params = [], []
+        if workflow is not None:
+            conditions.append("workflow = ?")
+            params.append(workflow)
+        if since is not None:
+            conditions.append("started >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(f"SELECT * FROM runs {where} ORDER BY started DESC LIMIT ?", (*params, limit))
+
+    def task_runs(self, workflow: Optional[str] = None, task: Optional[str] = None, host: Optional[str] = None,
+                  status: Optional[str] = None, since: Optional[float] = None, limit: int = 1000) -> List[dict]:
+        """任务记录（按结束时间倒序），可按工作流、任务、主机、状态和时间过滤"""
+        conditions, params = [], []
+        for column, value in (("workflow", workflow), ("task", task), ("host", host), ("status", status)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("finished >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(f"SELECT * FROM task_runs {where} ORDER BY finished DESC LIMIT ?", (*params, limit))
+
+    def failed_hosts(self, task: str, since: Optional[float] = None, workflow: Optional[str] = None) -> List[dict]:
+        """某个任务失败过的主机及失败次数，例如最近 24 小时内哪些主机上任务 X 失败了"""
+        conditions, params = ["task = ?", _FAILED_SQL], [task, *FAILURE_STATUSES]
+        if workflow is not None:
+            conditions.append("workflow = ?")
+            params.append(workflow)
+        if since is not None:
+            conditions.append("finished >= ?")
+            params.append(since)
+        return self._query(
+            f"SELECT host, COUNT(*) AS failures, MAX(finished) AS last_failure FROM task_runs "
+            f"WHERE {' AND '.join(conditions)} GROUP BY host ORDER BY failures DESC", tuple(params))
+
+    def duration_trend(self, workflow: str, since: Optional[float] = None, bucket: float = 3600) -> List[dict]:
+        """按时间段（bucket 秒）统计运行次数、失败次数、平均和最长耗时"""
+        return self._query(
+            "SELECT CAST(started / ? AS INTEGER) * ? AS bucket, COUNT(*) AS runs, SUM(1 - success) AS failures, "
+            "AVG(duration) AS avg_duration, MAX(duration) AS max_duration FROM runs "
+            "WHERE workflow = ? AND started >= ? GROUP BY bucket ORDER BY bucket",
+            (bucket, bucket, workflow, since or 0))
+
+    def workflow_stats(self, workflow: str, since: Optional[float] = None) -> Dict[str, float]:
+        """一段时间内的运行次数、失败次数和平均耗时"""
+        rows = self._query(
+            "SELECT COUNT(*) AS runs, COALESCE(SUM(1 - success), 0) AS failures, AVG(duration) AS avg_duration, "
+            "COALESCE(SUM(failed_tasks), 0) AS failed_tasks FROM runs WHERE workflow = ? AND started >= ?",
+            (workflow, since or 0))
+        return rows[0]
+
+
+def _parse_duration(text: str) -> float:
+    """把 30m / 24h / 7d 这样的时长转换为秒数"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def _parse_since(text: Optional[str]) -> Optional[float]:
+    """把时长转换为起始时间戳"""
+    return time.time() - _parse_duration(text) if text else None
+
+
+def _fmt_time(timestamp: Optional[float]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else "-"
+
+
+def main(argv: Optional[List[str]] = None):
+    """运行历史命令行：python -m wdev.workflow.history <数据库> <命令> ..."""
+    from prettytable import PrettyTable
+
+    parser = argparse.ArgumentParser(prog="python -m wdev.workflow.history", description="查询工作流运行历史")
+    parser.add_argument("db", help="数据库文件路径")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runs_parser = commands.add_parser("runs", help="最近的运行")
+    runs_parser.add_argument("--workflow")
+    runs_parser.add_argument("--since", help="时间范围，如 30m / 24h / 7d")
+    runs_parser.add_argument("--limit", type=int, default=20)
+    tasks_parser = commands.add_parser("tasks", help="任务记录")
+    tasks_parser.add_argument("--workflow")
+    tasks_parser.add_argument("--task")
+    tasks_parser.add_argument("--host")
+    tasks_parser.add_argument("--status", help="成功 / 失败 / 跳过 / 不可达 / 超时 / 已取消")
+    tasks_parser.add_argument("--since")
+    tasks_parser.add_argument("--limit", type=int, default=50)
+    failed_parser = commands.add_parser("failed-hosts", help="某个任务失败过的主机")
+    failed_parser.add_argument("task")
+    failed_parser.add_argument("--workflow")
+    failed_parser.add_argument("--since", default="24h")
+    trend_parser = commands.add_parser("trend", help="运行耗时趋势")
+    trend_parser.add_argument("workflow")
+    trend_parser.add_argument("--since", default="7d")
+    trend_parser.add_argument("--bucket", default="1h", help="统计时间段，如 10m / 1h / 1d")
+    prune_parser = commands.add_parser("prune", help="清理过期记录")
+    prune_parser.add_argument("--days", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    history = RunHistory(args.db, retention_days=getattr(args, "days", None))
+    try:
+        if args.command == "runs":
+            x = PrettyTable(["Workflow", "Run ID", "Started", "Duration(s)", "Success", "Hosts", "Failed Tasks"])
+            for row in history.runs(args.workflow, _parse_since(args.since), args.limit):
+                x.add_row([row["workflow"], row["run_id"] or "-", _fmt_time(row["started"]),
+                           f"{row['duration']:.2f}", bool(row["success"]), row["hosts"], row["failed_tasks"]])
+        elif args.command == "tasks":
+            x = PrettyTable(["Workflow", "Host", "Task", "Status", "Exit Code", "Duration(s)", "Finished", "Output"])
+            x.align["Output"] = "l"
+            for row in history.task_runs(args.workflow, args.task, args.host, args.status,
+                                         _parse_since(args.since), args.limit):
+                duration = f"{row['duration']:.2f}" if row["duration"] is not None else "-"
+                output = (row["output"] or "").strip().splitlines()
+                x.add_row([row["workflow"], row["host"], row["task"], row["status"],
+                           row["exit_code"] if row["exit_code"] is not None else "-", duration,
+                           _fmt_time(row["finished"]), output[-1][:60] if output else ""])
+        elif args.command == "failed-hosts":
+            x = PrettyTable(["Host", "Failures", "Last Failure"])
+            for row in history.failed_hosts(args.task, _parse_since(args.since), args.workflow):
+                x.add_row([row["host"], row["failures"], _fmt_time(row["last_failure"])])
+        elif args.command == "trend":
+            bucket = _parse_duration(args.bucket)
+            x = PrettyTable(["Period", "Runs", "Failures", "Avg(s)", "Max(s)"])
+            for row in history.duration_trend(args.workflow, _parse_since(args.since), bucket):
+                x.add_row([_fmt_time(row["bucket"]), row["runs"], row["failures"],
+                           f"{row['avg_duration']:.2f}", f"{row['max_duration']:.2f}"])
+        else:
+            print(f"Deleted {history.prune()} run(s)")
+            return
+        print(x)
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
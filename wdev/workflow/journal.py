@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from ..tasks import TaskResult
+
+
+class JournalWriter:
+    """单次运行的日志写入器：逐行追加 JSON 记录，缓冲写入并定期 fsync"""
+
+    def __init__(self, path: str, fsync_interval: float, max_output: int):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.max_output = max_output
+        self._file = open(path, "a", encoding="utf-8", buffering=64 * 1024)
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+
+    def _write(self, line: str):
+        with self._lock:
+            self._file.write(line)
+            now = time.monotonic()
+            if now - self._last_sync >= self.fsync_interval:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._last_sync = now
+
+    def record(self, host_index: int, step: int, task_name: str, result: TaskResult):
+        """记录一个步骤的执行结果
+
+        输出超过 max_output 个字符时截断，data 无法原样保存为 JSON 时只记录其 repr，
+        这两种记录标记为不完整（complete 为 false），恢复运行时重新执行该步骤。
+        """
+        record = {
+            "type": "step",
+            "host": host_index,
+            "step": step,
+            "task": task_name,
+            "success": result.success,
+            "exit_code": result.exit_code,
+            "output": result.output[:self.max_output],
+            "error": result.error[:self.max_output],
+            "data": result.data,
+            "complete": len(result.output) <= self.max_output and len(result.error) <= self.max_output,
+            "time": time.time(),
+        }
+        try:
+            line = json.dumps(record, ensure_ascii=False)
+            # 元组、非字符串键等读回后与原值不同
+            exact = result.data is None or json.loads(line)["data"] == result.data
+        except (TypeError, ValueError):
+            exact = False
+        if not exact:
+            record.update(data=repr(result.data), complete=False)
+            line = json.dumps(record, ensure_ascii=False)
+        self._write(line + "\n")
+
+    def write_header(self, header: dict):
+        self._write(json.dumps(dict(header, type="run"), ensure_ascii=False, default=repr) + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+class RunJournal:
+    """追加写入的运行日志
+
+    每次运行对应目录中的一个 JSON Lines 文件：第一行为运行信息（工作流、执行计划签名、主机列表），
+    之后每完成一个步骤追加一行。进程中途退出时，可以通过 SimpleWorkflow.resume(run_id)
+    跳过已经成功的步骤，从失败或未执行的步骤继续。
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = 1.0, max_output: int = 64 * 1024):
+        """
+        :param directory: 日志目录
+        :param fsync_interval: 两次 fsync 之间的最短间隔（秒），0 表示每条记录都 fsync
+        :param max_output: 每个步骤记录的输出/错误的最大字符数，超过时该步骤在恢复运行时重新执行
+        """
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.max_output = max_output
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def new_run_id() -> str:
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    def path_of(self, run_id: str) -> str:
+        return os.path.join(self.directory, f"{run_id}.jsonl")
+
+    def runs(self) -> List[str]:
+        """日志目录中所有运行的 run_id（按时间排序）"""
+        return sorted(name[:-len(".jsonl")] for name in os.listdir(self.directory) if name.endswith(".jsonl"))
+
+    def open(self, run_id: str, header: Optional[dict] = None) -> JournalWriter:
+        """打开运行日志用于追加，header 不为 None 时写入运行信息"""
+        writer = JournalWriter(self.path_of(run_id), self.fsync_interval, self.max_output)
+        if header is not None:
+            writer.write_header(dict(header, run_id=run_id))
+        return writer
+
+    def load(self, run_id: str) -> Tuple[dict, Dict[int, Dict[int, TaskResult]]]:
+        """读取运行日志，返回 (运行信息, 主机序号 -> 步骤 -> 结果)，同一步骤以最后一条记录为准
+            不完整的记录（输出被截断或 data 无法保存）不作为恢复点
+        """
+        path = self.path_of(run_id)
+        if not os.path.exists(path):
+            raise ValueError(f"运行记录 {run_id} 不存在")
+        header: dict = {}
+        results: Dict[int, Dict[int, TaskResult]] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程中断时最后一行可能不完整
+                    continue
+                if record.get("type") == "run":
+                    header = header or record
+                elif record.get("type") == "step":
+                    if not record.get("complete", True):
+                        results.get(record["host"], {}).pop(record["step"], None)
+                        continue
+                    results.setdefault(record["host"], {})[record["step"]] = TaskResult(
+                        success=record["success"], output=record["output"], error=record["error"],
+                        data=record.get("data"), exit_code=record.get("exit_code"))
+        return header, results
@@ -0,0 +1,184 @@
+import hashlib
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .batch import ChainScript, find_chain
+from ..hosts import Host
+from ..hosts.cancel import CANCELLED, TIMEOUT
+from ..metrics import instrumentation
+from ..tasks import Task, TaskResult
+
+# 没有后续步骤
+END = -1
+
+# 主机不可达的步骤状态
+UNREACHABLE = "不可达"
+# 表示步骤没有成功完成的状态，出现任一状态时工作流的 execute() 返回 False
+FAILURE_STATUSES = ("失败", TIMEOUT, CANCELLED, UNREACHABLE)
+
+
+class ExecutionPlan:
+    """编译后的执行计划
+
+    把工作流的主任务树展开为扁平的步骤表：步骤 i 对应 tasks[i]，成功/失败后的下一步为
+    on_success[i] / on_failure[i]（END 表示结束）。同一任务出现在树中不同位置时对应不同步骤。
+    编译时检测环，编译结果只读，可在多次运行和多台主机之间复用。
+    """
+    __slots__ = ("tasks", "on_success", "on_failure", "roots", "chains")
+
+    def __init__(self, tasks: Tuple[Task, ...], on_success: Tuple[int, ...], on_failure: Tuple[int, ...],
+                 roots: Tuple[int, ...], chains: Tuple[Optional[ChainScript], ...]):
+        self.tasks = tasks
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.roots = roots
+        # 步骤 i 开始的成功链可合并执行时为对应脚本
+        self.chains = chains
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    @property
+    def signature(self) -> str:
+        """执行计划结构的摘要，用于确认运行日志与当前计划一致"""
+        layout = ([task.name for task in self.tasks], self.on_success, self.on_failure, self.roots)
+        return hashlib.sha1(repr(layout).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def compile(cls, roots: List[Task], batch_chains: bool = False) -> "ExecutionPlan":
+        """展开主任务树，任务的后续分支回到自身祖先时抛出 ValueError"""
+        tasks: List[Task] = []
+        on_success: List[int] = []
+        on_failure: List[int] = []
+        root_steps: List[int] = []
+        for root in roots:
+            root_steps.append(len(tasks))
+            # 非递归深度优先展开，path 为当前步骤的祖先任务，用于检测环
+            path = set()
+            stack = [(True, root, END, True)]
+            while stack:
+                enter, task, parent, success_branch = stack.pop()
+                if not enter:
+                    path.discard(task)
+                    continue
+                if task in path:
+                    raise ValueError(f"任务 {task.name} 的后续分支形成了环")
+                step = len(tasks)
+                tasks.append(task)
+                on_success.append(END)
+                on_failure.append(END)
+                if parent != END:
+                    (on_success if success_branch else on_failure)[parent] = step
+                path.add(task)
+                stack.append((False, task, step, True))
+                if task.next_failure:
+                    stack.append((True, task.next_failure, step, False))
+                if task.next_success:
+                    stack.append((True, task.next_success, step, True))
+
+        chains: List[Optional[ChainScript]] = [None] * len(tasks)
+        if batch_chains:
+            scripts = {}
+            for step, task in enumerate(tasks):
+                if task not in scripts:
+                    chain = find_chain(task)
+                    scripts[task] = ChainScript(chain) if len(chain) > 1 else None
+                chains[step] = scripts[task]
+        return cls(tuple(tasks), tuple(on_success), tuple(on_failure), tuple(root_steps), tuple(chains))
+
+
+class HostRun:
+    """一台主机在一次运行中的状态：与计划步骤一一对应的结果数组，未执行的步骤为 None"""
+    __slots__ = ("plan", "host", "results", "durations", "finished", "index", "checkpoint", "on_complete", "marks")
+
+    def __init__(self, plan: ExecutionPlan, host: Host, index: int = 0,
+                 checkpoint: Optional[Dict[int, TaskResult]] = None,
+                 on_complete: Optional[Callable[["HostRun", int, TaskResult], None]] = None):
+        """
+        :param index: 主机在工作流中的序号
+        :param checkpoint: 恢复运行时已经成功的步骤及其结果，这些步骤不再执行
+        :param on_complete: 每个步骤执行完成后回调 on_complete(HostRun, 步骤, 结果)
+        """
+        self.plan = plan
+        self.host = host
+        self.results: List[Optional[TaskResult]] = [None] * len(plan)
+        # 每个步骤的执行耗时（秒），合并执行的链耗时记在第一步
+        self.durations: List[Optional[float]] = [None] * len(plan)
+        # 每个步骤的结束时间（time.time()），恢复的步骤为 None
+        self.finished: List[Optional[float]] = [None] * len(plan)
+        self.index = index
+        self.checkpoint = checkpoint or {}
+        self.on_complete = on_complete
+        # 步骤 -> 特殊状态：不可达（之后不再继续该任务树）、超时、已取消
+        self.marks: Dict[int, str] = {}
+
+    def set_result(self, step: int, result: TaskResult, duration: Optional[float] = None):
+        self.results[step] = result
+        self.finished[step] = time.time()
+        if duration is not None:
+            self.durations[step] = duration
+            instrumentation.record("task", duration, host=self.host.name, task=self.plan.tasks[step].name)
+        if self.on_complete is not None:
+            self.on_complete(self, step, result)
+
+    def set_unreachable(self, step: int, error: str, duration: Optional[float] = None):
+        """主机不可达，步骤没有执行"""
+        self.marks[step] = UNREACHABLE
+        self.set_result(step, TaskResult(success=False, output="", error=error), duration)
+
+    def mark_interrupted(self, step: int, reason: Optional[str]):
+        """步骤因超时或取消而失败时记录原因"""
+        if reason is not None and not self.results[step].success:
+            self.marks[step] = reason
+
+    def restore(self, step: int) -> bool:
+        """步骤在恢复点中已经成功时直接使用原结果，返回是否已恢复"""
+        result = self.checkpoint.get(step)
+        if result is None or not result.success:
+            return False
+        self.results[step] = result
+        self.plan.tasks[step].task_results = result
+        return True
+
+    def status(self, step: int) -> str:
+        result = self.results[step]
+        if result is None:
+            return "未执行"
+        mark = self.marks.get(step)
+        if mark is not None:
+            return mark
+        return "成功" if result.success else "失败"
+
+    def next_step(self, step: int) -> int:
+        """根据步骤的执行结果选择下一步"""
+        if self.marks.get(step) == UNREACHABLE:
+            return END
+        if self.results[step].success:
+            return self.plan.on_success[step]
+        return self.plan.on_failure[step]
+
+    def complete_chain(self, step: int, exit_code: int, output: str, error: str,
+                       duration: Optional[float] = None) -> int:
+        """把合并脚本的输出拆分到链上各步骤，返回最后执行的步骤"""
+        script = self.plan.chains[step]
+        last = step
+        for task, (step_code, step_output, step_error) in zip(script.chain, script.parse(exit_code, output, error)):
+            self.set_result(step, task.build_result(step_code, step_output, step_error), duration)
+            duration = None
+            last, step = step, self.plan.on_success[step]
+        return last
+
+    def signature(self) -> tuple:
+        """展示内容依赖的状态：执行计划、每个步骤的状态和耗时（保留两位小数），相同时渲染结果不变"""
+        return (self.plan,) + tuple(
+            (self.status(step), None if duration is None else round(duration, 2))
+            for step, duration in enumerate(self.durations))
+
+    def executed(self) -> List[int]:
+        """已执行的步骤（按步骤顺序）"""
+        return [step for step, result in enumerate(self.results) if result is not None]
+
+    @property
+    def success(self) -> bool:
+        """已执行的步骤中没有失败、超时、取消或不可达的步骤"""
+        return not any(self.status(step) in FAILURE_STATUSES for step in self.executed())
@@ -1,128 +1,312 @@
+import heapq
+import itertools
+import math
+import random
 import threading
 import time
-import schedule
-from typing import Dict, Optional, List
-from datetime import datetime
+from typing import Dict, Optional, List, Tuple
+from datetime import datetime, timedelta
+from .cron import CronExpression
+from .dashboard import StatusBoard
+from .executor import JobExecutor, OVERLAP_POLICIES
+from .history import RunHistory
 from .workflow import Workflow
-from prettytable import PrettyTable
+from ..hosts import CancelToken, cancel_scope
+from ..hosts.cancel import CANCELLED
+from ..metrics import profiled
+
+MISFIRE_POLICIES = ("skip", "catch_up")
+
 
 class WorkflowJob:
-    def __init__(self, workflow: Workflow, interval: Optional[int] = None,
-                 at_time: Optional[str] = None, async_mode: bool = False):
+    def __init__(self, workflow: Workflow, interval: Optional[float] = None,
+                 at_time: Optional[str] = None, async_mode: bool = False,
+                 cron: Optional[str] = None, jitter: float = 0.0, misfire: str = "skip",
+                 overlap: str = "skip", priority: int = 0):
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"misfire 必须是 {MISFIRE_POLICIES} 之一")
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"overlap 必须是 {OVERLAP_POLICIES} 之一")
+        if interval is not None and interval <= 0:
+            raise ValueError("interval 必须大于 0")
         self.workflow = workflow
-        self.interval = interval  # 间隔时间（秒）
-        self.at_time = at_time   # 指定时间（格式：HH:MM）
+        self.interval = interval  # 间隔时间（秒，可为小数）
+        self.at_time = at_time   # 指定时间（格式：HH:MM 或 HH:MM:SS）
+        self.cron = CronExpression(cron) if cron else None
+        self.jitter = jitter     # 每次触发时随机推迟的最长时间（秒）
+        self.misfire = misfire   # 错过触发时间时的处理方式：skip 只补跑一次，catch_up 逐次补跑
         self.async_mode = async_mode
+        self.overlap = overlap   # 异步模式下重复触发时的处理方式，见 JobExecutor
+        self.priority = priority  # 排队时数值大者优先
         self.last_run: Optional[datetime] = None
+        self.next_run: Optional[datetime] = None
+        self.last_delay: Optional[float] = None  # 最近一次实际启动相对计划时间的延迟（秒）
+        self.last_duration: Optional[float] = None  # 最近一次运行耗时（秒）
+        self.last_success: Optional[bool] = None
         self.is_running: bool = False
-        self.thread: Optional[threading.Thread] = None
-        self._schedule_job = None
+        self.queued: int = 0      # 在执行器中排队的次数
+        self.skipped: int = 0     # 因重叠策略被忽略的触发次数
+        self.last_wait: Optional[float] = None  # 最近一次在执行器中排队等待的时间（秒）
+        self.cancel_event = threading.Event()   # 被请求取消（cancel_previous、stop）时置位，每次运行开始前清除
+        self.cancel_token: Optional[CancelToken] = None  # 正在进行的运行使用的取消令牌
+        self._executor: Optional[JobExecutor] = None
+        self._history: Optional[RunHistory] = None
+        self.profile_path: Optional[str] = None  # 下一次运行在 cProfile 下执行并写入该文件
+        self._due: Optional[float] = None  # 不含抖动的计划触发时间（time.time()）
+        self._fire_at: Optional[float] = None  # 含抖动的实际触发时间
+
+    @property
+    def scheduled(self) -> bool:
+        return self.interval is not None or self.at_time is not None or self.cron is not None
+
+    def _next_at_time(self, after: float) -> float:
+        parts = [int(part) for part in self.at_time.split(":")]
+        hour, minute, second = (parts + [0, 0])[:3]
+        moment = datetime.fromtimestamp(after)
+        candidate = moment.replace(hour=hour, minute=minute, second=second, microsecond=0)
+        if candidate <= moment:
+            candidate += timedelta(days=1)
+        return candidate.timestamp()
+
+    def next_due(self, after: float) -> float:
+        """计算 after 之后的下一个计划触发时间"""
+        if self.interval is not None:
+            if self._due is None:
+                return after + self.interval
+            # 按计划时间累加，避免执行耗时导致漂移
+            due = self._due + self.interval
+            if due <= after and self.misfire == "skip":
+                due += math.floor((after - due) / self.interval + 1) * self.interval
+            return due
+        if self.at_time is not None:
+            return self._next_at_time(after)
+        return self.cron.next_after(datetime.fromtimestamp(after)).timestamp()
+
+    def cancel(self, reason: str = CANCELLED):
+        """取消正在进行的运行：正在执行的命令被终止，其余步骤不再开始"""
+        self.cancel_event.set()
+        token = self.cancel_token
+        if token is not None:
+            token.cancel(reason)
 
     def _run_workflow(self):
         self.is_running = True
         self.last_run = datetime.now()
+        started = time.monotonic()
+        success = False
+        # 只有 cancel_previous 的任务会在运行中途被取消，其命令放到独立的进程组中以便连同子进程一起终止；
+        # 其余任务的本地命令留在终端的进程组中，Ctrl+C 可以直接传给它们
+        token = self.cancel_token = CancelToken(internal=self.overlap != "cancel_previous")
+        # 启动前已被请求取消
+        if self.cancel_event.is_set():
+            token.cancel()
         try:
-            success = self.workflow.execute()
-            print(f"Workflow {self.workflow.name} executed {'successfully' if success else 'with failures'}")
+            with cancel_scope(token):
+                if self.profile_path:
+                    path, self.profile_path = self.profile_path, None
+                    with profiled(path):
+                        success = self.workflow.execute()
+                else:
+                    success = self.workflow.execute()
+            if token.cancelled:
+                success = False
+                print(f"Workflow {self.workflow.name} cancelled")
+            else:
+                print(f"Workflow {self.workflow.name} executed {'successfully' if success else 'with failures'}")
         except Exception as e:
             print(f"Error executing workflow {self.workflow.name}: {str(e)}")
         finally:
+            self.last_duration = time.monotonic() - started
+            self.last_success = bool(success)
+            if self._history is not None:
+                started_at = self.last_run.timestamp()
+                self._history.record(self.workflow, started_at, started_at + self.last_duration, self.last_success,
+                                     getattr(self.workflow, "last_run_id", None))
+            self.cancel_token = None
             self.is_running = False
 
     def run(self):
         if self.async_mode:
-            if self.is_running:
+            if self._executor is None:
+                self._executor = JobExecutor(max_workers=1)
+            if not self._executor.submit(self):
                 print(f"Workflow {self.workflow.name} is already running")
-                return
-            self.thread = threading.Thread(target=self._run_workflow)
-            self.thread.start()
         else:
+            # 与执行器的工作线程一致：每次运行前清除上一次运行遗留的取消请求
+            self.cancel_event.clear()
             self._run_workflow()
 
+
 class WorkflowScheduler:
-    def __init__(self):
+    def __init__(self, status_interval: Optional[float] = 1.0, max_workers: int = 4,
+                 view: str = "full", snapshot_path: Optional[str] = None, http_port: Optional[int] = None,
+                 history: Optional[RunHistory] = None):
+        """
+        :param status_interval: 检查状态变化的间隔（秒），None 表示不展示状态
+        :param max_workers: 异步模式下同时运行的工作流数量上限
+        :param view: 终端展示方式，full 完整表格（含执行路径），summary 概要
+        :param snapshot_path: 状态变化时写入 JSON 快照的文件路径
+        :param http_port: 在 127.0.0.1 的该端口上提供 JSON 状态快照
+        :param history: 运行历史，指定后记录每次运行，状态表中显示最近 24 小时的统计
+        """
         self.jobs: Dict[str, WorkflowJob] = {}
+        self.executor = JobExecutor(max_workers)
+        self.history = history
+        self.status_board = StatusBoard(self, view, snapshot_path, http_port, history=history)
+        self.status_interval = status_interval
         self._running = False
         self._thread: Optional[threading.Thread] = None
+        # 私有的定时堆：(触发时间, 序号, 任务)，任务被移除或重新调度后旧条目自动失效
+        self._heap: List[Tuple[float, int, WorkflowJob]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
 
-    def add_workflow(self, workflow: Workflow, interval: Optional[int] = None,
-                    at_time: Optional[str] = None, async_mode: bool = False) -> None:
+    def add_workflow(self, workflow: Workflow, interval: Optional[float] = None,
+                    at_time: Optional[str] = None, async_mode: bool = False,
+                    cron: Optional[str] = None, jitter: float = 0.0, misfire: str = "skip",
+                    overlap: str = "skip", priority: int = 0) -> None:
         """
         添加工作流到调度器
         :param workflow: 工作流实例
-        :param interval: 运行间隔（秒）
-        :param at_time: 指定运行时间（HH:MM格式）
+        :param interval: 运行间隔（秒，支持小数）
+        :param at_time: 指定运行时间（HH:MM 或 HH:MM:SS 格式）
         :param async_mode: 是否异步执行
+        :param cron: cron 表达式（分 时 日 月 周）
+        :param jitter: 每次触发随机推迟的最长时间（秒），用于错开大量同时触发的工作流
+        :param misfire: 错过触发时间（如调度线程被同步任务阻塞）时的处理方式：
+                        skip 只补跑一次并跳到下一个未来时间点，catch_up 逐次补跑错过的每一次
+        :param overlap: 异步模式下上一次运行未结束时的处理方式：skip / queue_one / cancel_previous
+        :param priority: 排队时的优先级，数值大者优先
         """
         if workflow.name in self.jobs:
             raise ValueError(f"Workflow {workflow.name} already exists in scheduler")
 
-        job = WorkflowJob(workflow, interval, at_time, async_mode)
-        
-        if interval is not None:
-            job._schedule_job = schedule.every(interval).seconds.do(job.run)
-        elif at_time is not None:
-            job._schedule_job = schedule.every().day.at(at_time).do(job.run)
-            
-        self.jobs[workflow.name] = job
+        job = WorkflowJob(workflow, interval, at_time, async_mode, cron, jitter, misfire, overlap, priority)
+        job._executor = self.executor
+        job._history = self.history
+        with self._cond:
+            self.jobs[workflow.name] = job
+            if job.scheduled:
+                self._push(job, job.next_due(time.time()))
+            self._cond.notify()
 
     def remove_workflow(self, workflow_name: str) -> None:
         """从调度器中移除工作流"""
-        if workflow_name in self.jobs:
-            job = self.jobs[workflow_name]
-            if job._schedule_job:
-                schedule.cancel_job(job._schedule_job)
-            del self.jobs[workflow_name]
+        with self._cond:
+            if workflow_name in self.jobs:
+                job = self.jobs.pop(workflow_name)
+                job._due = job._fire_at = None
+                job.next_run = None
+                self._cond.notify()
+
+    def _push(self, job: WorkflowJob, due: float):
+        job._due = due
+        fire_at = job._fire_at = due + (random.uniform(0, job.jitter) if job.jitter else 0.0)
+        job.next_run = datetime.fromtimestamp(fire_at)
+        heapq.heappush(self._heap, (fire_at, next(self._counter), job))
+
+    def _pop_due(self, now: float) -> List[Tuple[WorkflowJob, float]]:
+        """弹出所有到期任务并安排下一次触发，返回 (任务, 计划触发时间)"""
+        due_jobs = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, _, job = heapq.heappop(self._heap)
+            # 已移除或已重新调度的任务
+            if self.jobs.get(job.workflow.name) is not job or job._fire_at != fire_at:
+                continue
+            due_jobs.append((job, fire_at))
+            self._push(job, job.next_due(job._due if job.misfire == "catch_up" else now))
+        return due_jobs
 
     def _print_status(self):
-        """打印所有工作流状态（表格形式）"""
-        x = PrettyTable(["Workflow Name", "Status", "Last Run", "Schedule", "Async", "Log"])
-        x.align["Log"]= "l"
-        # 打印每个工作流的状态
-        for name, job in self.jobs.items():
-            status = "Running" if job.is_running else "Waiting"
-            last_run = job.last_run.strftime("%Y-%m-%d %H:%M:%S") if job.last_run else "Never"
-            
-            schedule_info = []
-            if job.interval:
-                schedule_info.append(f"Every {job.interval}s")
-            if job.at_time:
-                schedule_info.append(f"At {job.at_time}")
-            schedule_str = " and ".join(schedule_info) if schedule_info else "Manual"
-
-            x.add_row([name, status, last_run, schedule_str, job.async_mode, job.workflow.print_task_routes()])
-        print("\033c", end="")
-        print(x,end='\n')
+        """刷新工作流状态（只重新生成有变化的部分，没有变化时不输出）"""
+        self.status_board.refresh()
 
     def _run_scheduler(self):
-        """运行调度器主循环"""
-        while self._running:
-            schedule.run_pending()
-            self._print_status()
-            time.sleep(1)
-
-    def start(self):
-        """启动调度器"""
+        """运行调度器主循环：睡眠到下一个到期任务（或状态刷新时间）为止"""
+        next_status = time.time()
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = time.time()
+                due_jobs = self._pop_due(now)
+                if not due_jobs:
+                    wake_at = self._heap[0][0] if self._heap else math.inf
+                    if self.status_interval is not None:
+                        wake_at = min(wake_at, next_status)
+                    if wake_at > now:
+                        self._cond.wait(None if wake_at == math.inf else wake_at - now)
+                        continue
+
+            for job, fire_at in due_jobs:
+                job.last_delay = time.time() - fire_at
+                job.run()
+            if self.status_interval is not None and time.time() >= next_status:
+                self._print_status()
+                next_status = time.time() + self.status_interval
+
+    def start(self, block: bool = True):
+        """启动调度器
+        :param block: 是否阻塞当前线程直到调度器停止
+        """
         if self._running:
             print("Scheduler is already running")
             return
-        
+
         self._running = True
+        self.executor.start()
         self._thread = threading.Thread(target=self._run_scheduler)
         self._thread.daemon = True  # 设置为守护线程
         self._thread.start()
-        while True:
-            time.sleep(1)
+        if block:
+            self._thread.join()
 
-    def stop(self):
-        """停止调度器"""
-        self._running = False
-        if self._thread:
+    def _wait_jobs(self, timeout: float) -> bool:
+        """等待正在运行的工作流（异步的在执行器中，同步的在调度线程中）结束，返回是否在 timeout 秒内全部结束"""
+        deadline = time.monotonic() + timeout
+        if not self.executor.wait_idle(timeout):
+            return False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+            return not self._thread.is_alive()
+        return True
+
+    def stop(self, timeout: Optional[float] = None, abort: bool = False, grace: float = 5.0):
+        """停止调度器
+        :param timeout: 等待正在运行的工作流结束的最长时间（秒），超过后取消它们；None 表示不等待，
+                        正在运行的工作流在后台执行完毕
+        :param abort: 不等待，立即取消正在运行的工作流
+        :param grace: 取消后等待工作流退出的最长时间（秒）
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self.executor.shutdown()
+        bounded = abort or timeout is not None
+        if bounded:
+            if abort or not self._wait_jobs(timeout):
+                running = [job for job in list(self.jobs.values()) if job.is_running]
+                for job in running:
+                    job.cancel()
+                if running:
+                    print(f"Cancelling running workflows: {', '.join(job.workflow.name for job in running)}")
+                if not self._wait_jobs(grace):
+                    still = [job.workflow.name for job in list(self.jobs.values()) if job.is_running]
+                    print(f"Workflows still running after {grace}s: {', '.join(still)}")
+        self.status_board.close()
+        # 限时停止时调度线程已在 _wait_jobs 中等待过
+        if self._thread and self._thread is not threading.current_thread() and not bounded:
             self._thread.join()
         print("Workflow Scheduler stopped")
 
+    def profile_next_run(self, workflow_name: str, path: str):
+        """下一次运行该工作流时使用 cProfile 采样，原始数据写入 path，文本摘要写入 path.txt"""
+        if workflow_name not in self.jobs:
+            raise ValueError(f"Workflow {workflow_name} not found in scheduler")
+        self.jobs[workflow_name].profile_path = path
+
     def run_workflow(self, workflow_name: str):
         """手动运行指定工作流"""
         if workflow_name not in self.jobs:
             raise ValueError(f"Workflow {workflow_name} not found in scheduler")
-        self.jobs[workflow_name].run() 
\ No newline at end of file
+        self.jobs[workflow_name].run()
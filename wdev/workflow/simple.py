@@ -1,9 +1,20 @@
-from .workflow import Workflow
-from ..hosts import Host
-from ..tasks import Task
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .journal import JournalWriter, RunJournal
+from .plan import END, UNREACHABLE, ExecutionPlan, HostRun
+from .workflow import TaskRecord, Workflow
+from ..hosts import CancelToken, Host, HostUnreachableError, SSHHost, SSHMultiplexer, cancel_scope
+from ..hosts.cancel import CANCELLED, TIMEOUT
+from ..metrics import instrumentation
+from ..tasks import Task, TaskResult, ShellTask
 
 
 class TaskNode:
+    __slots__ = ("task", "host", "result", "status", "next_success", "next_failure")
+
     def __init__(self, task: Task,host: Host):
         self.task = task
         self.host = host
@@ -12,29 +23,47 @@ class TaskNode:
         self.next_success = None
         self.next_failure = None
 
-    def gender_message(self):
+    @property
+    def message(self) -> Optional[str]:
+        """任务执行结果的消息，访问时才生成"""
+        return self.gender_message()
+
+    def gender_message(self) -> Optional[str]:
         """获取任务执行结果的消息"""
-        if self.result:
-            self.message = f"""
+        if not self.result:
+            return None
+        message = f"""
 任务: {self.task.name}
 主机: {self.host.name}
 状态: {self.status}
 输出:
 {self.result.output}
     """
-            if self.result.error:
-                self.message += f"\n错误:\n{self.result.error}"
+        if self.result.error:
+            message += f"\n错误:\n{self.result.error}"
+        return message
 
     def execute(self):
-        """执行任务"""
-        self.result = self.task.execute(self.host)
+        """执行任务，因超时或取消而失败时状态为取消原因"""
+        result = self.complete(self.task.execute(self.host))
+        if not result.success and self.task.cancel_reason is not None:
+            self.status = self.task.cancel_reason
+        return result
+
+    def complete(self, result: TaskResult):
+        """记录任务执行结果（结果可能由其他执行引擎产生）"""
+        self.result = result
         if self.result.success:
             self.status = "成功"
         else:
             self.status = "失败"
-        self.gender_message()
         return self.result
 
+    def interrupt(self, status: str, error: str):
+        """任务没有执行：主机不可达，或工作流已超时/被取消"""
+        self.result = TaskResult(success=False, output="", error=error)
+        self.status = status
+
     @classmethod
     def create(self, task: Task, host: Host):
         """创建一个新的任务节点"""
@@ -42,42 +71,132 @@ class TaskNode:
             return None
         return TaskNode(task, host)
 
+def _task_nodes(run: HostRun) -> List[TaskNode]:
+    """把主机的运行状态转换为每个主任务一棵的 TaskNode 执行树"""
+    plan = run.plan
+    roots = []
+    for root in plan.roots:
+        root_node = TaskNode(plan.tasks[root], run.host)
+        roots.append(root_node)
+        stack = [(root, root_node)]
+        while stack:
+            step, node = stack.pop()
+            node.result = run.results[step]
+            node.status = run.status(step)
+            if node.result is None:
+                continue
+            for attr, child in (("next_success", plan.on_success[step]), ("next_failure", plan.on_failure[step])):
+                if child != END:
+                    child_node = TaskNode(plan.tasks[child], run.host)
+                    setattr(node, attr, child_node)
+                    stack.append((child, child_node))
+    return roots
+
+
 class SimpleWorkflow(Workflow):
     """简单工作流类，按顺序执行一次所有任务"""
-    def __init__(self, name: str, description: str = ""):
+    def __init__(self, name: str, description: str = "", max_workers: int = 1,
+                 multiplexer: Optional[SSHMultiplexer] = None, batch_chains: bool = False,
+                 journal: Optional[RunJournal] = None):
+        """
+        :param max_workers: 并行执行的主机数，1 表示逐台主机顺序执行
+        :param multiplexer: 指定后所有主机按批次推进，SSHHost 上的 ShellTask 由该引擎在单线程中并发执行，
+                            其余步骤（非 SSH 主机、PythonTask、限制输出的 ShellTask 等）最多 max_workers 个同时执行
+        :param batch_chains: 是否把成功分支上连续的固定命令 ShellTask 合并为一个脚本执行（一次往返）
+        :param journal: 运行日志，指定后记录每个步骤的结果，可通过 resume(run_id) 从中断处继续
+        """
         super().__init__(name, description)
-        self.task_track = {}
+        if max_workers < 1:
+            raise ValueError("max_workers 必须大于等于 1")
+        self.max_workers = max_workers
+        self.multiplexer = multiplexer
+        self.batch_chains = batch_chains
+        self.journal = journal
+        self.last_run_id: Optional[str] = None
+        self._writer: Optional[JournalWriter] = None
+        # 恢复运行时：主机序号 -> 步骤 -> 日志中的结果
+        self._checkpoints: Dict[int, Dict[int, TaskResult]] = {}
+        # 主机名 -> 该主机的运行状态列表（同名主机依次追加）
+        self.host_runs: Dict[str, List[HostRun]] = {}
+        self._track_cache: Tuple[int, Dict[str, List[TaskNode]]] = (-1, {})
+        self._plan: Optional[ExecutionPlan] = None
+        # 渲染缓存：主机名 -> (主机记录签名, 文本)，以及整体的 (工作流版本, 文本)
+        self._host_versions: Dict[str, tuple] = {}
+        self._host_routes: Dict[str, Tuple[tuple, str]] = {}
+        self._routes_cache: Tuple[int, str] = (-1, "")
+
+    @property
+    def task_track(self) -> Dict[str, List[TaskNode]]:
+        """主机名 -> 每个主任务的执行树（TaskNode，未执行的分支只保留一层），由 host_runs 生成的只读视图"""
+        if self._track_cache[0] != self.version:
+            track = {host_name: [node for run in runs for node in _task_nodes(run)]
+                     for host_name, runs in list(self.host_runs.items())}
+            self._track_cache = (self.version, track)
+        return self._track_cache[1]
 
     def print_task_routes(self):
-        """以树状结构打印任务执行路径，任务名称带颜色显示状态（不依赖第三方库）"""
+        """以树状结构打印任务执行路径，任务名称带颜色显示状态（不依赖第三方库）
+            按主机缓存渲染结果，只有执行记录发生变化的主机才重新渲染
+        """
+        if self._routes_cache[0] == self.version:
+            return self._routes_cache[1]
+        result_msg = []
+        # 遍历每个主机的任务跟踪记录
+        for host_name, runs in list(self.host_runs.items()):
+            host_version = self._host_versions.get(host_name)
+            cached = self._host_routes.get(host_name)
+            if cached is None or cached[0] != host_version:
+                cached = self._host_routes[host_name] = (host_version, self._render_host_routes(host_name, runs))
+            result_msg.append(cached[1])
+        routes = "\n".join(result_msg)
+        self._routes_cache = (self.version, routes)
+        return routes
+
+    def task_records(self) -> List[TaskRecord]:
+        """最近一次运行中已执行的步骤"""
+        records = []
+        for host_name, runs in list(self.host_runs.items()):
+            for run in runs:
+                for step in run.executed():
+                    records.append(TaskRecord(host_name, run.plan.tasks[step].name, step, run.status(step),
+                                              run.results[step], run.durations[step], run.finished[step]))
+        return records
+
+    def _render_host_routes(self, host_name: str, runs: List[HostRun]) -> str:
+        """渲染单个主机的任务执行路径"""
         result_msg = []
 
         COLOR_GREEN = '\033[92m'
         COLOR_RED = '\033[91m'
         COLOR_YELLOW = '\033[93m'
+        COLOR_MAGENTA = '\033[95m'
+        COLOR_GRAY = '\033[90m'
         COLOR_RESET = '\033[0m'
 
         STATUS_COLORS = {
             "成功": COLOR_GREEN,
             "失败": COLOR_RED,
-            "未执行": COLOR_YELLOW
+            "未执行": COLOR_YELLOW,
+            UNREACHABLE: COLOR_MAGENTA,
+            TIMEOUT: COLOR_RED,
+            CANCELLED: COLOR_GRAY
         }
 
-        # 遍历每个主机的任务跟踪记录
-        for host_name, nodes in self.task_track.items():
-            msg = f"\n=====主机: {host_name}  工作流:{self.name}====="
-            # print(msg)
-            result_msg.append(msg)
+        msg = f"\n=====主机: {host_name}  工作流:{self.name}====="
+        # print(msg)
+        result_msg.append(msg)
 
-            # 处理该主机上的每个主任务树
-            for root_node in nodes:
+        # 处理该主机上的每个主任务树
+        for run in runs:
+            plan = run.plan
+            for root in plan.roots:
                 # 使用栈实现非递归深度优先遍历
                 stack = []
-                # 每个元素包含：节点、深度、父节点前缀、是否为最后一个兄弟节点、分支标签
-                stack.append((root_node, 0, "", True, f"[{root_node.status}] "))
+                # 每个元素包含：步骤、深度、父节点前缀、是否为最后一个兄弟节点
+                stack.append((root, 0, "", True))
 
                 while stack:
-                    node, depth, parent_prefix, is_last, branch_label = stack.pop()
+                    step, depth, parent_prefix, is_last = stack.pop()
 
                     # 确定连接符样式
                     if depth == 0:  # 根节点
@@ -86,18 +205,21 @@ class SimpleWorkflow(Workflow):
                         connector = "└── " if is_last else "└── "
 
                     # 组装节点显示信息
-                    node_info = node.task.name + branch_label
-                    color = STATUS_COLORS.get(node.status, COLOR_RESET)
+                    status = run.status(step)
+                    node_info = f"{plan.tasks[step].name}[{status}] "
+                    if run.durations[step] is not None:
+                        node_info += f"{run.durations[step]:.2f}s "
+                    color = STATUS_COLORS.get(status, COLOR_RESET)
                     msg = f"{parent_prefix}{connector}{color}{node_info}{COLOR_RESET}"
                     # print(msg)
                     result_msg.append(msg)
 
+                    # 未执行的步骤不展开后续分支
+                    if run.results[step] is None:
+                        continue
+
                     # 准备子节点（成功分支和失败分支）
-                    children = []
-                    if node.next_success:
-                        children.append((node.next_success, f"[{node.next_success.status}] "))
-                    if node.next_failure:
-                        children.append((node.next_failure, f"[{node.next_failure.status}] "))
+                    children = [child for child in (plan.on_success[step], plan.on_failure[step]) if child != END]
 
                     # 反转子节点顺序以确保正确的处理顺序（成功分支先处理）
                     children = children[::-1]
@@ -106,41 +228,272 @@ class SimpleWorkflow(Workflow):
                     new_parent_prefix = parent_prefix + ("   " if is_last else "│   ")
 
                     # 将子节点压入栈中
-                    for i, (child, label) in enumerate(children):
+                    for i, child in enumerate(children):
                         # 当前子节点是否是父节点的最后一个子节点
                         is_last_child = (i == len(children) - 1)
-                        stack.append((child, depth + 1, new_parent_prefix, is_last_child, label))
-            msg = "======================================="
-            # print(msg)
-            result_msg.append(msg)
+                        stack.append((child, depth + 1, new_parent_prefix, is_last_child))
+        msg = "======================================="
+        # print(msg)
+        result_msg.append(msg)
         return "\n".join(result_msg)
-    def run_task(self, task: Task,host: Host):
-        #递归运行
-        if not task:
-            return None
-        task_node = TaskNode(task, host)
-        result = task_node.execute()
 
-        if result.success:
-            task_node.next_success = self.run_task(task.next_success, host)
-            task_node.next_failure = TaskNode.create(task.next_failure, host)
-        else:
-            task_node.next_success = TaskNode.create(task.next_success, host)
-            task_node.next_failure = self.run_task(task.next_failure, host)
-        return task_node
+    def add_task(self, task: Task):
+        """添加任务（下次执行前重新编译执行计划）"""
+        self._plan = None
+        return super().add_task(task)
+
+    def compile(self) -> ExecutionPlan:
+        """把主任务树编译为执行计划，之后的运行复用该计划
+            添加任务后会自动重新编译；如果在执行过之后修改了任务的后续分支，需要手动调用
+        """
+        self._plan = ExecutionPlan.compile(self.tasks, self.batch_chains)
+        return self._plan
+
+    @property
+    def plan(self) -> ExecutionPlan:
+        if self._plan is None:
+            self.compile()
+        return self._plan
+
+    def _new_run(self, index: int, host: Host) -> HostRun:
+        on_complete = self._record if self._writer is not None else None
+        return HostRun(self.plan, host, index, self._checkpoints.get(index), on_complete)
+
+    def _record(self, run: HostRun, step: int, result: TaskResult):
+        self._writer.record(run.index, step, run.plan.tasks[step].name, result)
+
+    def run_host(self, host: Host, index: int = 0, token: Optional[CancelToken] = None) -> HostRun:
+        """在单个主机上按顺序执行所有主任务（按执行计划迭代执行）
+        :param index: 主机在工作流中的序号，用于运行日志
+        :param token: 本次运行的取消令牌，默认按工作流的 timeout 新建；取消后不再开始新的步骤
+        """
+        plan = self.plan
+        run = self._new_run(index, host)
+        token = token if token is not None else self._run_token()
+        with cancel_scope(token):
+            for root in plan.roots:
+                step = root
+                while step != END:
+                    if token.cancelled:
+                        return run
+                    script = plan.chains[step]
+                    if run.restore(step):
+                        step = run.next_step(step)
+                        continue
+                    task = plan.tasks[step]
+                    instrumentation.set_context(self.name, host.name, task.name)
+                    started = time.perf_counter()
+                    try:
+                        # 熔断器打开时不再执行，该任务树的其余步骤直接跳过
+                        host.check_reachable()
+                        if script is not None:
+                            output = host.execute_command(script.script)
+                            step = run.complete_chain(step, *output, time.perf_counter() - started)
+                            run.mark_interrupted(step, token.reason)
+                        else:
+                            result = task.execute(host)
+                            run.set_result(step, result, time.perf_counter() - started)
+                            run.mark_interrupted(step, task.cancel_reason)
+                    except HostUnreachableError as e:
+                        run.set_unreachable(step, str(e), time.perf_counter() - started)
+                    step = run.next_step(step)
+        return run
+
+    def _run_multiplexed(self, token: CancelToken) -> List[HostRun]:
+        """所有主机按批次同步推进任务树，每批中可复用的 SSH 命令交给 multiplexer 一次性执行"""
+        plan = self.plan
+        runs = [self._new_run(i, host) for i, host in enumerate(self.hosts)]
+        instrumentation.set_context(self.name)
+        workers = min(self.max_workers, len(runs))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"wdev-{self.name}") \
+            if workers > 1 else None
+        try:
+            with cancel_scope(token):
+                for root in plan.roots:
+                    self._advance_multiplexed(runs, root, token, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return runs
+
+    def _run_step(self, run: HostRun, step: int, parent: int, token: CancelToken):
+        """执行一个不交给 multiplexer 的步骤（可能在线程池中执行）"""
+        plan = self.plan
+        if parent != END:
+            plan.tasks[parent].task_results = run.results[parent]
+        task = plan.tasks[step]
+        instrumentation.set_context(self.name, run.host.name, task.name)
+        started = time.perf_counter()
+        with cancel_scope(token):
+            try:
+                result = task.execute(run.host)
+                run.set_result(step, result, time.perf_counter() - started)
+                run.mark_interrupted(step, task.cancel_reason)
+            except HostUnreachableError as e:
+                run.set_unreachable(step, str(e), time.perf_counter() - started)
+        instrumentation.set_context(self.name)
+
+    def _advance_multiplexed(self, runs: List[HostRun], root: int, token: CancelToken,
+                             executor: Optional[ThreadPoolExecutor] = None):
+        """所有主机同步推进一棵主任务树，令牌取消后不再开始新的批次"""
+        plan = self.plan
+        # 待执行项：(主机序号, 步骤, 上一步)
+        pending = [(i, root, END) for i in range(len(runs))]
+        while pending and not token.cancelled:
+            executed = []
+            batch = []
+            inline = []
+            for i, step, parent in pending:
+                run = runs[i]
+                host = run.host
+                task = plan.tasks[step]
+                # 恢复该主机上游任务的结果，供 pre_task.task_results 读取
+                if parent != END:
+                    plan.tasks[parent].task_results = run.results[parent]
+
+                script = plan.chains[step] if isinstance(host, SSHHost) else None
+                if run.restore(step):
+                    executed.append((i, step))
+                    continue
+                try:
+                    host.check_reachable()
+                except HostUnreachableError as e:
+                    run.set_unreachable(step, str(e))
+                    executed.append((i, step))
+                    continue
+                if script is not None:
+                    batch.append((i, step, script.script, True, None, token))
+                elif isinstance(task, ShellTask) and isinstance(host, SSHHost) and task.output_limit is None:
+                    cached = task.cached_result(host)
+                    if cached is not None:
+                        run.set_result(step, cached)
+                        executed.append((i, step))
+                        continue
+                    # 缓存键依赖上游结果，在恢复上游结果后立即计算
+                    key = task.cache_key(host) if task.cache is not None else None
+                    step_token = CancelToken(task.timeout, token) if task.timeout is not None else token
+                    batch.append((i, step, task.render_command(), False, key, step_token))
+                else:
+                    # 限制输出的 ShellTask 需要流式读取，与其他任务一样通过 task.execute 执行
+                    inline.append((i, step, parent))
+
+            # 其余步骤在线程池中与本批 SSH 命令同时执行
+            futures = []
+            for i, step, parent in inline:
+                if executor is not None:
+                    futures.append(executor.submit(self._run_step, runs[i], step, parent, token))
+                else:
+                    self._run_step(runs[i], step, parent, token)
+                executed.append((i, step))
+
+            if batch:
+                # 每条命令的完成时间，用于计算步骤耗时
+                finished_at: Dict[int, float] = {}
+                started = time.perf_counter()
+                outputs = self.multiplexer.run(
+                    [(runs[i].host, command) for i, _, command, _, _, _ in batch],
+                    on_complete=lambda index, *_: finished_at.__setitem__(index, time.perf_counter()),
+                    tokens=[step_token for *_, step_token in batch])
+                ended = time.perf_counter()
+                for j, ((i, step, _, chained, key, step_token), (exit_code, output, error)) \
+                        in enumerate(zip(batch, outputs)):
+                    duration = finished_at.get(j, ended) - started
+                    if exit_code == -1 and not runs[i].host.reachable:
+                        # 连接失败且熔断器已打开
+                        runs[i].set_unreachable(step, error, duration)
+                    elif chained:
+                        step = runs[i].complete_chain(step, exit_code, output, error, duration)
+                    else:
+                        task = plan.tasks[step]
+                        result = task.build_result(exit_code, output, error)
+                        runs[i].set_result(step, result, duration)
+                        if key is not None and step_token.reason is None:
+                            task.store_result(runs[i].host, result, key)
+                    runs[i].mark_interrupted(step, step_token.reason)
+                    if step_token is not token:
+                        step_token.close()
+                    executed.append((i, step))
+            for future in futures:
+                future.result()
+
+            pending = []
+            for i, step in executed:
+                next_step = runs[i].next_step(step)
+                if next_step != END:
+                    pending.append((i, next_step, step))
 
     def execute(self) -> bool:
         """执行工作流中的所有任务一次"""
+        return self._execute()
+
+    def resume(self, run_id: str) -> bool:
+        """从运行日志恢复一次中断或失败的运行：已经成功的步骤直接使用日志中的结果，
+            从失败或未执行的步骤继续，新的结果追加到同一个日志中
+        """
+        if self.journal is None:
+            raise ValueError("工作流没有配置运行日志（journal）")
+        return self._execute(run_id)
+
+    def _open_journal(self, run_id: Optional[str]):
+        header = {
+            "workflow": self.name,
+            "plan": self.plan.signature,
+            "hosts": [host.identity for host in self.hosts],
+        }
+        if run_id is None:
+            run_id = self.journal.new_run_id()
+            self._writer = self.journal.open(run_id, dict(header, started=time.time()))
+        else:
+            recorded, self._checkpoints = self.journal.load(run_id)
+            if any(recorded.get(key) != value for key, value in header.items()):
+                self._checkpoints = {}
+                raise ValueError(f"运行记录 {run_id} 与当前工作流的任务或主机不一致，无法恢复")
+            self._writer = self.journal.open(run_id)
+        self.last_run_id = run_id
+
+    def _execute(self, run_id: Optional[str] = None) -> bool:
         if not self.tasks:
             raise ValueError("工作流中没有任务")
         if not self.hosts:
             raise ValueError("工作流中没有主机")
-        self.task_track.clear()
-        overall_success = True
+        # 先编译执行计划（检测环），编译失败时保留上一次的执行记录
+        if self._plan is None:
+            self.compile()
+        if self.journal is not None:
+            self._open_journal(run_id)
+        self.host_runs.clear()
+        self.touch()
         # 对每个主机执行所有任务
-        for host in self.hosts:
-            for main_task in self.tasks:
-                node = self.run_task(main_task, host)
-                self.task_track.setdefault(host.name, []).append(node)
+        workers = min(self.max_workers, len(self.hosts))
+        started = time.perf_counter()
+        token = self._run_token()
+        try:
+            if self.multiplexer is not None:
+                host_runs = self._run_multiplexed(token)
+            elif workers > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"wdev-{self.name}") as executor:
+                    host_runs = list(executor.map(functools.partial(self.run_host, token=token),
+                                                  self.hosts, range(len(self.hosts))))
+            else:
+                host_runs = [self.run_host(host, i, token) for i, host in enumerate(self.hosts)]
+        finally:
+            token.close()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._checkpoints = {}
+            instrumentation.set_context(self.name)
+            instrumentation.record("workflow", time.perf_counter() - started)
+        # 按主机添加顺序汇总，保证输出顺序确定
+        for host, run in zip(self.hosts, host_runs):
+            self.host_runs.setdefault(host.name, []).append(run)
+        # 只有展示内容变化的主机需要重新渲染
+        for host_name, runs in self.host_runs.items():
+            self._host_versions[host_name] = tuple(run.signature() for run in runs)
+        for host_name in set(self._host_routes) - set(self.host_runs):
+            del self._host_routes[host_name]
+            self._host_versions.pop(host_name, None)
+        self.touch()
         self.notify_all("工作流执行完成", self.print_task_routes())
-        return overall_success
\ No newline at end of file
+        # 任一步骤失败、超时、被取消或主机不可达时整体失败（与 DagWorkflow 一致）
+        return all(run.success for run in host_runs)
@@ -1,8 +1,21 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, List
+from typing import Dict, Iterable, Optional, List, NamedTuple
 from wdev.tasks import Task, TaskResult
-from wdev.hosts import Host
-from wdev.notifiers import Notifier
+from wdev.hosts import CancelToken, Host, current_token
+from wdev.notifiers import AsyncNotifier, Notifier
+from wdev.metrics import instrumentation
+
+class TaskRecord(NamedTuple):
+    """一次运行中某个任务在某台主机上的记录"""
+    host: str
+    task: str
+    step: int
+    status: str
+    result: Optional[TaskResult]
+    duration: Optional[float] = None
+    finished: Optional[float] = None  # 结束时间（time.time()），跳过或从运行日志恢复的步骤为 None
+
 
 class Workflow(ABC):
     """工作流基类，定义基本接口和共同功能"""
@@ -14,26 +27,71 @@ class Workflow(ABC):
         self.notifiers: List[Notifier] = []
         self.task_results: Dict[str, TaskResult] = {}
         self.hosts: List[Host] = []
+        # 执行记录的版本号，每次变化时递增，用于判断展示内容是否需要重新生成
+        self.version = 0
+        # 单次运行的最长时间（秒），None 表示不限制
+        self.timeout: Optional[float] = None
+
+    def touch(self) -> int:
+        """标记执行记录已变化，返回新的版本号"""
+        self.version += 1
+        return self.version
 
     def add_host(self, host: Host):
         """添加主机"""
         self.hosts.append(host)
         return self
 
+    def add_hosts(self, hosts: Iterable[Host]):
+        """批量添加主机，如 inventory.select("web", shard="3/8")"""
+        self.hosts.extend(hosts)
+        return self
+
+    def with_timeout(self, timeout: float):
+        """限制单次运行的最长时间（秒）
+            到期后正在执行的命令被终止（状态为「超时」），尚未开始的任务不再执行
+        """
+        if timeout <= 0:
+            raise ValueError("timeout 必须大于 0")
+        self.timeout = timeout
+        return self
+
+    def _run_token(self) -> CancelToken:
+        """本次运行的取消令牌：在调用方线程的令牌（如调度器的取消请求）上加上工作流的截止时间"""
+        return CancelToken(self.timeout, current_token(), internal=True)
+
     def add_task(self, task: Task):
         """添加任务"""
         self.tasks.append(task)
         return self
 
-    def add_notifier(self, notifier: Notifier):
-        """添加通知器"""
-        self.notifiers.append(notifier)
+    def add_notifier(self, notifier: Notifier, async_delivery: bool = True):
+        """添加通知器
+        :param async_delivery: 是否在后台发送（AsyncNotifier.wrap），工作流结束时不等待通知发送完成；
+                               False 时在 notify_all 中同步发送
+        """
+        self.notifiers.append(AsyncNotifier.wrap(notifier) if async_delivery else notifier)
         return self
 
     def notify_all(self, subject: str, message: str):
-        """向所有通知器发送通知"""
+        """向所有通知器发送通知（异步通知器只把消息放入队列）"""
         for notifier in self.notifiers:
-            notifier.notify(subject, message)
+            with instrumentation.timer("notify", task=notifier.name):
+                notifier.notify(subject, message)
+
+    def flush_notifiers(self, timeout: Optional[float] = None) -> bool:
+        """等待后台发送的通知全部处理完，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for notifier in self.notifiers:
+            if isinstance(notifier, AsyncNotifier):
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not notifier.flush(remaining):
+                    return False
+        return True
+
+    def task_records(self) -> List[TaskRecord]:
+        """最近一次运行中各主机上每个任务的记录（用于运行历史），由子类实现"""
+        return []
 
     @abstractmethod
     def print_task_routes(self) -> str: